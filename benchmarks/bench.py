@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from ignite_client.client import IgniteClient
+from ignite_client.codec import read_matrix
+from ignite_client.fake_server import FakeIgniteServer, SyntheticResultSet
+from ignite_client.lazy import read_lazy_rows
+from ignite_client.protocol import HandshakeRequest, QuerySqlFieldsRequest, QuerySqlFieldsTemplateCache, Request, \
+    StatementType
+from ignite_client.sync_client import SyncIgniteConnectionPool
+from ignite_client.transport import run
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+NUMERIC_COLUMNS = [3, 4, 6, 6, 4, 3, 8, 2]
+MIXED_COLUMNS = [3, 9, 6, 9, 4, 12, 8, 9]
+
+
+def new_request(sql: str = "SELECT * FROM BENCH WHERE ID = ?", cursor_page_size: int = 1024,
+                query_args=None) -> QuerySqlFieldsRequest:
+    query_args = [42] if query_args is None else query_args
+    return QuerySqlFieldsRequest(
+        cache_id=0,
+        schema="PUBLIC",
+        cursor_page_size=cursor_page_size,
+        max_rows=0,
+        sql=sql,
+        query_arg_count=len(query_args),
+        query_args=query_args,
+        statement_type=StatementType.SELECT,
+        distributed_join=False,
+        local_query=False,
+        replicated_only=False,
+        enforce_join_order=False,
+        collocated=False,
+        lazy=False,
+        timeout_milliseconds=0,
+        include_field_names=True,
+    )
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def latency_summary(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    return {
+        'requests_per_sec': len(latencies) / elapsed,
+        'p50_us': percentile(latencies, 0.50) * 1e6,
+        'p99_us': percentile(latencies, 0.99) * 1e6,
+    }
+
+
+def bench_encode(iterations: int) -> Dict[str, float]:
+    request = new_request()
+    start = time.perf_counter_ns()
+    for request_id in range(iterations):
+        Request.new_query_sql_fields(request_id, request).encode()
+    plain = (time.perf_counter_ns() - start) / iterations
+
+    templates = QuerySqlFieldsTemplateCache()
+    buffer = bytearray(4096)
+    start = time.perf_counter_ns()
+    for request_id in range(iterations):
+        templates.get(request).bind(request_id, request).encode_into(buffer, 0)
+    templated = (time.perf_counter_ns() - start) / iterations
+    return {'request_ns': plain, 'template_ns': templated}
+
+
+def bench_decode(row_count: int) -> Dict[str, float]:
+    results = {}
+    for name, column_types in (('numeric', NUMERIC_COLUMNS), ('mixed', MIXED_COLUMNS)):
+        result_set = SyntheticResultSet(column_types=column_types, row_count=row_count)
+        page = memoryview(b''.join(result_set.row(row) for row in range(row_count)))
+        cells = row_count * len(column_types)
+        start = time.perf_counter_ns()
+        read_matrix(page, 0, row_count, len(column_types))
+        results[f'{name}_ns_per_cell'] = (time.perf_counter_ns() - start) / cells
+        start = time.perf_counter_ns()
+        lazy_rows, _ = read_lazy_rows(page, 0, row_count, len(column_types))
+        for row in lazy_rows:
+            _ = row[0]
+        results[f'{name}_lazy_one_column_ns_per_cell'] = (time.perf_counter_ns() - start) / cells
+        try:
+            from ignite_client.columnar import read_columns  # pylint: disable=import-outside-toplevel
+            start = time.perf_counter_ns()
+            read_columns(page, 0, row_count, len(column_types))
+            results[f'{name}_columnar_ns_per_cell'] = (time.perf_counter_ns() - start) / cells
+        except ImportError:
+            pass
+    return results
+
+
+async def connect(server: FakeIgniteServer) -> IgniteClient:
+    client = IgniteClient(server.host, server.port)
+    await client.connect()
+    await client.handshake(HandshakeRequest(1, 0, 0, "", ""))
+    return client
+
+
+async def bench_single(server: FakeIgniteServer, count: int) -> Dict[str, float]:
+    client = await connect(server)
+    request = new_request(cursor_page_size=1)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(count):
+        sent = time.perf_counter()
+        await client.query_sql_fields(request)
+        latencies.append(time.perf_counter() - sent)
+    elapsed = time.perf_counter() - start
+    await client.close()
+    return latency_summary(latencies, elapsed)
+
+
+async def bench_pipelined(server: FakeIgniteServer, count: int, concurrency: int) -> Dict[str, float]:
+    client = await connect(server)
+    request = new_request(cursor_page_size=1)
+    latencies = []
+
+    async def worker(requests: int):
+        for _ in range(requests):
+            sent = time.perf_counter()
+            await client.query_sql_fields(request)
+            latencies.append(time.perf_counter() - sent)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker(count // concurrency) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    await client.close()
+    return latency_summary(latencies, elapsed)
+
+
+async def bench_threaded(server: FakeIgniteServer, count: int, threads: int) -> Dict[str, float]:
+    # blocking clients from a thread pool, with the fake server on this thread's event loop
+    pool = SyncIgniteConnectionPool([(server.host, server.port)], HandshakeRequest(1, 0, 0, "", ""),
+                                    size_per_node=threads)
+    request = new_request(cursor_page_size=1)
+    latencies = []
+
+    def worker(requests: int):
+        with pool.acquire() as client:
+            for _ in range(requests):
+                sent = time.perf_counter()
+                client.query_sql_fields(request)
+                latencies.append(time.perf_counter() - sent)
+
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(threads) as executor:
+        start = time.perf_counter()
+        await asyncio.gather(*[loop.run_in_executor(executor, worker, count // threads) for _ in range(threads)])
+        elapsed = time.perf_counter() - start
+    pool.close()
+    return latency_summary(latencies, elapsed)
+
+
+async def bench_paged(server: FakeIgniteServer, page_size: int) -> Dict[str, float]:
+    client = await connect(server)
+    start = time.perf_counter()
+    rows = 0
+    async for _ in client.sql(new_request(cursor_page_size=page_size, query_args=[])):
+        rows += 1
+    elapsed = time.perf_counter() - start
+    await client.close()
+    return {'rows_per_sec': rows / elapsed, 'rows': rows}
+
+
+async def run_network_benchmarks(args) -> Dict[str, Dict[str, float]]:
+    results = {}
+    async with FakeIgniteServer(SyntheticResultSet(column_types=NUMERIC_COLUMNS, row_count=1)) as server:
+        results['single'] = await bench_single(server, args.requests)
+        results['pipelined'] = await bench_pipelined(server, args.requests, args.concurrency)
+        results['threaded'] = await bench_threaded(server, args.requests, args.threads)
+    result_set = SyntheticResultSet(column_types=MIXED_COLUMNS, row_count=args.rows)
+    async with FakeIgniteServer(result_set) as server:
+        results['paged'] = await bench_paged(server, args.page_size)
+    return results
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], check=True, capture_output=True,
+                              text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(base_path: str, head_path: str):
+    with open(base_path, encoding='utf-8') as base_file, open(head_path, encoding='utf-8') as head_file:
+        base, head = json.load(base_file), json.load(head_file)
+    print(f"{'metric':<45}{base['commit']:>14}{head['commit']:>14}{'change':>10}")
+    for group, metrics in head['results'].items():
+        for metric, value in metrics.items():
+            previous = base['results'].get(group, {}).get(metric)
+            change = f"{(value - previous) / previous:+.1%}" if previous else '-'
+            previous = f"{previous:.2f}" if previous is not None else '-'
+            print(f"{group + '.' + metric:<45}{previous:>14}{value:>14.2f}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ignite client against an in-process fake server")
+    parser.add_argument('--requests', type=int, default=20_000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--page-size', type=int, default=1024)
+    parser.add_argument('--output-dir', default=RESULTS_DIR)
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'HEAD'), help="compare two stored result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = {
+        'encode': bench_encode(args.requests),
+        'decode': bench_decode(args.page_size * 16),
+    }
+    results.update(run(run_network_benchmarks(args)))
+    report = {
+        'commit': current_commit(),
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"{report['commit']}.json")
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(report, output, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"results written to {path}")
+
+
+if __name__ == '__main__':
+    main()
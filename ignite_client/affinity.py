@@ -0,0 +1,95 @@
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from ignite_client.codec import BinaryObject, encode_object, read_int, read_long, read_short, read_string
+from ignite_client.protocol import CachePartitionsResponse
+from ignite_client.utils import java_hash_code, to_int32
+
+
+def _long_hash_code(value: int) -> int:
+    # java.lang.Long.hashCode
+    value &= 0xFFFFFFFFFFFFFFFF
+    return to_int32(value ^ (value >> 32))
+
+
+def _uuid_hash_code(encoded: bytes) -> int:
+    most_significant_bits, offset = read_long(encoded, 1)
+    least_significant_bits, _ = read_long(encoded, offset)
+    return _long_hash_code(most_significant_bits ^ least_significant_bits)
+
+
+# java hashCode of the value the server deserializes a key into, read from the key's wire form;
+# doubles are hashed through their raw bits, dates, times and timestamps through their epoch millis
+_KEY_HASH_CODES = {
+    1: lambda encoded: int.from_bytes(encoded[1:2], 'little', signed=True),
+    2: lambda encoded: read_short(encoded, 1)[0],
+    3: lambda encoded: read_int(encoded, 1)[0],
+    4: lambda encoded: _long_hash_code(read_long(encoded, 1)[0]),
+    6: lambda encoded: _long_hash_code(read_long(encoded, 1)[0]),
+    8: lambda encoded: 1231 if encoded[1] else 1237,
+    9: lambda encoded: java_hash_code(read_string(encoded, 0)[0]),
+    10: _uuid_hash_code,
+    11: lambda encoded: _long_hash_code(read_long(encoded, 1)[0]),
+    33: lambda encoded: _long_hash_code(read_long(encoded, 1)[0]),
+    36: lambda encoded: _long_hash_code(read_long(encoded, 1)[0]),
+    103: lambda encoded: read_int(encoded, 8)[0],
+}
+
+
+def key_hash_code(key: Any) -> Optional[int]:
+    encoded = encode_object(key)
+    hash_code = _KEY_HASH_CODES.get(encoded[0])
+    return None if hash_code is None else hash_code(encoded)
+
+
+def rendezvous_partition(hash_code: int, partition_count: int) -> int:
+    # RendezvousAffinityFunction: spread the hash and mask for power of two partition counts
+    if partition_count & (partition_count - 1) == 0:
+        hash_code &= 0xFFFFFFFF
+        return (hash_code ^ (hash_code >> 16)) & (partition_count - 1)
+    # abs of java's truncated remainder
+    return abs(hash_code) % partition_count
+
+
+class CacheAffinity:
+    def __init__(self, cache_id: int, key_configs: Dict[int, int], partition_nodes: List[Optional[uuid.UUID]]):
+        self.cache_id = cache_id
+        self.key_configs = key_configs
+        self.partition_nodes = partition_nodes
+
+    def partition(self, key: Any) -> Optional[int]:
+        if not self.partition_nodes:
+            return None
+        if isinstance(key, BinaryObject) and key.type_id in self.key_configs:
+            key = key.fields.get(self.key_configs[key.type_id])
+        hash_code = key_hash_code(key)
+        if hash_code is None:
+            return None
+        return rendezvous_partition(hash_code, len(self.partition_nodes))
+
+    def partition_node(self, partition: int) -> Optional[uuid.UUID]:
+        if 0 <= partition < len(self.partition_nodes):
+            return self.partition_nodes[partition]
+        return None
+
+    def node(self, key: Any) -> Optional[uuid.UUID]:
+        partition = self.partition(key)
+        return None if partition is None else self.partition_nodes[partition]
+
+
+class PartitionMap:
+    def __init__(self, topology_version: Tuple[int, int], caches: Dict[int, CacheAffinity]):
+        self.topology_version = topology_version
+        self.caches = caches
+
+    @staticmethod
+    def from_response(response: CachePartitionsResponse) -> 'PartitionMap':
+        caches = {}
+        for group in response.groups:
+            partition_nodes = [None] * sum(len(partitions) for partitions in group.partitions.values())
+            for node_id, partitions in group.partitions.items():
+                for partition in partitions:
+                    partition_nodes[partition] = node_id
+            for cache_id, key_configs in group.key_configs.items():
+                caches[cache_id] = CacheAffinity(cache_id, key_configs, partition_nodes)
+        return PartitionMap(tuple(response.topology_version), caches)
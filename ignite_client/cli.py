@@ -1,10 +1,187 @@
 #!/usr/bin/env python3
-import asyncio
+import argparse
+import contextlib
+import itertools
+import sys
+from typing import Any, Dict, Iterator, List, Optional
 
+from ignite_client.client import IgniteClient
+from ignite_client.export import CsvPageWriter, JsonLinesPageWriter, ParquetPageWriter, export_pages
+from ignite_client.loader import BulkLoader, CachePutAllSink, LoadResult, SqlInsertSink, read_csv_rows, \
+    read_jsonl_rows, LOAD_BATCH_SIZE, LOAD_MAX_IN_FLIGHT, LOAD_RETRIES
+from ignite_client.pool import IgniteConnectionPool
+from ignite_client.protocol import HandshakeRequest, HandshakeSuccess, QueryScanRequest, QuerySqlFieldsRequest, \
+    StatementType
+from ignite_client.transport import run
+from ignite_client.utils import cache_id
 
-async def main():
-    pass
+FORMATS = ('csv', 'jsonl', 'parquet')
+LOAD_FORMATS = ('csv', 'jsonl')
+COLUMN_TYPES = {'int': int, 'float': float, 'str': str, 'bool': lambda value: value.lower() in ('true', '1', 'yes')}
+
+
+def _add_connection_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=10800)
+    parser.add_argument('--username', default='')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--protocol-version', default='1.1.0', help="thin client protocol version, e.g. 1.4.0")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='ignite_client', description="Ignite thin client command line")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help="stream a query result or a whole cache to a file")
+    _add_connection_arguments(export_parser)
+    source = export_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--sql', help="SELECT statement to export")
+    source.add_argument('--scan', metavar='CACHE', help="name of a cache to export with a scan query")
+    export_parser.add_argument('--schema', default='PUBLIC')
+    export_parser.add_argument('--page-size', type=int, default=1024)
+    export_parser.add_argument('--format', choices=FORMATS, help="defaults to the output file extension")
+    export_parser.add_argument('--output', '-o', default='-', help="output file, - for stdout")
+
+    load_parser = commands.add_parser('load', help="bulk load a CSV or JSON Lines file into a table or cache")
+    _add_connection_arguments(load_parser)
+    load_parser.add_argument('--node', action='append', default=[], metavar='HOST:PORT',
+                             help="additional cluster node to spread the load over, may be repeated")
+    load_parser.add_argument('--input', '-i', required=True)
+    load_parser.add_argument('--format', choices=LOAD_FORMATS, help="defaults to the input file extension")
+    target = load_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--table', help="table to INSERT into")
+    target.add_argument('--cache', help="cache to put entries into")
+    load_parser.add_argument('--schema', default='PUBLIC')
+    load_parser.add_argument('--columns',
+                             help="comma separated columns to insert, defaults to the fields of the first row")
+    load_parser.add_argument('--key-column', help="column holding the cache key")
+    load_parser.add_argument('--value-column', help="column holding the cache value")
+    load_parser.add_argument('--value-type', help="binary type name for values built from the remaining columns")
+    load_parser.add_argument('--column-type', action='append', default=[], metavar='NAME=TYPE',
+                             help=f"convert a CSV column, TYPE is one of {', '.join(COLUMN_TYPES)}")
+    load_parser.add_argument('--batch-size', type=int, default=LOAD_BATCH_SIZE)
+    load_parser.add_argument('--max-in-flight', type=int, default=LOAD_MAX_IN_FLIGHT)
+    load_parser.add_argument('--retries', type=int, default=LOAD_RETRIES)
+    load_parser.add_argument('--connections', type=int, default=4, help="connections per node")
+    return parser.parse_args(argv)
+
+
+def new_handshake_request(args: argparse.Namespace) -> HandshakeRequest:
+    major, minor, patch = (int(part) for part in args.protocol_version.split('.'))
+    return HandshakeRequest(major, minor, patch, args.username, args.password)
+
+
+def output_format(args: argparse.Namespace) -> str:
+    if args.format is not None:
+        return args.format
+    for name in FORMATS:
+        if args.output.endswith('.' + name):
+            return name
+    return 'csv'
+
+
+def new_sql_request(args: argparse.Namespace) -> QuerySqlFieldsRequest:
+    return QuerySqlFieldsRequest(cache_id=0, schema=args.schema, cursor_page_size=args.page_size, max_rows=0,
+                                 sql=args.sql, query_arg_count=0, query_args=[], statement_type=StatementType.SELECT,
+                                 distributed_join=False, local_query=False, replicated_only=False,
+                                 enforce_join_order=False, collocated=False, lazy=True, timeout_milliseconds=0,
+                                 include_field_names=True)
+
+
+@contextlib.contextmanager
+def open_writer(args: argparse.Namespace, column_types: Optional[List[int]] = None):
+    name = output_format(args)
+    if name == 'parquet':
+        if args.output == '-':
+            raise ValueError("Parquet output needs a file")
+        yield ParquetPageWriter(args.output, column_types)
+        return
+    writer_type = CsvPageWriter if name == 'csv' else JsonLinesPageWriter
+    if args.output == '-':
+        yield writer_type(sys.stdout)
+        return
+    with open(args.output, 'w', newline='' if name == 'csv' else None, encoding='utf-8') as output:
+        yield writer_type(output)
+
+
+async def export(args: argparse.Namespace) -> int:
+    client = IgniteClient(args.host, args.port)
+    await client.connect()
+    try:
+        response = await client.handshake(new_handshake_request(args))
+        if not isinstance(response, HandshakeSuccess):
+            raise ConnectionError(f"Handshake failed: {response.error_message}")
+
+        first_page = None
+        if args.sql is not None:
+            first_page = await client.query_sql_fields(new_sql_request(args))
+            pages = client.sql_pages(first_page)
+            column_names = first_page.column_names
+            column_types = first_page.column_types
+        else:
+            pages = client.scan_pages(QueryScanRequest(cache_id(args.scan), args.page_size))
+            column_names = ['KEY', 'VALUE']
+            column_types = None
+        try:
+            with open_writer(args, column_types) as writer:
+                return await export_pages(pages, column_names, writer)
+        finally:
+            await pages.aclose()
+            # pages that never started, because the writer failed to open, leave the first page's cursor open
+            if first_page is not None and first_page.cursor_id in client.open_cursors():
+                await client.resource_close(first_page.cursor_id)
+    finally:
+        await client.close()
+
+
+def read_rows(args: argparse.Namespace) -> Iterator[Dict[str, Any]]:
+    if args.format == 'jsonl' or (args.format is None and args.input.endswith('.jsonl')):
+        return read_jsonl_rows(args.input)
+    converters = {}
+    for column_type in args.column_type:
+        name, _, type_name = column_type.partition('=')
+        if type_name not in COLUMN_TYPES:
+            raise ValueError(f"Unknown column type: {column_type}")
+        converters[name] = COLUMN_TYPES[type_name]
+    return read_csv_rows(args.input, converters)
+
+
+async def load(args: argparse.Namespace) -> LoadResult:
+    rows = read_rows(args)
+    if args.table is not None:
+        first_row = next(rows, None)
+        if first_row is None:
+            return LoadResult()
+        columns = args.columns.split(',') if args.columns else list(first_row)
+        sink = SqlInsertSink(args.table, columns, args.schema)
+        rows = itertools.chain([first_row], rows)
+    else:
+        if args.key_column is None:
+            raise ValueError("--key-column is required to load a cache")
+        sink = CachePutAllSink(cache_id(args.cache), args.key_column, args.value_column, args.value_type)
+
+    nodes = [(args.host, args.port)]
+    for node in args.node:
+        host, _, port = node.rpartition(':')
+        nodes.append((host, int(port)))
+    pool = IgniteConnectionPool(nodes, new_handshake_request(args), size_per_node=args.connections)
+    await pool.start()
+    try:
+        loader = BulkLoader(pool, sink, batch_size=args.batch_size, max_in_flight=args.max_in_flight,
+                            retries=args.retries)
+        return await loader.load(rows)
+    finally:
+        await pool.close()
+
+
+async def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    if args.command == 'export':
+        rows = await export(args)
+        print(f"exported {rows} rows", file=sys.stderr)
+    elif args.command == 'load':
+        result = await load(args)
+        print(f"loaded {result.rows} rows in {result.batches} batches ({result.retries} retries)", file=sys.stderr)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main())
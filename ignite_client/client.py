@@ -1,85 +1,753 @@
 import asyncio
+import contextlib
+import contextvars
+import dataclasses
+import functools
+import logging
+import time
+import uuid
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
 
+from ignite_client.codec import read_long
+from ignite_client.constants import OpConst
+from ignite_client.lazy import bind_column_names
+from ignite_client.metadata import ResultMetadataCache
+from ignite_client.metrics import ClientMetrics
+from ignite_client.page_size import AdaptivePageSize
 from ignite_client.protocol import HandshakeRequest, HandshakeResponse, decode_handshake_response, \
-    QuerySqlFieldsRequest, QuerySqlFieldsResponse, Request, Response
-from ignite_client.utils import AtomicInteger
+    QuerySqlFieldsRequest, QuerySqlFieldsResponse, QuerySqlFieldsTemplateCache, Request, Response, HandshakeSuccess, \
+    CachePartitionsResponse, QueryScanRequest, QueryScanResponse, QueryScanCursorGetPageResponse, StatementType
+from ignite_client.result_cache import SqlResultCache
+from ignite_client.transport import FrameProtocol
+from ignite_client.utils import AtomicInteger, pending_tasks
 
+WRITE_BUFFER_SIZE = 16 * 1024
+# result frames at least this large are decoded on the decode executor, when the client has one
+DECODE_OFFLOAD_THRESHOLD = 64 * 1024
+CACHE_CHUNK_SIZE = 1000
+CACHE_MAX_IN_FLIGHT = 16
+EXECUTE_MANY_MAX_IN_FLIGHT = 64
 
-class IgniteClient:
-    def __init__(self, host: str, port: int):
+# requests whose responses start with the id of the cursor they open
+_CURSOR_OPS = frozenset((OpConst.QUERY_SQL_FIELDS, OpConst.QUERY_SCAN))
+
+logger = logging.getLogger(__name__)
+
+# loop time at which the requests of the current context give up on their responses
+_DEADLINE: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('ignite_client_deadline', default=None)
+
+
+@contextlib.contextmanager
+def deadline(timeout: float):
+    # requests made in the block, and in tasks started from it, fail with asyncio.TimeoutError once timeout seconds
+    # have passed; a nested deadline can only shorten the one around it. the connection stays usable, as a late
+    # response is dropped when it arrives and a cursor it opened is closed
+    expires = asyncio.get_running_loop().time() + timeout
+    current = _DEADLINE.get()
+    token = _DEADLINE.set(expires if current is None else min(current, expires))
+    try:
+        yield
+    finally:
+        _DEADLINE.reset(token)
+
+
+def _expire(future: asyncio.Future):
+    if not future.done():
+        future.set_exception(asyncio.TimeoutError("Request deadline exceeded"))
+
+
+def _sized(decode_function, data: memoryview, **kwargs) -> Tuple[Any, int]:
+    return decode_function(data, **kwargs), len(data)
+
+
+# outcome of execute_many, by position of the parameter set: the update count of each statement that succeeded,
+# None for the failed ones, whose errors are in errors
+@dataclass
+class ExecuteManyResult:
+    update_counts: List[Optional[int]] = field(default_factory=list)
+    errors: Dict[int, Exception] = field(default_factory=dict)
+
+    @property
+    def updated(self) -> int:
+        return sum(count for count in self.update_counts if count is not None)
+
+
+class _OpenCursor:
+    __slots__ = ('request', 'page_size_key', 'matrix_decoder', 'copy_frame')
+
+    def __init__(self, request: Union[QuerySqlFieldsRequest, QueryScanRequest], page_size_key: Optional[tuple] = None,
+                 matrix_decoder: Optional[Callable] = None, copy_frame: bool = False):
+        # the request that opened the cursor, for the leak report
+        self.request = request
+        self.page_size_key = page_size_key
+        # later pages are decoded like the first one; a decoder of the caller's needs copies of the frames
+        self.matrix_decoder = matrix_decoder
+        self.copy_frame = copy_frame
+
+    def describe(self) -> str:
+        if isinstance(self.request, QueryScanRequest):
+            return f"scan of cache {self.request.cache_id}"
+        return self.request.sql
+
+
+class _PendingRequest:
+    __slots__ = ('future', 'decode_function', 'offload', 'copy_frame', 'opens_cursor', 'cursor_id', 'raw', 'size',
+                 'received', 'decoded')
+
+    def __init__(self, future: asyncio.Future, decode_function, offload: bool, copy_frame: bool,
+                 opens_cursor: bool = False):
+        self.future = future
+        self.decode_function = decode_function
+        self.offload = offload
+        self.copy_frame = copy_frame
+        self.opens_cursor = opens_cursor
+        # the cursor the response opened, if it has more pages; read off the frame whether or not it is decoded
+        self.cursor_id: Optional[int] = None
+        # set when the frame was too large to decode on the loop, and the future holds its bytes instead
+        self.raw = False
+        self.size = 0
+        self.received = 0.0
+        self.decoded = 0.0
+
+
+# one public method per protocol operation, along with the query helpers built on them
+class IgniteClient:  # pylint: disable=too-many-public-methods
+    def __init__(self, host: str, port: int, *, template_cache_size: int = 1024,
+                 result_cache: Optional[SqlResultCache] = None, metrics: Optional[ClientMetrics] = None,
+                 decode_executor: Optional[Executor] = None, decode_offload_threshold: int = DECODE_OFFLOAD_THRESHOLD,
+                 page_sizer: Optional[AdaptivePageSize] = None, result_metadata: Optional[ResultMetadataCache] = None,
+                 request_timeout: Optional[float] = None):
         self.host = host
         self.port = port
+        # client-side timeout of requests made outside of a deadline block, in seconds
+        self.request_timeout = request_timeout
+        self.result_cache = result_cache
+        self.metrics = metrics
+        # replaces the cursor page size of select queries with one learned from their earlier pages
+        self.page_sizer = page_sizer
+        # column names of repeated select queries, which are then no longer requested from the server
+        self.result_metadata = result_metadata
+        # cursors with pages left on the server, kept until they are exhausted or closed
+        self._cursors: Dict[int, _OpenCursor] = {}
+        # ids of abandoned cursor-opening requests, whose cursors are closed when their responses arrive
+        self._orphans: Set[int] = set()
+        self._reclaim_tasks = set()
+        # large result pages are decoded off the event loop; a process pool sidesteps the GIL, frames are
+        # sent to it as bytes and the decode functions are picklable
+        self.decode_executor = decode_executor
+        self.decode_offload_threshold = decode_offload_threshold
         self.request_id = AtomicInteger()
-        self.reader = None
-        self.writer = None
+        self.transport: Optional[asyncio.Transport] = None
+        self.protocol: Optional[FrameProtocol] = None
+        self.templates = QuerySqlFieldsTemplateCache(template_cache_size)
+        self._pending: Dict[int, _PendingRequest] = {}
+        self._handshake_waiter: Optional[asyncio.Future] = None
+        self._requests_sent = False
+        self._connection_error: Optional[ConnectionError] = None
+        self._write_buffer = bytearray(WRITE_BUFFER_SIZE)
+        self._write_length = 0
+        self._flush_task: Optional[asyncio.Task] = None
+        # set by a successful handshake at a version with partition awareness
+        self.partition_aware = False
+        self.node_id: Optional[uuid.UUID] = None
+        self.topology_version: Optional[Tuple[int, int]] = None
+        self.topology_listener: Optional[Callable[[Tuple[int, int]], None]] = None
 
     async def connect(self):
-        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.transport, self.protocol = await asyncio.get_running_loop().create_connection(
+            lambda: FrameProtocol(self._on_frame, self._on_connection_lost), self.host, self.port)
+        self._connection_error = None
 
-    async def _read_response(self, decode_function):
-        length_bytes = await self.reader.readexactly(4)
-        response_length = int.from_bytes(length_bytes, byteorder='little')
+    def is_connected(self) -> bool:
+        return self.transport is not None and not self.transport.is_closing() and self._connection_error is None
 
-        response_data = await self.reader.readexactly(response_length)
-        return decode_function(response_data)
+    def _on_frame(self, response_data: memoryview):
+        # called by the protocol for every response; the frame is only valid until this returns, so responses
+        # are decoded here and only copies leave it
+        waiter = self._handshake_waiter
+        if waiter is not None:
+            self._handshake_waiter = None
+            if not waiter.done():
+                waiter.set_result(bytes(response_data))
+            return
+        request_id, _ = read_long(response_data, 0)
+        if self.partition_aware:
+            self._check_topology(response_data)
+        pending = self._pending.pop(request_id, None)
+        if pending is None:
+            # the caller has given up on the request; a cursor it opened is closed here, as nobody else can
+            if request_id in self._orphans:
+                self._orphans.discard(request_id)
+                cursor_id = self._opened_cursor(response_data)
+                if cursor_id is not None:
+                    self._reclaim(cursor_id)
+            return
+        if pending.opens_cursor:
+            pending.cursor_id = self._opened_cursor(response_data)
+        if pending.future.done():
+            return
+        pending.size = len(response_data)
+        if pending.offload and self._offloads(response_data):
+            pending.raw = True
+            pending.future.set_result(bytes(response_data))
+            return
+        if pending.copy_frame:
+            response_data = bytes(response_data)
+        measured = self.metrics is not None
+        if measured:
+            pending.received = time.perf_counter()
+        try:
+            response = pending.decode_function(response_data, flags_header=self.partition_aware)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # a frame that fails to decode fails only its own request, which raises the error to its caller
+            pending.future.set_exception(e)
+        else:
+            pending.future.set_result(response)
+        if measured:
+            pending.decoded = time.perf_counter()
 
-    async def handshake(self, request: HandshakeRequest) -> HandshakeResponse:
-        if self.writer is None or self.reader is None:
-            raise ConnectionError("Client is not connected")
+    def _on_connection_lost(self, exc: Optional[Exception]):
+        error = ConnectionError("Connection closed") if exc is None else ConnectionError(f"Connection lost: {exc!r}")
+        self._connection_error = error
+        waiter, self._handshake_waiter = self._handshake_waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_exception(error)
+        pending = list(self._pending.values())
+        self._pending.clear()
+        # the server releases the cursors of a closed connection
+        self._orphans.clear()
+        for request in pending:
+            if not request.future.done():
+                request.future.set_exception(error)
+
+    def _check_topology(self, response_data: memoryview):
+        topology_version = Response.decode_topology_version(response_data)
+        if topology_version is not None and (self.topology_version is None or topology_version > self.topology_version):
+            self.topology_version = topology_version
+            if self.topology_listener is not None:
+                self.topology_listener(topology_version)
+
+    def _opened_cursor(self, response_data: memoryview) -> Optional[int]:
+        # the body of a cursor-opening response starts with the cursor id and ends with its has_more flag
+        _, status_code, _, offset = Response.decode_common(response_data, self.partition_aware)
+        if status_code != 0 or not response_data[-1]:
+            return None
+        return read_long(response_data, offset)[0]
+
+    def _reclaim(self, cursor_id: int):
+        # closes a cursor in the background
+        self._cursors.pop(cursor_id, None)
+        if not self.is_connected():
+            return
+        task = asyncio.get_running_loop().create_task(self._close_cursor(cursor_id))
+        self._reclaim_tasks.add(task)
+        task.add_done_callback(self._reclaim_tasks.discard)
+
+    async def _close_cursor(self, cursor_id: int):
+        # the cursor is closed whatever the deadline of the caller, and in the background if they are cancelled
+        token = _DEADLINE.set(None)
+        try:
+            await self.resource_close(cursor_id)
+        except asyncio.CancelledError:
+            self._reclaim(cursor_id)
+            raise
+        except (OSError, asyncio.TimeoutError):
+            # a lost connection has released the cursor already, and one that timed out is left to the server
+            pass
+        finally:
+            _DEADLINE.reset(token)
 
-        self.writer.write(request.encode())
-        await self.writer.drain()
+    async def _release_cursor(self, cursor_id: int, next_page: Optional[asyncio.Future]):
+        # called when the consumer of a cursor stops early. the server releases a cursor by itself once its last page
+        # has been read, so the prefetched page, which may be that one, is waited for before closing
+        if next_page is not None:
+            try:
+                await asyncio.wait([next_page])
+            except asyncio.CancelledError:
+                # the cursor is closed in the background once the page has arrived
+                self._cursors.pop(cursor_id, None)
+                next_page.add_done_callback(functools.partial(self._release_after_page, cursor_id))
+                raise
+            if not next_page.cancelled():
+                # a page nobody reads any more is not reported as an unhandled error
+                next_page.exception()
+        # reading the last page has removed the cursor already
+        if cursor_id in self._cursors:
+            await self._close_cursor(cursor_id)
 
-        return await self._read_response(decode_handshake_response)
+    def _release_after_page(self, cursor_id: int, next_page: asyncio.Future):
+        if not next_page.cancelled() and next_page.exception() is None and next_page.result().has_more:
+            self._reclaim(cursor_id)
 
-    async def query_sql_fields(self, request: QuerySqlFieldsRequest) -> QuerySqlFieldsResponse:
-        if self.writer is None or self.reader is None:
+    def _start_deadline(self, future: asyncio.Future) -> Optional[asyncio.TimerHandle]:
+        expires = _DEADLINE.get()
+        if expires is None and self.request_timeout is None:
+            return None
+        loop = asyncio.get_running_loop()
+        if expires is None:
+            expires = loop.time() + self.request_timeout
+        elif expires <= loop.time():
+            raise asyncio.TimeoutError("Request deadline exceeded")
+        return loop.call_at(expires, _expire, future)
+
+    def _abandon(self, request_id: int, pending: '_PendingRequest'):
+        # called when the caller gives up on a request, which leaves any cursor it opened to the client to close
+        if not pending.opens_cursor:
+            return
+        if request_id in self._pending:
+            self._orphans.add(request_id)
+        elif pending.cursor_id is not None:
+            self._reclaim(pending.cursor_id)
+
+    def _check_connection(self):
+        if self.transport is None:
             raise ConnectionError("Client is not connected")
+        if self._connection_error is not None:
+            raise ConnectionError("Connection lost")
 
-        request_id = self.request_id.increment()
-        encoded_request = Request.new_query_sql_fields(request_id, request).encode()
-        self.writer.write(encoded_request)
-        await self.writer.drain()
+    def _write_frame(self, frame) -> int:
+        # frames queued in the same loop iteration are encoded back to back and flushed together
+        frame_length = frame.frame_length()
+        end = self._write_length + frame_length
+        if end > len(self._write_buffer):
+            self._write_buffer.extend(bytes(max(end, 2 * len(self._write_buffer)) - len(self._write_buffer)))
+        self._write_length = frame.encode_into(self._write_buffer, self._write_length)
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush())
+        return frame_length
+
+    async def _flush(self):
+        try:
+            while self._write_length:
+                buffer, length = self._write_buffer, self._write_length
+                self._write_length = 0
+                self.transport.write(memoryview(buffer)[:length])
+                if self.transport.get_write_buffer_size():
+                    # the transport keeps a reference to the data it could not send yet, so continue in a fresh
+                    # buffer; otherwise the same one is reused
+                    self._write_buffer = bytearray(max(WRITE_BUFFER_SIZE, length))
+                await self.protocol.drain()
+        except OSError:
+            # losing the transport fails the pending requests
+            self.transport.close()
+        finally:
+            self._flush_task = None
+
+    async def _send_request(self, request_id: int, frame, decode_function, offload: bool = False,
+                            copy_frame: bool = False):
+        # responses are dispatched by request id, so many requests may share the connection. a decoder that
+        # keeps a reference to the frame (as custom matrix decoders may) needs copy_frame
+        self._check_connection()
+        self._requests_sent = True
+        pending = _PendingRequest(asyncio.get_running_loop().create_future(), decode_function, offload, copy_frame,
+                                  frame.op_code in _CURSOR_OPS)
+        timer = self._start_deadline(pending.future)
+        if self.metrics is not None:
+            return await self._send_request_measured(request_id, frame, pending, timer)
 
-        response = await self._read_response(
-            lambda data: Response.decode_query_sql_fields(data, includes_field_names=request.include_field_names))
+        self._pending[request_id] = pending
+        try:
+            self._write_frame(frame)
+            response = await pending.future
+            if pending.raw:
+                response = await self._decode_offloaded(response, decode_function)
+        except BaseException:
+            self._abandon(request_id, pending)
+            raise
+        finally:
+            self._pending.pop(request_id, None)
+            if timer is not None:
+                timer.cancel()
+        return response
+
+    def _offloads(self, response_data: memoryview) -> bool:
+        return self.decode_executor is not None and len(response_data) >= self.decode_offload_threshold
+
+    async def _decode_offloaded(self, response_data: bytes, decode_function):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.decode_executor, functools.partial(decode_function, response_data, flags_header=self.partition_aware))
+
+    async def _send_request_measured(self, request_id: int, frame, pending: '_PendingRequest',
+                                     timer: Optional[asyncio.TimerHandle]):
+        # the wait phase runs from the frame being queued until its response has been read
+        metrics = self.metrics
+        self._pending[request_id] = pending
+        metrics.request_started()
+        try:
+            start = time.perf_counter()
+            bytes_out = self._write_frame(frame)
+            encoded = time.perf_counter()
+            response = await pending.future
+            if pending.raw:
+                received = time.perf_counter()
+                response = await self._decode_offloaded(response, pending.decode_function)
+                decoded = time.perf_counter()
+            else:
+                received, decoded = pending.received, pending.decoded
+        except BaseException:
+            self._abandon(request_id, pending)
+            metrics.request_failed()
+            raise
+        finally:
+            self._pending.pop(request_id, None)
+            if timer is not None:
+                timer.cancel()
+        metrics.request_finished(frame.op_code, encoded - start, received - encoded, decoded - received, bytes_out,
+                                 4 + pending.size)
+        return response
+
+    async def handshake(self, request: HandshakeRequest) -> HandshakeResponse:
+        self._check_connection()
+        if self._requests_sent:
+            raise Exception("Handshake must be performed before any other request")
+
+        waiter = self._handshake_waiter = asyncio.get_running_loop().create_future()
+        timer = self._start_deadline(waiter)
+        try:
+            self.transport.write(request.encode())
+            await self.protocol.drain()
+            response_data = await waiter
+        except BaseException:
+            # a handshake response arriving later would be taken for the response to another request
+            self._handshake_waiter = None
+            self.transport.close()
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+        has_node_id = request.supports_partition_awareness()
+        response = decode_handshake_response(response_data, has_node_id=has_node_id)
+        if isinstance(response, HandshakeSuccess) and has_node_id:
+            self.partition_aware = True
+            self.node_id = response.node_id
+        return response
+
+    async def query_sql_fields(self, request: QuerySqlFieldsRequest,
+                               matrix_decoder: Callable = None) -> QuerySqlFieldsResponse:
+        if self.result_cache is not None and request.statement_type == StatementType.SELECT:
+            return await self.result_cache.get_or_load(SqlResultCache.key(request, matrix_decoder),
+                                                       lambda: self._query_sql_fields(request, matrix_decoder))
+        response, _ = await self._query_sql_fields(request, matrix_decoder)
+        return response
+
+    async def _query_sql_fields(self, request: QuerySqlFieldsRequest,
+                                matrix_decoder: Callable = None) -> Tuple[QuerySqlFieldsResponse, int]:
+        select = request.statement_type == StatementType.SELECT
+        page_sizer = self.page_sizer if select else None
+        if page_sizer is not None:
+            page_size = page_sizer.page_size(AdaptivePageSize.key(request), request.cursor_page_size)
+            if page_size != request.cursor_page_size:
+                request = dataclasses.replace(request, cursor_page_size=page_size)
+        metadata_cache = self.result_metadata
+        metadata = None
+        if metadata_cache is not None:
+            if select:
+                metadata = metadata_cache.get(ResultMetadataCache.key(request))
+            elif ResultMetadataCache.is_ddl(request.sql):
+                metadata_cache.invalidate()
+        include_field_names = request.include_field_names
+        copy_frame = matrix_decoder is not None
+        if metadata is not None:
+            if include_field_names:
+                request = dataclasses.replace(request, include_field_names=False)
+            matrix_decoder = matrix_decoder or metadata.matrix_decoder
+        request_id = self.request_id.increment()
+        response, size = await self._send_request(
+            request_id,
+            self.templates.get(request).bind(request_id, request),
+            functools.partial(_sized, Response.decode_query_sql_fields,
+                              includes_field_names=request.include_field_names, matrix_decoder=matrix_decoder),
+            offload=True, copy_frame=copy_frame)
         if response.status_code != 0:
             raise Exception(f"Error: {response.error_message}")
 
         if isinstance(response.body, QuerySqlFieldsResponse):
-            return response.body
+            body = response.body
+            if metadata is not None:
+                if body.column_count != len(metadata.column_names):
+                    # the result no longer has the shape that was cached, so a caller who wants the field names gets
+                    # them by running the query again, which caches the new shape
+                    metadata_cache.invalidate(ResultMetadataCache.key(request))
+                    if include_field_names:
+                        if body.has_more:
+                            await self._close_cursor(body.cursor_id)
+                        return await self._query_sql_fields(dataclasses.replace(request, include_field_names=True),
+                                                            matrix_decoder if copy_frame else None)
+                elif include_field_names:
+                    body.column_names = metadata.column_names
+                    body.column_types = metadata.column_types
+            elif metadata_cache is not None and select and include_field_names:
+                metadata_cache.put(ResultMetadataCache.key(request), body.column_names, body.column_types)
+            bind_column_names(body.data, body.column_names)
+            if body.has_more:
+                self._cursors[body.cursor_id] = _OpenCursor(
+                    request, AdaptivePageSize.key(request) if page_sizer is not None else None, matrix_decoder,
+                    copy_frame)
+            if page_sizer is not None:
+                page_sizer.record(AdaptivePageSize.key(request), body.first_page_row_count, size)
+            return body, size
         raise Exception("Unexpected response type")
 
-    async def query_sql_fields_cursor_get_page(self, cursor_id: int, column_count: int):
-        if self.writer is None or self.reader is None:
-            raise ConnectionError("Client is not connected")
+    async def query_sql_fields_cursor_get_page(self, cursor_id: int, column_count: int,
+                                               matrix_decoder: Callable = None):
+        request_id = self.request_id.increment()
+        cursor = self._cursors.get(cursor_id)
+        copy_frame = matrix_decoder is not None
+        if cursor is not None and matrix_decoder is None:
+            matrix_decoder = cursor.matrix_decoder
+            copy_frame = cursor.copy_frame
+        start = time.perf_counter()
+        response, size = await self._send_request(
+            request_id,
+            Request.new_query_sql_fields_cursor_get_page(request_id, cursor_id),
+            functools.partial(_sized, Response.decode_query_sql_fields_cursor_get_page, column_count=column_count,
+                              matrix_decoder=matrix_decoder),
+            offload=True, copy_frame=copy_frame
+        )
+        if response.status_code != 0:
+            raise Exception(f"Error: {response.error_message}")
+
+        self._record_page(cursor, cursor_id, response.body, size, start)
+        return response.body
+
+    async def sql(self, request: QuerySqlFieldsRequest, matrix_decoder: Callable = None) -> AsyncIterator[List[Any]]:
+        pages = self.sql_pages(await self.query_sql_fields(request, matrix_decoder), matrix_decoder)
+        try:
+            async for rows in pages:
+                for row in rows:
+                    yield row
+        finally:
+            await pages.aclose()
+
+    async def sql_pages(self, response: QuerySqlFieldsResponse,
+                        matrix_decoder: Callable = None) -> AsyncIterator[List[List[Any]]]:
+        # pages of the cursor opened by response, starting with its first page
+        cursor_id = response.cursor_id
+        column_count = response.column_count
+        rows, has_more = response.data, response.has_more
+        next_page = None
+        pages = 1
+        try:
+            while True:
+                # keep the next page in flight while the caller consumes the current one
+                if has_more:
+                    next_page = asyncio.ensure_future(
+                        self.query_sql_fields_cursor_get_page(cursor_id, column_count, matrix_decoder))
+                yield rows
+                if not has_more:
+                    return
+                page = await next_page
+                next_page = None
+                pages += 1
+                rows, has_more = page.data, page.has_more
+                bind_column_names(rows, response.column_names)
+        finally:
+            if has_more:
+                await self._release_cursor(cursor_id, next_page)
+            self._cursors.pop(cursor_id, None)
+            if self.metrics is not None:
+                self.metrics.cursor_finished(OpConst.QUERY_SQL_FIELDS, pages)
+
+    async def execute_many(self, sql: str, rows: Iterable[Sequence[Any]], *, schema: str = 'PUBLIC', cache_id: int = 0,
+                           max_in_flight: int = EXECUTE_MANY_MAX_IN_FLIGHT,
+                           timeout_milliseconds: int = 0) -> ExecuteManyResult:
+        # runs sql once per parameter set, with up to max_in_flight statements pipelined on the connection; a
+        # failed statement is recorded and the others carry on
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be positive")
+        result = ExecuteManyResult()
+        window = asyncio.Semaphore(max_in_flight)
 
+        async def execute(index: int, args: List[Any]):
+            try:
+                response, _ = await self._query_sql_fields(QuerySqlFieldsRequest(
+                    cache_id=cache_id, schema=schema, cursor_page_size=1, max_rows=0, sql=sql,
+                    query_arg_count=len(args), query_args=args, statement_type=StatementType.UPDATE,
+                    distributed_join=False, local_query=False, replicated_only=False, enforce_join_order=False,
+                    collocated=False, lazy=False, timeout_milliseconds=timeout_milliseconds,
+                    include_field_names=False))
+                # the update count comes back as a one-cell result
+                result.update_counts[index] = response.data[0][0] if response.data else 0
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # server errors come back as plain exceptions; each one is the result of its own statement
+                result.errors[index] = e
+            finally:
+                window.release()
+
+        async with pending_tasks() as in_flight:
+            for index, args in enumerate(rows):
+                await window.acquire()
+                result.update_counts.append(None)
+                task = asyncio.ensure_future(execute(index, list(args)))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+        return result
+
+    async def query_scan(self, request: QueryScanRequest) -> QueryScanResponse:
+        page_sizer = self.page_sizer
+        if page_sizer is not None:
+            page_size = page_sizer.page_size(AdaptivePageSize.key(request), request.page_size)
+            if page_size != request.page_size:
+                request = dataclasses.replace(request, page_size=page_size)
         request_id = self.request_id.increment()
-        encoded_request = Request.new_query_sql_fields_cursor_get_page(request_id, cursor_id).encode()
-        self.writer.write(encoded_request)
-        await self.writer.drain()
+        response, size = await self._send_request(request_id, Request.new_query_scan(request_id, request),
+                                                  functools.partial(_sized, Response.decode_query_scan), offload=True)
+        if response.status_code != 0:
+            raise Exception(f"Error: {response.error_message}")
 
-        response = await self._read_response(
-            lambda data: Response.decode_query_sql_fields_cursor_get_page(data, column_count)
-        )
+        body = response.body
+        key = AdaptivePageSize.key(request) if page_sizer is not None else None
+        if key is not None:
+            page_sizer.record(key, len(body.data), size)
+        if body.has_more:
+            self._cursors[body.cursor_id] = _OpenCursor(request, key)
+        return body
+
+    async def query_scan_cursor_get_page(self, cursor_id: int) -> QueryScanCursorGetPageResponse:
+        request_id = self.request_id.increment()
+        cursor = self._cursors.get(cursor_id)
+        start = time.perf_counter()
+        response, size = await self._send_request(
+            request_id, Request.new_query_scan_cursor_get_page(request_id, cursor_id),
+            functools.partial(_sized, Response.decode_query_scan_cursor_get_page), offload=True)
         if response.status_code != 0:
             raise Exception(f"Error: {response.error_message}")
 
+        self._record_page(cursor, cursor_id, response.body, size, start)
         return response.body
 
-    async def resource_close(self, resource_id: int):
-        if self.writer is None or self.reader is None:
-            raise ConnectionError("Client is not connected")
+    def _record_page(self, cursor: Optional['_OpenCursor'], cursor_id: int, page, size: int, start: float):
+        if cursor is None:
+            return
+        if cursor.page_size_key is not None and self.page_sizer is not None:
+            self.page_sizer.record(cursor.page_size_key, len(page.data), size, time.perf_counter() - start)
+        if not page.has_more:
+            self._cursors.pop(cursor_id, None)
+
+    async def scan_pages(self, request: QueryScanRequest) -> AsyncIterator[List[Tuple[Any, Any]]]:
+        response = await self.query_scan(request)
+        cursor_id = response.cursor_id
+        entries, has_more = response.data, response.has_more
+        next_page = None
+        pages = 1
+        try:
+            while True:
+                if has_more:
+                    next_page = asyncio.ensure_future(self.query_scan_cursor_get_page(cursor_id))
+                yield entries
+                if not has_more:
+                    return
+                page = await next_page
+                next_page = None
+                pages += 1
+                entries, has_more = page.data, page.has_more
+        finally:
+            if has_more:
+                await self._release_cursor(cursor_id, next_page)
+            self._cursors.pop(cursor_id, None)
+            if self.metrics is not None:
+                self.metrics.cursor_finished(OpConst.QUERY_SCAN, pages)
 
+    async def scan(self, request: QueryScanRequest) -> AsyncIterator[Tuple[Any, Any]]:
+        pages = self.scan_pages(request)
+        try:
+            async for entries in pages:
+                for entry in entries:
+                    yield entry
+        finally:
+            await pages.aclose()
+
+    async def resource_close(self, resource_id: int):
+        self._cursors.pop(resource_id, None)
         request_id = self.request_id.increment()
-        encoded_request = Request.new_resource_close(request_id, resource_id).encode()
-        self.writer.write(encoded_request)
-        await self.writer.drain()
+        response = await self._send_request(
+            request_id,
+            Request.new_resource_close(request_id, resource_id),
+            Response.decode_resource_close
+        )
+        if response.status_code != 0:
+            raise Exception(f"Error: {response.error_message}")
 
-        response = await self._read_response(Response.decode_resource_close)
+    async def _cache_request(self, request: Request, decode_function):
+        response = await self._send_request(request.request_id, request, decode_function)
         if response.status_code != 0:
             raise Exception(f"Error: {response.error_message}")
+        return response.body
+
+    @staticmethod
+    async def _map_chunks(items: List[Any], chunk_size: int, max_in_flight: int, function) -> List[Any]:
+        # large key sets are split into chunks that are pipelined on the connection within a bounded window
+        semaphore = asyncio.Semaphore(max_in_flight)
+
+        async def run(chunk):
+            async with semaphore:
+                return await function(chunk)
+
+        return await asyncio.gather(*[run(items[i:i + chunk_size]) for i in range(0, len(items), chunk_size)])
+
+    async def cache_get(self, cache_id: int, key: Any) -> Any:
+        request = Request.new_cache_get(self.request_id.increment(), cache_id, key)
+        return await self._cache_request(request, Response.decode_cache_value)
+
+    async def cache_put(self, cache_id: int, key: Any, value: Any):
+        request = Request.new_cache_put(self.request_id.increment(), cache_id, key, value)
+        await self._cache_request(request, Response.decode_resource_close)
+
+    async def cache_get_all(self, cache_id: int, keys: Iterable[Any], chunk_size: int = CACHE_CHUNK_SIZE,
+                            max_in_flight: int = CACHE_MAX_IN_FLIGHT) -> Dict[Any, Any]:
+        async def get_chunk(chunk):
+            request = Request.new_cache_get_all(self.request_id.increment(), cache_id, chunk)
+            return await self._cache_request(request, Response.decode_cache_entries)
+
+        entries = {}
+        for chunk_entries in await self._map_chunks(list(keys), chunk_size, max_in_flight, get_chunk):
+            entries.update(chunk_entries)
+        return entries
+
+    async def cache_put_all(self, cache_id: int, entries: Union[Dict[Any, Any], Iterable[Tuple[Any, Any]]],
+                            chunk_size: int = CACHE_CHUNK_SIZE, max_in_flight: int = CACHE_MAX_IN_FLIGHT):
+        async def put_chunk(chunk):
+            request = Request.new_cache_put_all(self.request_id.increment(), cache_id, chunk)
+            await self._cache_request(request, Response.decode_resource_close)
+
+        entries = list(entries.items()) if isinstance(entries, dict) else list(entries)
+        await self._map_chunks(entries, chunk_size, max_in_flight, put_chunk)
+
+    async def cache_contains_keys(self, cache_id: int, keys: Iterable[Any], chunk_size: int = CACHE_CHUNK_SIZE,
+                                  max_in_flight: int = CACHE_MAX_IN_FLIGHT) -> bool:
+        async def contains_chunk(chunk):
+            request = Request.new_cache_contains_keys(self.request_id.increment(), cache_id, chunk)
+            return await self._cache_request(request, Response.decode_cache_bool)
+
+        return all(await self._map_chunks(list(keys), chunk_size, max_in_flight, contains_chunk))
+
+    async def cache_remove_all(self, cache_id: int):
+        request = Request.new_cache_remove_all(self.request_id.increment(), cache_id)
+        await self._cache_request(request, Response.decode_resource_close)
+
+    async def cache_partitions(self, cache_ids: List[int]) -> CachePartitionsResponse:
+        request = Request.new_cache_partitions(self.request_id.increment(), cache_ids)
+        return await self._cache_request(request, Response.decode_cache_partitions)
+
+    def open_cursors(self) -> Dict[int, str]:
+        # cursors still open on the server, by id, with the query or scan that opened them
+        return {cursor_id: cursor.describe() for cursor_id, cursor in self._cursors.items()}
 
-    async def close(self):
-        if self.writer:
-            self.writer.close()
+    async def close(self) -> Dict[int, str]:
+        # returns the cursors that were opened and never exhausted or closed, which closing the connection releases
+        leaked = self.open_cursors()
+        if leaked:
+            logger.warning("Closing connection to %s:%d with %d open cursors: %s", self.host, self.port, len(leaked),
+                           "; ".join(f"{cursor_id}: {query}" for cursor_id, query in leaked.items()))
+        self._cursors.clear()
+        for task in list(self._reclaim_tasks):
+            task.cancel()
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        if self.transport is not None:
+            # the pending requests fail once the transport reports the connection lost
+            self.transport.close()
+        return leaked
@@ -0,0 +1,716 @@
+import datetime
+import decimal
+import struct
+import sys
+import uuid
+from array import array
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from ignite_client.utils import java_hash_code, to_int32
+
+# decoders accept bytes or memoryview and never slice fixed-width values out of the frame
+BYTE = struct.Struct('<B')
+# byte cells are java bytes, which are signed
+SIGNED_BYTE = struct.Struct('<b')
+SHORT = struct.Struct('<h')
+INT = struct.Struct('<i')
+LONG = struct.Struct('<q')
+FLOAT = struct.Struct('<f')
+DOUBLE = struct.Struct('<d')
+BOOL = struct.Struct('<?')
+
+FIXED_CELLS = {
+    1: SIGNED_BYTE,
+    2: SHORT,
+    3: INT,
+    4: LONG,
+    5: FLOAT,
+    6: DOUBLE,
+    8: BOOL,
+}
+
+
+_TYPED_LONG = struct.Struct('<Bq')
+_TYPED_DOUBLE = struct.Struct('<Bd')
+_TYPED_BOOL = struct.Struct('<B?')
+_TYPED_LENGTH = struct.Struct('<Bi')
+_TYPED_UUID = struct.Struct('<Bqq')
+_TYPED_TIMESTAMP = struct.Struct('<Bqi')
+_TYPED_DECIMAL = struct.Struct('<Bii')
+_TYPED_ENUM = struct.Struct('<Bii')
+
+_BINARY_HEADER = struct.Struct('<BBhiiiii')
+_BINARY_FIELD = struct.Struct('<ii')
+
+# array.array typecodes of the primitive array element types, which arrive little-endian and are copied out of
+# the frame in one piece
+_INT_TYPECODE = 'i' if array('i').itemsize == 4 else 'l'
+PRIMITIVE_ARRAYS = {
+    13: 'h',
+    14: _INT_TYPECODE,
+    15: 'q',
+    16: 'f',
+    17: 'd',
+}
+_ARRAY_TYPE_CODES = {typecode: type_code for type_code, typecode in PRIMITIVE_ARRAYS.items()}
+_ARRAY_TYPE_CODES['l'] = 15 if array('l').itemsize == 8 else 14
+_ARRAY_TYPE_CODES.update(b=12, B=12)
+_BIG_ENDIAN = sys.byteorder == 'big'
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_LONG_MIN = -(1 << 63)
+_LONG_MAX = (1 << 63) - 1
+
+
+def read_matrix(data: bytes, offset: int, first_page_row_count: int, column_count: int) -> (list, int):
+    fixed_cells = FIXED_CELLS
+    unpack_int = INT.unpack_from
+    matrix = []
+    for _ in range(first_page_row_count):
+        row = []
+        append = row.append
+        for _ in range(column_count):
+            type_code = data[offset]
+            offset += 1
+            unpacker = fixed_cells.get(type_code)
+            if unpacker is not None:
+                append(unpacker.unpack_from(data, offset)[0])
+                offset += unpacker.size
+            elif type_code == 9:
+                length = unpack_int(data, offset)[0]
+                offset += 4
+                append(str(data[offset:offset + length], 'utf-8'))
+                offset += length
+            elif type_code == 12:
+                length = unpack_int(data, offset)[0]
+                offset += 4
+                append(bytes(data[offset:offset + length]))
+                offset += length
+            elif type_code == 101:
+                append(None)
+            else:
+                reader = _OBJECT_READERS.get(type_code)
+                if reader is None:
+                    raise Exception(f"Unexpected type code: {type_code}")
+                value, offset = reader(data, offset)
+                append(value)
+        matrix.append(row)
+    return matrix, offset
+
+
+# matrix decoder for results whose columns are known to hold the given fixed-width types: a row of such cells is
+# unpacked with one struct call, and a row that does not match (a null, say) is decoded cell by cell
+class FixedRowDecoder:
+    def __init__(self, type_codes: List[int]):
+        if not type_codes or any(type_code not in FIXED_CELLS for type_code in type_codes):
+            raise ValueError(f"Not all fixed-width type codes: {type_codes}")
+        self.type_codes = tuple(type_codes)
+        self.row = struct.Struct('<' + ''.join('B' + FIXED_CELLS[type_code].format[1:] for type_code in type_codes))
+
+    def __reduce__(self):
+        return FixedRowDecoder, (list(self.type_codes),)
+
+    def __call__(self, data: bytes, offset: int, row_count: int, column_count: int) -> (list, int):
+        if column_count != len(self.type_codes):
+            return read_matrix(data, offset, row_count, column_count)
+        type_codes = self.type_codes
+        unpack_row = self.row.unpack_from
+        row_size = self.row.size
+        end = len(data)
+        matrix = []
+        append = matrix.append
+        for _ in range(row_count):
+            if offset + row_size <= end:
+                values = unpack_row(data, offset)
+                if values[0::2] == type_codes:
+                    append(list(values[1::2]))
+                    offset += row_size
+                    continue
+            rows, offset = read_matrix(data, offset, 1, column_count)
+            append(rows[0])
+        return matrix, offset
+
+
+def read_row_type_codes(data: bytes, offset: int, column_count: int) -> List[int]:
+    # type codes of the cells of the row at offset
+    type_codes = []
+    for _ in range(column_count):
+        type_codes.append(data[offset])
+        offset = skip_object(data, offset)
+    return type_codes
+
+
+def read_struct(unpacker: struct.Struct, data: bytes, offset: int) -> (tuple, int):
+    return unpacker.unpack_from(data, offset), offset + unpacker.size
+
+
+def put_string(buffer: bytearray, offset: int, value: str) -> int:
+    encoded_string = value.encode('utf-8')
+    offset = put_byte(buffer, offset, 9)
+    offset = put_int(buffer, offset, len(encoded_string))
+    offset = put_bytes(buffer, offset, encoded_string)
+    return offset
+
+
+def read_string(data: bytes, offset: int) -> (str, int):
+    return read_string_no_type(data, offset + 1)
+
+
+def read_string_no_type(data: bytes, offset: int) -> (str, int):
+    length = INT.unpack_from(data, offset)[0]
+    offset += 4
+    value = str(data[offset:offset + length], 'utf-8')
+    return value, offset + length
+
+
+def put_bytes(buffer: bytearray, offset: int, value: bytes) -> int:
+    buffer[offset:offset + len(value)] = value
+    return offset + len(value)
+
+
+def read_bytes(data: bytes, offset: int) -> (bytes, int):
+    length = INT.unpack_from(data, offset)[0]
+    offset += 4
+    value = bytes(data[offset:offset + length])
+    return value, offset + length
+
+
+def put_short(buffer: bytearray, offset: int, value: int) -> int:
+    SHORT.pack_into(buffer, offset, value)
+    return offset + 2
+
+
+def read_short(data: bytes, offset: int) -> (int, int):
+    return SHORT.unpack_from(data, offset)[0], offset + 2
+
+
+def put_int(buffer: bytearray, offset: int, value: int) -> int:
+    INT.pack_into(buffer, offset, value)
+    return offset + 4
+
+
+def read_int(data: bytes, offset: int) -> (int, int):
+    return INT.unpack_from(data, offset)[0], offset + 4
+
+
+def put_long(buffer: bytearray, offset: int, value: int) -> int:
+    LONG.pack_into(buffer, offset, value)
+    return offset + 8
+
+
+def read_long(data: bytes, offset: int) -> (int, int):
+    return LONG.unpack_from(data, offset)[0], offset + 8
+
+
+def read_float(data: bytes, offset: int) -> (float, int):
+    return FLOAT.unpack_from(data, offset)[0], offset + 4
+
+
+def read_double(data: bytes, offset: int) -> (float, int):
+    return DOUBLE.unpack_from(data, offset)[0], offset + 8
+
+
+def put_bool(buffer: bytearray, offset: int, value: bool) -> int:
+    buffer[offset] = int(value)
+    return offset + 1
+
+
+def read_bool(data: bytes, offset: int) -> (bool, int):
+    return data[offset] != 0, offset + 1
+
+
+def put_byte(buffer: bytearray, offset: int, value: int) -> int:
+    buffer[offset] = value
+    return offset + 1
+
+
+def read_byte(data: bytes, offset: int) -> (int, int):
+    return data[offset], offset + 1
+
+
+def utf8_length(value: str) -> int:
+    return len(value) if value.isascii() else len(value.encode('utf-8'))
+
+
+def string_length(value: str) -> int:
+    return 1 + 4 + utf8_length(value)
+
+
+def _object_codec(value):
+    codec = _OBJECT_CODECS.get(type(value))
+    if codec is None:
+        # subclasses fall back to the first matching base type, so bool is listed before int
+        for value_type, candidate in _OBJECT_CODECS.items():
+            if isinstance(value, value_type):
+                return candidate
+        raise TypeError(f"Unsupported argument type: {type(value).__name__}")
+    return codec
+
+
+def object_length(value) -> int:
+    return _object_codec(value)[0](value)
+
+
+def put_object(buffer: bytearray, offset: int, value) -> int:
+    return _object_codec(value)[1](buffer, offset, value)
+
+
+def objects_length(values) -> int:
+    return sum(object_length(value) for value in values)
+
+
+def put_objects(buffer: bytearray, offset: int, values) -> int:
+    for value in values:
+        offset = put_object(buffer, offset, value)
+    return offset
+
+
+def encode_objects(values) -> bytes:
+    buffer = bytearray(objects_length(values))
+    put_objects(buffer, 0, values)
+    return bytes(buffer)
+
+
+def encode_object(value) -> bytes:
+    return encode_objects((value,))
+
+
+def _put_typed(packer: struct.Struct, type_code: int):
+    def put(buffer: bytearray, offset: int, value) -> int:
+        packer.pack_into(buffer, offset, type_code, value)
+        return offset + packer.size
+    return put
+
+
+def _put_null(buffer: bytearray, offset: int, _) -> int:
+    return put_byte(buffer, offset, 101)
+
+
+def _int_length(value: int) -> int:
+    if _LONG_MIN <= value <= _LONG_MAX:
+        return _TYPED_LONG.size
+    return _decimal_length(decimal.Decimal(value))
+
+
+def _put_int(buffer: bytearray, offset: int, value: int) -> int:
+    if _LONG_MIN <= value <= _LONG_MAX:
+        _TYPED_LONG.pack_into(buffer, offset, 4, value)
+        return offset + _TYPED_LONG.size
+    return _put_decimal(buffer, offset, decimal.Decimal(value))
+
+
+def _put_bytes(buffer: bytearray, offset: int, value: bytes) -> int:
+    _TYPED_LENGTH.pack_into(buffer, offset, 12, len(value))
+    return put_bytes(buffer, offset + _TYPED_LENGTH.size, value)
+
+
+def _put_uuid(buffer: bytearray, offset: int, value: uuid.UUID) -> int:
+    uuid_bytes = value.bytes
+    _TYPED_UUID.pack_into(buffer, offset, 10, int.from_bytes(uuid_bytes[:8], 'big', signed=True),
+                          int.from_bytes(uuid_bytes[8:], 'big', signed=True))
+    return offset + _TYPED_UUID.size
+
+
+def _put_timestamp(buffer: bytearray, offset: int, value: datetime.datetime) -> int:
+    # naive datetimes are taken as UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    delta = value - _EPOCH
+    millis = (delta.days * 86_400 + delta.seconds) * 1000 + delta.microseconds // 1000
+    _TYPED_TIMESTAMP.pack_into(buffer, offset, 33, millis, delta.microseconds % 1000 * 1000)
+    return offset + _TYPED_TIMESTAMP.size
+
+
+def _put_date(buffer: bytearray, offset: int, value: datetime.date) -> int:
+    _TYPED_LONG.pack_into(buffer, offset, 11, (value - _EPOCH.date()).days * 86_400_000)
+    return offset + _TYPED_LONG.size
+
+
+def _put_time(buffer: bytearray, offset: int, value: datetime.time) -> int:
+    millis = ((value.hour * 60 + value.minute) * 60 + value.second) * 1000 + value.microsecond // 1000
+    _TYPED_LONG.pack_into(buffer, offset, 36, millis)
+    return offset + _TYPED_LONG.size
+
+
+def _decimal_parts(value: decimal.Decimal) -> (int, bytearray):
+    sign, digits, exponent = value.as_tuple()
+    if not isinstance(exponent, int):
+        raise ValueError(f"Unsupported decimal value: {value}")
+    unscaled = int(''.join(map(str, digits)) or '0')
+    # big-endian magnitude with a spare sign bit, as written by java.math.BigInteger
+    magnitude = bytearray(unscaled.to_bytes(unscaled.bit_length() // 8 + 1, 'big'))
+    if sign:
+        magnitude[0] |= 0x80
+    return -exponent, magnitude
+
+
+def _decimal_length(value: decimal.Decimal) -> int:
+    return _TYPED_DECIMAL.size + len(_decimal_parts(value)[1])
+
+
+def _put_decimal(buffer: bytearray, offset: int, value: decimal.Decimal) -> int:
+    scale, magnitude = _decimal_parts(value)
+    _TYPED_DECIMAL.pack_into(buffer, offset, 30, scale, len(magnitude))
+    return put_bytes(buffer, offset + _TYPED_DECIMAL.size, magnitude)
+
+
+def _array_length(value: array) -> int:
+    return _TYPED_LENGTH.size + len(value) * value.itemsize
+
+
+def _put_array(buffer: bytearray, offset: int, value: array) -> int:
+    type_code = _ARRAY_TYPE_CODES.get(value.typecode)
+    if type_code is None:
+        raise TypeError(f"Unsupported array typecode: {value.typecode}")
+    _TYPED_LENGTH.pack_into(buffer, offset, type_code, len(value))
+    if _BIG_ENDIAN:
+        value = array(value.typecode, value)
+        value.byteswap()
+    return put_bytes(buffer, offset + _TYPED_LENGTH.size, value.tobytes())
+
+
+# an enum constant, as the type id of the enum class and the ordinal of the constant
+class BinaryEnum(NamedTuple):
+    type_id: int
+    ordinal: int
+
+
+def _put_enum(buffer: bytearray, offset: int, value: BinaryEnum) -> int:
+    _TYPED_ENUM.pack_into(buffer, offset, 28, value.type_id, value.ordinal)
+    return offset + _TYPED_ENUM.size
+
+
+class BinaryFlags:
+    USER_TYPE: int = 0x0001
+    HAS_SCHEMA: int = 0x0002
+    HAS_RAW_DATA: int = 0x0004
+    OFFSET_ONE_BYTE: int = 0x0008
+    OFFSET_TWO_BYTES: int = 0x0010
+    COMPACT_FOOTER: int = 0x0020
+
+
+_FNV1_OFFSET_BASIS = 0x811C9DC5
+_FNV1_PRIME = 0x01000193
+
+
+def binary_id(name: str) -> int:
+    return java_hash_code(name.lower())
+
+
+# fields are keyed by field id, or by schema position when the server wrote a compact footer without ids;
+# objects read from the server keep their encoded form so they can be written back unchanged
+class BinaryObject:
+    def __init__(self, type_id: int, fields: Dict[int, Any], hash_code: Optional[int] = None,
+                 raw: Optional[bytes] = None):
+        self.type_id = type_id
+        self.fields = fields
+        self.hash_code = hash_code
+        self.raw = raw
+
+    @staticmethod
+    def of(type_name: str, values: Dict[str, Any]) -> 'BinaryObject':
+        return BinaryObject(binary_id(type_name), {binary_id(name): value for name, value in values.items()})
+
+    def __getitem__(self, field_name: str) -> Any:
+        return self.fields[binary_id(field_name)]
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, BinaryObject) and self.type_id == other.type_id and self.fields == other.fields
+
+    def __hash__(self) -> int:
+        return hash((self.type_id, self.encode_fields()[1]))
+
+    def __repr__(self) -> str:
+        return f"BinaryObject(type_id={self.type_id}, fields={self.fields!r})"
+
+    def schema_id(self) -> int:
+        schema_id = _FNV1_OFFSET_BASIS
+        for field_id in self.fields:
+            for shift in (0, 8, 16, 24):
+                schema_id = ((schema_id ^ ((field_id >> shift) & 0xFF)) * _FNV1_PRIME) & 0xFFFFFFFF
+        return to_int32(schema_id)
+
+    def encode_fields(self) -> (list, bytes):
+        offsets = []
+        data = bytearray()
+        for value in self.fields.values():
+            offsets.append(_BINARY_HEADER.size + len(data))
+            data += encode_object(value)
+        return offsets, bytes(data)
+
+    def encode(self) -> bytes:
+        if self.raw is not None:
+            return self.raw
+        offsets, data = self.encode_fields()
+        hash_code = 0
+        for byte in data:
+            hash_code = (31 * hash_code + (byte - 256 if byte > 127 else byte)) & 0xFFFFFFFF
+        schema_offset = _BINARY_HEADER.size + len(data)
+        length = schema_offset + _BINARY_FIELD.size * len(offsets)
+        encoded = bytearray(length)
+        flags = BinaryFlags.USER_TYPE | (BinaryFlags.HAS_SCHEMA if offsets else 0)
+        _BINARY_HEADER.pack_into(encoded, 0, 103, 1, flags, self.type_id, to_int32(hash_code), length,
+                                 self.schema_id() if offsets else 0, schema_offset if offsets else _BINARY_HEADER.size)
+        put_bytes(encoded, _BINARY_HEADER.size, data)
+        for i, (field_id, field_offset) in enumerate(zip(self.fields, offsets)):
+            _BINARY_FIELD.pack_into(encoded, schema_offset + i * _BINARY_FIELD.size, field_id, field_offset)
+        return bytes(encoded)
+
+
+def read_binary_object(data: bytes, offset: int) -> (BinaryObject, int):
+    start = offset
+    (_, _, flags, type_id, hash_code, length, _, schema_offset), _ = read_struct(_BINARY_HEADER, data, offset)
+    fields = {}
+    if flags & BinaryFlags.HAS_SCHEMA:
+        schema_end = start + length
+        if flags & BinaryFlags.HAS_RAW_DATA:
+            # the raw data offset is appended after the schema
+            schema_end -= 4
+        fields = _read_binary_fields(data, start, start + schema_offset, schema_end, flags)
+    return BinaryObject(type_id, fields, hash_code, bytes(data[start:start + length])), start + length
+
+
+def _read_binary_fields(data: bytes, start: int, position: int, schema_end: int, flags: int) -> Dict[int, Any]:
+    if flags & BinaryFlags.OFFSET_ONE_BYTE:
+        offset_unpacker = BYTE
+    elif flags & BinaryFlags.OFFSET_TWO_BYTES:
+        offset_unpacker = _UNSIGNED_SHORT
+    else:
+        offset_unpacker = INT
+    compact = flags & BinaryFlags.COMPACT_FOOTER
+    fields = {}
+    while position < schema_end:
+        if compact:
+            field_id = len(fields)
+        else:
+            field_id, position = read_int(data, position)
+        field_offset = offset_unpacker.unpack_from(data, position)[0]
+        position += offset_unpacker.size
+        fields[field_id], _ = read_object(data, start + field_offset)
+    return fields
+
+
+def read_object(data: bytes, offset: int) -> (Any, int):
+    type_code = data[offset]
+    offset += 1
+    unpacker = FIXED_CELLS.get(type_code)
+    if unpacker is not None:
+        return unpacker.unpack_from(data, offset)[0], offset + unpacker.size
+    reader = _OBJECT_READERS.get(type_code)
+    if reader is None:
+        raise Exception(f"Unexpected type code: {type_code}")
+    return reader(data, offset)
+
+
+def skip_object(data: bytes, offset: int) -> int:
+    # offset just past the value at offset, found without decoding it
+    type_code = data[offset]
+    offset += 1
+    unpacker = FIXED_CELLS.get(type_code)
+    if unpacker is not None:
+        return offset + unpacker.size
+    skip = _OBJECT_SKIPS.get(type_code)
+    if skip is not None:
+        return skip(data, offset)
+    return read_object(data, offset - 1)[1]
+
+
+def _skip_length_prefixed(data: bytes, offset: int) -> int:
+    return offset + 4 + INT.unpack_from(data, offset)[0]
+
+
+def _skip_decimal(data: bytes, offset: int) -> int:
+    return offset + 8 + INT.unpack_from(data, offset + 4)[0]
+
+
+def _skip_elements(element_size: int):
+    def skip(data: bytes, offset: int) -> int:
+        return offset + 4 + INT.unpack_from(data, offset)[0] * element_size
+    return skip
+
+
+def _read_char(data: bytes, offset: int) -> (str, int):
+    return chr(_UNSIGNED_SHORT.unpack_from(data, offset)[0]), offset + 2
+
+
+def _primitive_array_reader(typecode: str):
+    def read(data: bytes, offset: int) -> (array, int):
+        length = INT.unpack_from(data, offset)[0]
+        offset += 4
+        values = array(typecode)
+        end = offset + length * values.itemsize
+        values.frombytes(data[offset:end])
+        if _BIG_ENDIAN:
+            values.byteswap()
+        return values, end
+    return read
+
+
+def _read_bool_array(data: bytes, offset: int) -> (list, int):
+    length = INT.unpack_from(data, offset)[0]
+    offset += 4
+    return list(map(bool, data[offset:offset + length])), offset + length
+
+
+def _read_char_array(data: bytes, offset: int) -> (str, int):
+    # java chars are utf-16 code units and may hold unpaired surrogates
+    length = INT.unpack_from(data, offset)[0] * 2
+    offset += 4
+    return str(data[offset:offset + length], 'utf-16-le', 'surrogatepass'), offset + length
+
+
+def _read_objects(data: bytes, offset: int, count: int) -> (list, int):
+    values = []
+    append = values.append
+    for _ in range(count):
+        value, offset = read_object(data, offset)
+        append(value)
+    return values, offset
+
+
+def _read_typed_array(data: bytes, offset: int) -> (list, int):
+    # string, uuid, date, decimal, timestamp and time arrays: every element carries its own type code or null
+    count, offset = read_int(data, offset)
+    return _read_objects(data, offset, count)
+
+
+def _read_object_array(data: bytes, offset: int) -> (list, int):
+    # object and enum arrays start with the component type id
+    return _read_typed_array(data, offset + 4)
+
+
+def _read_collection(data: bytes, offset: int) -> (list, int):
+    # the collection kind (array list, hash set, ...) that follows the size is dropped
+    count, offset = read_int(data, offset)
+    return _read_objects(data, offset + 1, count)
+
+
+def _read_map(data: bytes, offset: int) -> (dict, int):
+    count, offset = read_int(data, offset)
+    offset += 1
+    values = {}
+    for _ in range(count):
+        key, offset = read_object(data, offset)
+        values[key], offset = read_object(data, offset)
+    return values, offset
+
+
+def _read_enum(data: bytes, offset: int) -> (BinaryEnum, int):
+    (type_id, ordinal), offset = read_struct(_ENUM, data, offset)
+    return BinaryEnum(type_id, ordinal), offset
+
+
+def _read_uuid(data: bytes, offset: int) -> (uuid.UUID, int):
+    (most, least), offset = read_struct(_UUID, data, offset)
+    return uuid.UUID(bytes=(most & 0xFFFFFFFFFFFFFFFF).to_bytes(8, 'big') +
+                     (least & 0xFFFFFFFFFFFFFFFF).to_bytes(8, 'big')), offset
+
+
+def _read_date(data: bytes, offset: int) -> (datetime.date, int):
+    millis, offset = read_long(data, offset)
+    return (_EPOCH + datetime.timedelta(milliseconds=millis)).date(), offset
+
+
+def _read_timestamp(data: bytes, offset: int) -> (datetime.datetime, int):
+    (millis, nanos), offset = read_struct(_TIMESTAMP, data, offset)
+    return _EPOCH + datetime.timedelta(milliseconds=millis, microseconds=nanos // 1000), offset
+
+
+def _read_time(data: bytes, offset: int) -> (datetime.time, int):
+    millis, offset = read_long(data, offset)
+    return (datetime.datetime.min + datetime.timedelta(milliseconds=millis)).time(), offset
+
+
+def _read_decimal(data: bytes, offset: int) -> (decimal.Decimal, int):
+    (scale, length), offset = read_struct(_DECIMAL, data, offset)
+    magnitude = bytearray(data[offset:offset + length])
+    negative = bool(magnitude) and magnitude[0] & 0x80
+    if negative:
+        magnitude[0] &= 0x7F
+    unscaled = int.from_bytes(magnitude, 'big')
+    return decimal.Decimal((1 if negative else 0, tuple(map(int, str(unscaled))), -scale)), offset + length
+
+
+def _read_wrapped_object(data: bytes, offset: int) -> (Any, int):
+    length, offset = read_int(data, offset)
+    start = offset
+    inner_offset, _ = read_int(data, start + length)
+    value, _ = read_object(data, start + inner_offset)
+    return value, start + length + 4
+
+
+_UUID = struct.Struct('<qq')
+_UNSIGNED_SHORT = struct.Struct('<H')
+_TIMESTAMP = struct.Struct('<qi')
+_DECIMAL = struct.Struct('<ii')
+_ENUM = struct.Struct('<ii')
+
+_OBJECT_READERS = {
+    7: _read_char,
+    9: read_string_no_type,
+    10: _read_uuid,
+    11: _read_date,
+    12: read_bytes,
+    **{type_code: _primitive_array_reader(typecode) for type_code, typecode in PRIMITIVE_ARRAYS.items()},
+    18: _read_char_array,
+    19: _read_bool_array,
+    20: _read_typed_array,
+    21: _read_typed_array,
+    22: _read_typed_array,
+    23: _read_object_array,
+    24: _read_collection,
+    25: _read_map,
+    27: _read_wrapped_object,
+    28: _read_enum,
+    29: _read_object_array,
+    30: _read_decimal,
+    31: _read_typed_array,
+    33: _read_timestamp,
+    34: _read_typed_array,
+    36: _read_time,
+    37: _read_typed_array,
+    38: _read_enum,
+    101: lambda data, offset: (None, offset),
+    103: lambda data, offset: read_binary_object(data, offset - 1),
+}
+
+_OBJECT_SKIPS = {
+    7: lambda data, offset: offset + 2,
+    9: _skip_length_prefixed,
+    10: lambda data, offset: offset + 16,
+    11: lambda data, offset: offset + 8,
+    12: _skip_length_prefixed,
+    **{type_code: _skip_elements(array(typecode).itemsize) for type_code, typecode in PRIMITIVE_ARRAYS.items()},
+    18: _skip_elements(2),
+    19: _skip_length_prefixed,
+    27: lambda data, offset: _skip_length_prefixed(data, offset) + 4,
+    28: lambda data, offset: offset + 8,
+    30: _skip_decimal,
+    33: lambda data, offset: offset + 12,
+    36: lambda data, offset: offset + 8,
+    38: lambda data, offset: offset + 8,
+    101: lambda data, offset: offset,
+    # the object length in the header counts from the type code
+    103: lambda data, offset: offset - 1 + INT.unpack_from(data, offset + 11)[0],
+}
+
+
+_OBJECT_CODECS = {
+    type(None): (lambda _: 1, _put_null),
+    bool: (lambda _: _TYPED_BOOL.size, _put_typed(_TYPED_BOOL, 8)),
+    int: (_int_length, _put_int),
+    float: (lambda _: _TYPED_DOUBLE.size, _put_typed(_TYPED_DOUBLE, 6)),
+    str: (string_length, put_string),
+    bytes: (lambda value: _TYPED_LENGTH.size + len(value), _put_bytes),
+    bytearray: (lambda value: _TYPED_LENGTH.size + len(value), _put_bytes),
+    memoryview: (lambda value: _TYPED_LENGTH.size + value.nbytes, _put_bytes),
+    uuid.UUID: (lambda _: _TYPED_UUID.size, _put_uuid),
+    datetime.datetime: (lambda _: _TYPED_TIMESTAMP.size, _put_timestamp),
+    datetime.date: (lambda _: _TYPED_LONG.size, _put_date),
+    datetime.time: (lambda _: _TYPED_LONG.size, _put_time),
+    decimal.Decimal: (_decimal_length, _put_decimal),
+    array: (_array_length, _put_array),
+    BinaryEnum: (lambda _: _TYPED_ENUM.size, _put_enum),
+    BinaryObject: (lambda value: len(value.encode()), lambda buffer, offset, value: put_bytes(buffer, offset,
+                                                                                             value.encode())),
+}
@@ -0,0 +1,108 @@
+import datetime
+import decimal
+import unittest
+import uuid
+
+from ignite_client.codec import FixedRowDecoder, encode_object, encode_objects, object_length, objects_length, \
+    put_bool, put_int, put_long, put_short, put_string, read_bool, read_bytes, read_int, read_long, read_matrix, \
+    read_object, read_short, read_string
+from ignite_client.columnar import np, read_columns
+from ignite_client.lazy import read_lazy_rows
+
+
+class TestMemoryviewDecoding(unittest.TestCase):
+    def test_read_helpers_at_offsets(self):
+        buffer = bytearray(64)
+        offset = put_short(buffer, 3, -2)
+        offset = put_int(buffer, offset, 1 << 30)
+        offset = put_long(buffer, offset, -(1 << 40))
+        offset = put_bool(buffer, offset, True)
+        end = put_string(buffer, offset, "héllo")
+        view = memoryview(buffer)
+        value, offset = read_short(view, 3)
+        self.assertEqual(-2, value)
+        value, offset = read_int(view, offset)
+        self.assertEqual(1 << 30, value)
+        value, offset = read_long(view, offset)
+        self.assertEqual(-(1 << 40), value)
+        value, offset = read_bool(view, offset)
+        self.assertTrue(value)
+        self.assertEqual(("héllo", end), read_string(view, offset))
+
+    def test_matrix_values_do_not_refer_to_the_frame(self):
+        cells = [1, "one", b'\x01\x02', None, 2, "two", b'', 3.5]
+        frame = bytearray(b'\x00' * 5 + b''.join(encode_object(cell) for cell in cells))
+        matrix, end = read_matrix(memoryview(frame), 5, 2, 4)
+        self.assertEqual(len(frame), end)
+        frame[:] = bytes(len(frame))
+        self.assertEqual([[1, "one", b'\x01\x02', None], [2, "two", b'', 3.5]], matrix)
+        self.assertIs(bytes, type(matrix[0][2]))
+        value, end = read_bytes(memoryview(b'\x01\x00\x00\x00\x07\x09'), 0)
+        self.assertEqual((b'\x07', 5), (value, end))
+        self.assertIs(bytes, type(value))
+
+
+class TestArgumentEncoding(unittest.TestCase):
+    def assertRoundTrip(self, value, expected=None, type_code=None):
+        encoded = encode_object(value)
+        self.assertEqual(object_length(value), len(encoded))
+        if type_code is not None:
+            self.assertEqual(type_code, encoded[0])
+        self.assertEqual((value if expected is None else expected, len(encoded)), read_object(encoded, 0))
+
+    def test_dates_and_times(self):
+        utc = datetime.timezone.utc
+        self.assertRoundTrip(datetime.date(2024, 2, 29), type_code=11)
+        self.assertRoundTrip(datetime.date(1969, 7, 20), type_code=11)
+        self.assertRoundTrip(datetime.datetime(2024, 2, 29, 23, 59, 58, 123456, tzinfo=utc), type_code=33)
+        self.assertRoundTrip(datetime.datetime(1960, 1, 1, 0, 0, 0, 1000, tzinfo=utc), type_code=33)
+        # naive timestamps are taken as utc, and other zones are converted
+        self.assertRoundTrip(datetime.datetime(2024, 1, 1, 12), datetime.datetime(2024, 1, 1, 12, tzinfo=utc))
+        plus_two = datetime.timezone(datetime.timedelta(hours=2))
+        self.assertRoundTrip(datetime.datetime(2024, 1, 1, 12, tzinfo=plus_two),
+                             datetime.datetime(2024, 1, 1, 10, tzinfo=utc))
+        self.assertRoundTrip(datetime.time(13, 14, 15, 16000), type_code=36)
+
+    def test_uuid(self):
+        for value in (uuid.UUID(int=0), uuid.UUID(int=(1 << 128) - 1), uuid.uuid4()):
+            self.assertRoundTrip(value, type_code=10)
+
+    def test_decimal(self):
+        for value in ('0', '1.50', '-1.50', '128', '-128', '123456789012345678901234567890.123', '1E+3'):
+            self.assertRoundTrip(decimal.Decimal(value), type_code=30)
+        # integers beyond a long are sent as decimals
+        self.assertRoundTrip(1 << 70, decimal.Decimal(1 << 70), type_code=30)
+        with self.assertRaises(ValueError):
+            encode_object(decimal.Decimal('NaN'))
+
+    def test_scalars(self):
+        self.assertRoundTrip(None, type_code=101)
+        self.assertRoundTrip(True, type_code=8)
+        self.assertRoundTrip(-(1 << 63), type_code=4)
+        self.assertRoundTrip(0.1, type_code=6)
+        self.assertRoundTrip("ünïcode", type_code=9)
+        self.assertRoundTrip(b'\x00\xff', type_code=12)
+
+    def test_signed_bytes(self):
+        # java bytes are signed, so 0xff is -1 whichever decoder reads it
+        frame = bytes([1, 0xff, 1, 0x80, 1, 0x7f])
+        self.assertEqual((-1, 2), read_object(frame, 0))
+        self.assertEqual(([[-1], [-128], [127]], 6), FixedRowDecoder([1])(frame, 0, 3, 1))
+        self.assertEqual([[-1], [-128], [127]], [list(row) for row in read_lazy_rows(frame, 0, 3, 1)[0]])
+        if np is not None:
+            columns, end = read_columns(frame, 0, 3, 1)
+            self.assertEqual(([-1, -128, 127], 6), (columns[0].values.tolist(), end))
+
+    def test_argument_list(self):
+        values = [1, "a", None, datetime.date(2020, 1, 1), decimal.Decimal('-0.5'), uuid.UUID(int=7)]
+        encoded = encode_objects(values)
+        self.assertEqual(objects_length(values), len(encoded))
+        offset = 0
+        for value in values:
+            decoded, offset = read_object(encoded, offset)
+            self.assertEqual(value, decoded)
+        self.assertEqual(len(encoded), offset)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from ignite_client.codec import FIXED_CELLS, INT, read_byte, read_bytes, read_object, read_string_no_type
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+NULL_TYPE_CODE = 101
+
+_DTYPES: Dict[int, str] = {
+    1: 'i1',
+    2: '<i2',
+    3: '<i4',
+    4: '<i8',
+    5: '<f4',
+    6: '<f8',
+    8: '?',
+}
+
+# element type codes of the primitive array types; such cells become numpy views of the frame
+_ARRAY_ELEMENTS: Dict[int, int] = {
+    13: 2,
+    14: 3,
+    15: 4,
+    16: 5,
+    17: 6,
+}
+# type codes decoded to sequences, which numpy would otherwise unpack when filling an object column
+_SEQUENCE_TYPE_CODES = frozenset(range(13, 26)) | {29, 31, 34, 37}
+
+
+@dataclass
+class Column:
+    type_code: int
+    values: Any
+    null_mask: Optional[Any] = None
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+def read_columns(data: bytes, offset: int, row_count: int, column_count: int) -> (List[Column], int):
+    if np is None:
+        raise ImportError("numpy is required for columnar decoding")
+    columns, end = _read_fixed_width_columns(data, offset, row_count, column_count)
+    if columns is not None:
+        return columns, end
+    return _read_mixed_columns(data, offset, row_count, column_count)
+
+
+def _first_row_type_codes(data: bytes, offset: int, column_count: int) -> Optional[List[int]]:
+    type_codes = []
+    for _ in range(column_count):
+        type_code, offset = read_byte(data, offset)
+        if type_code not in _DTYPES:
+            return None
+        type_codes.append(type_code)
+        offset += FIXED_CELLS[type_code].size
+    return type_codes
+
+
+def _read_fixed_width_columns(data: bytes, offset: int, row_count: int, column_count: int):
+    # when every cell is a non-null fixed-width value the rows have a constant stride,
+    # so the whole page can be viewed as one structured array instead of walked cell by cell
+    if row_count == 0 or column_count == 0:
+        return None, offset
+    type_codes = _first_row_type_codes(data, offset, column_count)
+    if type_codes is None:
+        return None, offset
+
+    row_dtype = np.dtype([field for i, type_code in enumerate(type_codes)
+                          for field in ((f't{i}', 'u1'), (f'v{i}', _DTYPES[type_code]))])
+    end = offset + row_dtype.itemsize * row_count
+    if end > len(data):
+        return None, offset
+    rows = np.frombuffer(data, dtype=row_dtype, count=row_count, offset=offset)
+    for i, type_code in enumerate(type_codes):
+        if not np.all(rows[f't{i}'] == type_code):
+            return None, offset
+
+    columns = [Column(type_code, rows[f'v{i}'].copy()) for i, type_code in enumerate(type_codes)]
+    return columns, end
+
+
+def _read_mixed_columns(data: bytes, offset: int, row_count: int, column_count: int) -> (List[Column], int):
+    values = [[None] * row_count for _ in range(column_count)]
+    type_codes = [set() for _ in range(column_count)]
+    for row in range(row_count):
+        for column in range(column_count):
+            type_code, offset = read_byte(data, offset)
+            type_codes[column].add(type_code)
+            if type_code in _DTYPES:
+                unpacker = FIXED_CELLS[type_code]
+                values[column][row] = unpacker.unpack_from(data, offset)[0]
+                offset += unpacker.size
+            elif type_code == 9:
+                values[column][row], offset = read_string_no_type(data, offset)
+            elif type_code == 12:
+                values[column][row], offset = read_bytes(data, offset)
+            elif type_code in _ARRAY_ELEMENTS:
+                values[column][row], offset = _read_array_view(data, offset, _ARRAY_ELEMENTS[type_code])
+            elif type_code != NULL_TYPE_CODE:
+                values[column][row], offset = read_object(data, offset - 1)
+
+    return [_build_column(column_values, codes) for column_values, codes in zip(values, type_codes)], offset
+
+
+def _read_array_view(data: bytes, offset: int, element_type_code: int):
+    # read-only and backed by the frame, which it keeps alive
+    length = INT.unpack_from(data, offset)[0]
+    offset += 4
+    dtype = np.dtype(_DTYPES[element_type_code])
+    if length == 0:
+        return np.empty(0, dtype=dtype), offset
+    return np.frombuffer(data, dtype=dtype, count=length, offset=offset), offset + length * dtype.itemsize
+
+
+def _build_column(values: List[Any], type_codes: set) -> Column:
+    has_nulls = NULL_TYPE_CODE in type_codes
+    value_codes = type_codes - {NULL_TYPE_CODE}
+    if len(value_codes) == 1:
+        type_code = next(iter(value_codes))
+    elif not value_codes:
+        type_code = NULL_TYPE_CODE
+    else:
+        type_code = 0
+
+    if type_code in _DTYPES:
+        dtype = np.dtype(_DTYPES[type_code])
+        if not has_nulls:
+            return Column(type_code, np.array(values, dtype=dtype))
+        null_mask = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+        filled = np.array([0 if value is None else value for value in values], dtype=dtype)
+        return Column(type_code, filled, null_mask)
+
+    column_values = np.empty(len(values), dtype=object)
+    if type_code in _SEQUENCE_TYPE_CODES or type_code == 0:
+        for i, value in enumerate(values):
+            column_values[i] = value
+    else:
+        column_values[:] = values
+    null_mask = np.fromiter((value is None for value in values), dtype=bool, count=len(values)) if has_nulls else None
+    return Column(type_code, column_values, null_mask)
+
+
+def to_dataframe(column_names: List[str], columns: List[Column]):
+    if pd is None:
+        raise ImportError("pandas is required to build a DataFrame")
+    series = {}
+    for name, column in zip(column_names, columns):
+        if column.null_mask is None or column.values.dtype == object:
+            series[name] = column.values
+        elif column.values.dtype.kind == 'b':
+            series[name] = pd.arrays.BooleanArray(column.values, column.null_mask)
+        elif column.values.dtype.kind == 'f':
+            series[name] = pd.arrays.FloatingArray(column.values, column.null_mask)
+        else:
+            series[name] = pd.arrays.IntegerArray(column.values, column.null_mask)
+    return pd.DataFrame(series)
@@ -1,10 +1,14 @@
 class LenConst:
+    CACHE_COUNT: int = 4
     CACHE_ID: int = 4
     COLLOCATED: int = 1
     CURSOR_ID: int = 8
     CURSOR_PAGE_SIZE: int = 4
     DISTRIBUTED_JOIN: int = 1
     ENFORCE_JOIN_ORDER: int = 1
+    ENTRY_COUNT: int = 4
+    FILTER: int = 1
+    FLAGS: int = 1
     HANDSHAKE_CODE: int = 1
     HAS_MORE: int = 1
     INCLUDE_FIELD_NAMES: int = 1
@@ -13,6 +17,7 @@ class LenConst:
     MAJOR_VERSION: int = 2
     MAX_ROWS: int = 4
     MINOR_VERSION: int = 2
+    PARTITION: int = 4
     PATCH_VERSION: int = 2
     RESOURCE_ID: int = 8
     QUERY_ARG_COUNT: int = 4
@@ -24,9 +29,21 @@ class LenConst:
 
 class OpConst:
     RESOURCE_CLOSE: int = 0
+    CACHE_GET: int = 1000
+    CACHE_PUT: int = 1001
+    CACHE_GET_ALL: int = 1003
+    CACHE_PUT_ALL: int = 1004
+    CACHE_CONTAINS_KEYS: int = 1012
+    CACHE_REMOVE_ALL: int = 1019
+    CACHE_PARTITIONS: int = 1101
     QUERY_SCAN: int = 2000
     QUERY_SCAN_CURSOR_GET_PAGE: int = 2001
     QUERY_SQL: int = 2002
     QUERY_SQL_CURSOR_GET_PAGE: int = 2003
     QUERY_SQL_FIELDS: int = 2004
     QUERY_SQL_FIELDS_CURSOR_GET_PAGE: int = 2005
+
+
+class ResponseFlagConst:
+    ERROR: int = 0x1
+    AFFINITY_TOPOLOGY_CHANGED: int = 0x2
@@ -0,0 +1,186 @@
+import asyncio
+import base64
+import csv
+import datetime
+import decimal
+import json
+import uuid
+from array import array
+from typing import Any, AsyncIterator, List, Optional, TextIO
+
+from ignite_client.codec import BinaryObject
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+def _plain_value(value: Any) -> Any:
+    # values json and csv have no type for, as text; subclasses, such as datetime, use the converter of their base
+    for value_type in type(value).__mro__:
+        converter = _PLAIN_CONVERTERS.get(value_type)
+        if converter is not None:
+            return converter(value)
+    return value
+
+
+def _plain_bytes(value: bytes) -> str:
+    return base64.b64encode(value).decode('ascii')
+
+
+def _plain_isoformat(value: Any) -> str:
+    return value.isoformat()
+
+
+def _plain_binary_object(value: BinaryObject) -> dict:
+    return {str(field_id): _plain_value(field_value) for field_id, field_value in value.fields.items()}
+
+
+def _plain_list(value: list) -> list:
+    return [_plain_value(item) for item in value]
+
+
+def _plain_dict(value: dict) -> dict:
+    return {str(key): _plain_value(item) for key, item in value.items()}
+
+
+_PLAIN_CONVERTERS = {
+    bytes: _plain_bytes,
+    bytearray: _plain_bytes,
+    datetime.date: _plain_isoformat,
+    datetime.time: _plain_isoformat,
+    uuid.UUID: str,
+    decimal.Decimal: str,
+    BinaryObject: _plain_binary_object,
+    array: array.tolist,
+    list: _plain_list,
+    tuple: _plain_list,
+    dict: _plain_dict,
+}
+
+
+class CsvPageWriter:
+    def __init__(self, output: TextIO):
+        self.output = output
+        self._writer = csv.writer(output)
+
+    def open(self, column_names: List[str]):
+        self._writer.writerow(column_names)
+
+    def write_page(self, rows: List[List[Any]]):
+        self._writer.writerows([['' if value is None else _csv_value(value) for value in row] for row in rows])
+
+    def close(self):
+        self.output.flush()
+
+
+def _csv_value(value: Any) -> Any:
+    value = _plain_value(value)
+    return json.dumps(value) if isinstance(value, (dict, list)) else value
+
+
+class JsonLinesPageWriter:
+    def __init__(self, output: TextIO):
+        self.output = output
+        self._column_names: List[str] = []
+
+    def open(self, column_names: List[str]):
+        self._column_names = column_names
+
+    def write_page(self, rows: List[List[Any]]):
+        names = self._column_names
+        self.output.writelines(
+            json.dumps({name: _plain_value(value) for name, value in zip(names, row)}, separators=(',', ':')) + '\n'
+            for row in rows)
+
+    def close(self):
+        self.output.flush()
+
+
+def _parquet_types() -> dict:
+    # parquet types of the ignite type codes whose values always convert to the same one
+    if pa is None:
+        return {}
+    return {1: pa.int8(), 2: pa.int16(), 3: pa.int32(), 4: pa.int64(), 5: pa.float32(), 6: pa.float64(),
+            7: pa.string(), 8: pa.bool_(), 9: pa.string(), 10: pa.string(), 11: pa.date32(), 12: pa.binary(),
+            33: pa.timestamp('us', tz='UTC'), 36: pa.time64('us')}
+
+
+_PARQUET_TYPES = _parquet_types()
+
+
+# each page becomes one row group. the schema comes from the column type codes where they are known, the
+# remaining columns take the type of their values in the first page, and columns that are null throughout it
+# are written as strings
+class ParquetPageWriter:
+    def __init__(self, path: str, column_types: Optional[List[int]] = None):
+        if pa is None:
+            raise ImportError("pyarrow is required to write Parquet")
+        self.path = path
+        self.column_types = column_types
+        self._column_names: List[str] = []
+        self._column_types: List[Optional[int]] = []
+        self._as_text: List[bool] = []
+        self._writer = None
+
+    def open(self, column_names: List[str]):
+        self._column_names = column_names
+        self._column_types = list(self.column_types or [None] * len(column_names))
+
+    def _schema(self, columns: List[list]) -> 'pa.Schema':
+        fields = []
+        for name, type_code, values in zip(self._column_names, self._column_types, columns):
+            field_type = _PARQUET_TYPES.get(type_code)
+            if field_type is None:
+                field_type = pa.array(values).type
+                if pa.types.is_null(field_type):
+                    field_type = pa.string()
+            fields.append((name, field_type))
+        return pa.schema(fields)
+
+    def write_page(self, rows: List[List[Any]]):
+        if not rows:
+            return
+        columns = [[_parquet_value(row[i]) for row in rows] for i in range(len(self._column_names))]
+        if self._writer is None:
+            schema = self._schema(columns)
+            self._as_text = [pa.types.is_string(field.type) and _PARQUET_TYPES.get(type_code) is None
+                             for field, type_code in zip(schema, self._column_types)]
+            self._writer = pq.ParquetWriter(self.path, schema)
+        columns = [[None if value is None else str(value) for value in column] if as_text else column
+                   for column, as_text in zip(columns, self._as_text)]
+        self._writer.write_table(pa.table(columns, schema=self._writer.schema))
+
+    def close(self):
+        if self._writer is None:
+            # an empty result still gets a readable file
+            self._writer = pq.ParquetWriter(self.path, self._schema([[] for _ in self._column_names]))
+        self._writer.close()
+
+
+def _parquet_value(value: Any) -> Any:
+    if isinstance(value, BinaryObject):
+        return json.dumps(_plain_value(value))
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, array):
+        return value.tolist()
+    return value
+
+
+async def export_pages(pages: AsyncIterator[List[List[Any]]], column_names: List[str], writer) -> int:
+    # pages are written on a worker thread, so the next page is received while the current one is written;
+    # at most that page and the one being written are held in memory
+    loop = asyncio.get_running_loop()
+    rows = 0
+    await loop.run_in_executor(None, writer.open, column_names)
+    try:
+        async for page in pages:
+            await loop.run_in_executor(None, writer.write_page, page)
+            rows += len(page)
+    finally:
+        await loop.run_in_executor(None, writer.close)
+    return rows
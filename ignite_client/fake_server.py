@@ -0,0 +1,415 @@
+import asyncio
+import datetime
+import decimal
+import struct
+import uuid
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from ignite_client.affinity import key_hash_code, rendezvous_partition
+from ignite_client.codec import read_int, read_long, read_struct, read_string, string_length, put_string, read_object, \
+    encode_object, BinaryEnum
+from ignite_client.constants import OpConst, ResponseFlagConst
+from ignite_client.protocol import PARTITION_AWARENESS_VERSION, StatementType
+
+_RESPONSE_HEADER = struct.Struct('<iqi')
+_FLAGS_RESPONSE_HEADER = struct.Struct('<iqh')
+_REQUEST_HEADER = struct.Struct('<hq')
+_TOPOLOGY_VERSION = struct.Struct('<qi')
+_VERSION = struct.Struct('<hhh')
+
+_CELL_ENCODERS = {
+    1: lambda row, column: struct.pack('<Bb', 1, row % 256 - 128),
+    2: lambda row, column: struct.pack('<Bh', 2, row % 32768),
+    3: lambda row, column: struct.pack('<Bi', 3, row),
+    4: lambda row, column: struct.pack('<Bq', 4, row * 1000 + column),
+    5: lambda row, column: struct.pack('<Bf', 5, row * 0.5),
+    6: lambda row, column: struct.pack('<Bd', 6, row * 0.25),
+    8: lambda row, column: struct.pack('<B?', 8, row % 2 == 0),
+    7: lambda row, column: struct.pack('<BH', 7, ord('a') + row % 26),
+    9: lambda row, column: _encode_string_cell(f"value-{row}-{column}"),
+    10: lambda row, column: encode_object(uuid.UUID(int=row)),
+    11: lambda row, column: encode_object(datetime.date(2020, 1, 1) + datetime.timedelta(days=row)),
+    12: lambda row, column: struct.pack('<Bi', 12, 8) + row.to_bytes(8, 'little'),
+    14: lambda row, column: encode_object(array('i', range(row, row + 4))),
+    17: lambda row, column: encode_object(array('d', [row * 0.25] * 16)),
+    19: lambda row, column: struct.pack('<Bi???', 19, 3, True, False, row % 2 == 0),
+    20: lambda row, column: struct.pack('<Bi', 20, 2) + _encode_string_cell(f"item-{row}") + b'\x65',
+    28: lambda row, column: encode_object(BinaryEnum(column, row % 3)),
+    30: lambda row, column: encode_object(decimal.Decimal(row).scaleb(-2)),
+    33: lambda row, column: encode_object(datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc) +
+                                          datetime.timedelta(seconds=row)),
+}
+
+
+def _read_raw(data: bytes, offset: int) -> (bytes, int):
+    _, end = read_object(data, offset)
+    return bytes(data[offset:end]), end
+
+
+def _read_raw_list(data: bytes, offset: int) -> (List[bytes], int):
+    count, offset = read_int(data, offset)
+    values = []
+    for _ in range(count):
+        value, offset = _read_raw(data, offset)
+        values.append(value)
+    return values, offset
+
+
+def _encode_string_cell(value: str) -> bytes:
+    encoded = value.encode('utf-8')
+    return struct.pack('<Bi', 9, len(encoded)) + encoded
+
+
+class _RequestError(Exception):
+    pass
+
+
+@dataclass
+class SyntheticResultSet:
+    column_types: List[int]
+    row_count: int
+    column_names: Optional[List[str]] = None
+    null_every: int = 0
+    # cell values are derived from the row number, counted from first_row
+    first_row: int = 0
+    _rows: Dict[int, bytes] = field(default_factory=dict, repr=False)
+
+    def names(self) -> List[str]:
+        if self.column_names is not None:
+            return self.column_names
+        return [f"COLUMN_{i}" for i in range(len(self.column_types))]
+
+    def row(self, row: int) -> bytes:
+        encoded = self._rows.get(row)
+        if encoded is None:
+            cells = []
+            for column, type_code in enumerate(self.column_types):
+                if self.null_every and (row + column) % self.null_every == 0:
+                    cells.append(b'\x65')
+                else:
+                    cells.append(_CELL_ENCODERS[type_code](self.first_row + row, column))
+            encoded = b''.join(cells)
+            self._rows[row] = encoded
+        return encoded
+
+
+class _Cursor:
+    def __init__(self, result_set: SyntheticResultSet, page_size: int, row_limit: int):
+        self.result_set = result_set
+        self.page_size = max(page_size, 1)
+        self.row_limit = row_limit
+        self.position = 0
+
+    def next_page(self) -> (bytes, bool):
+        end = min(self.position + self.page_size, self.row_limit)
+        rows = [self.result_set.row(row) for row in range(self.position, end)]
+        self.position = end
+        has_more = end < self.row_limit
+        return struct.pack('<i', len(rows)) + b''.join(rows) + bytes([has_more]), has_more
+
+
+class _ScanCursor:
+    def __init__(self, entries: List[bytes], page_size: int):
+        self.entries = entries
+        self.page_size = max(page_size, 1)
+        self.position = 0
+
+    def next_page(self) -> (bytes, bool):
+        end = min(self.position + self.page_size, len(self.entries))
+        entries = self.entries[self.position:end]
+        self.position = end
+        has_more = end < len(self.entries)
+        return struct.pack('<i', len(entries)) + b''.join(entries) + bytes([has_more]), has_more
+
+
+# in-process stand-in for an Ignite node: every sql query returns the configured synthetic result set,
+# paged by the request's cursor page size. servers sharing one partitions map (node id to owned partitions)
+# act as a cluster for partition aware clients; without one the server owns all partitions itself
+class FakeIgniteServer:
+    def __init__(self, result_set: Optional[SyntheticResultSet] = None, host: str = '127.0.0.1', port: int = 0, *,
+                 latency: Union[float, Callable[[int], float]] = 0.0, node_id: Optional[uuid.UUID] = None,
+                 partitions: Optional[Dict[uuid.UUID, List[int]]] = None, topology_version: (int, int) = (1, 0)):
+        self.result_set = result_set or SyntheticResultSet(column_types=[3, 9], row_count=10)
+        self.host = host
+        self.port = port
+        # seconds before each reply, or a function of the request's op code returning them
+        self.latency = latency
+        self.node_id = node_id or uuid.uuid4()
+        self.partitions = partitions if partitions is not None else {self.node_id: list(range(1024))}
+        self.topology_version = topology_version
+        self.cursors: Dict[int, Union[_Cursor, _ScanCursor]] = {}
+        self.caches: Dict[int, Dict[bytes, bytes]] = {}
+        self.request_count = 0
+        # update statements are passed to update_handler, which returns the update count or raises to fail the
+        # statement; executed ones are recorded in updates
+        self.update_handler: Callable[[str, List[Any]], int] = lambda sql, args: 1
+        self.updates: List[tuple] = []
+        self._next_cursor_id = 0
+        self._server = None
+        self._connections = {}
+        # the topology version each connection was last told about
+        self._reported_topology: Dict[asyncio.StreamWriter, tuple] = {}
+        self._handlers = {
+            OpConst.RESOURCE_CLOSE: self._resource_close,
+            OpConst.QUERY_SQL_FIELDS: self._query_sql_fields,
+            OpConst.QUERY_SQL_FIELDS_CURSOR_GET_PAGE: self._cursor_get_page,
+            OpConst.CACHE_GET: self._cache_get,
+            OpConst.CACHE_PUT: self._cache_put,
+            OpConst.CACHE_GET_ALL: self._cache_get_all,
+            OpConst.CACHE_PUT_ALL: self._cache_put_all,
+            OpConst.CACHE_CONTAINS_KEYS: self._cache_contains_keys,
+            OpConst.CACHE_REMOVE_ALL: self._cache_remove_all,
+            OpConst.CACHE_PARTITIONS: self._cache_partitions,
+            OpConst.QUERY_SCAN: self._query_scan,
+            OpConst.QUERY_SCAN_CURSOR_GET_PAGE: self._cursor_get_page,
+        }
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            # let the connection handlers finish on their own instead of being cancelled with the loop
+            for writer in list(self._connections):
+                writer.close()
+            await asyncio.gather(*self._connections.values(), return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    def change_topology(self, topology_version: (int, int), partitions: Optional[Dict[uuid.UUID, List[int]]] = None):
+        # like ignite, the next response on every connection flags the change and carries the new version
+        self.topology_version = topology_version
+        if partitions is not None:
+            self.partitions = partitions
+
+    def drop_connections(self):
+        # closes the open connections, as a node restart would, and keeps accepting new ones
+        for writer in list(self._connections):
+            writer.close()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections[writer] = asyncio.current_task()
+        try:
+            version = await self._handshake(reader, writer)
+            if version is None:
+                return
+            flags_header = version >= PARTITION_AWARENESS_VERSION
+            self._reported_topology[writer] = self.topology_version
+            while True:
+                length_bytes = await reader.readexactly(4)
+                data = await reader.readexactly(int.from_bytes(length_bytes, byteorder='little'))
+                latency = self._latency(data)
+                if latency:
+                    asyncio.get_running_loop().create_task(self._reply_later(writer, data, flags_header, latency))
+                else:
+                    writer.write(self._respond(writer, data, flags_header))
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, OSError):
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            self._reported_topology.pop(writer, None)
+            writer.close()
+
+    async def _handshake(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Optional[tuple]:
+        length_bytes = await reader.readexactly(4)
+        data = await reader.readexactly(int.from_bytes(length_bytes, byteorder='little'))
+        version, _ = read_struct(_VERSION, data, 1)
+        if version[0] == 1:
+            response = b'\x01'
+            if version >= PARTITION_AWARENESS_VERSION:
+                response += encode_object(self.node_id)
+            writer.write(len(response).to_bytes(4, byteorder='little') + response)
+            await writer.drain()
+            return version
+
+        message = "Unsupported version."
+        response = bytearray(1 + _VERSION.size + string_length(message))
+        response[0] = 0
+        _VERSION.pack_into(response, 1, 1, 7, 0)
+        put_string(response, 1 + _VERSION.size, message)
+        writer.write(len(response).to_bytes(4, byteorder='little') + response)
+        await writer.drain()
+        return None
+
+    def _latency(self, data: bytes) -> float:
+        if callable(self.latency):
+            (op_code, _), _ = read_struct(_REQUEST_HEADER, data, 0)
+            return self.latency(op_code)
+        return self.latency
+
+    async def _reply_later(self, writer: asyncio.StreamWriter, data: bytes, flags_header: bool, latency: float):
+        await asyncio.sleep(latency)
+        if not writer.is_closing():
+            writer.write(self._respond(writer, data, flags_header))
+
+    def _respond(self, writer: asyncio.StreamWriter, data: bytes, flags_header: bool) -> bytes:
+        response = self._handle(data, flags_header)
+        if not flags_header or self._reported_topology.get(writer) == self.topology_version:
+            return response
+        self._reported_topology[writer] = self.topology_version
+        length, request_id, flags = _FLAGS_RESPONSE_HEADER.unpack_from(response)
+        return _FLAGS_RESPONSE_HEADER.pack(length + _TOPOLOGY_VERSION.size, request_id,
+                                           flags | ResponseFlagConst.AFFINITY_TOPOLOGY_CHANGED) + \
+            _TOPOLOGY_VERSION.pack(*self.topology_version) + response[_FLAGS_RESPONSE_HEADER.size:]
+
+    def _handle(self, data: bytes, flags_header: bool = False) -> bytes:
+        self.request_count += 1
+        (op_code, request_id), offset = read_struct(_REQUEST_HEADER, data, 0)
+        handler = self._handlers.get(op_code)
+        if handler is None:
+            return self._error(request_id, f"Unsupported operation: {op_code}", flags_header)
+        try:
+            return self._ok(request_id, handler(data, offset), flags_header)
+        except _RequestError as e:
+            return self._error(request_id, str(e), flags_header)
+
+    def _cursor_get_page(self, data: bytes, offset: int) -> bytes:
+        cursor_id, _ = read_long(data, offset)
+        cursor = self.cursors.get(cursor_id)
+        if cursor is None:
+            raise _RequestError(f"Failed to find resource with id: {cursor_id}")
+        page, has_more = cursor.next_page()
+        if not has_more:
+            del self.cursors[cursor_id]
+        return page
+
+    def _resource_close(self, data: bytes, offset: int) -> bytes:
+        resource_id, _ = read_long(data, offset)
+        if self.cursors.pop(resource_id, None) is None:
+            raise _RequestError(f"Failed to find resource with id: {resource_id}")
+        return b''
+
+    def _query_sql_fields(self, data: bytes, offset: int) -> bytes:
+        offset += 4 + 1
+        _, offset = read_string(data, offset)
+        page_size, offset = read_int(data, offset)
+        max_rows, offset = read_int(data, offset)
+        include_field_names = data[-1] != 0
+        sql, offset = read_string(data, offset)
+        arg_count, offset = read_int(data, offset)
+        args = []
+        for _ in range(arg_count):
+            arg, offset = read_object(data, offset)
+            args.append(arg)
+        if data[offset] == StatementType.UPDATE.value:
+            return self._update(sql, args, include_field_names)
+
+        result_set = self.result_set
+        row_limit = result_set.row_count if max_rows <= 0 else min(max_rows, result_set.row_count)
+        cursor_id, page = self._open_cursor(_Cursor(result_set, page_size, row_limit))
+
+        body = [struct.pack('<qi', cursor_id, len(result_set.column_types))]
+        if include_field_names:
+            body.extend(_encode_string_cell(name) for name in result_set.names())
+        body.append(page)
+        return b''.join(body)
+
+    def _update(self, sql: str, args: List[Any], include_field_names: bool) -> bytes:
+        try:
+            count = self.update_handler(sql, args)
+        except Exception as e:
+            raise _RequestError(str(e))
+        self.updates.append((sql, args))
+        body = [struct.pack('<qi', 0, 1)]
+        if include_field_names:
+            body.append(_encode_string_cell("UPDATED"))
+        body.append(struct.pack('<iBq?', 1, 4, count, False))
+        return b''.join(body)
+
+    def _open_cursor(self, cursor: Union[_Cursor, _ScanCursor]) -> (int, bytes):
+        self._next_cursor_id += 1
+        page, has_more = cursor.next_page()
+        if has_more:
+            self.cursors[self._next_cursor_id] = cursor
+        return self._next_cursor_id, page
+
+    def _query_scan(self, data: bytes, offset: int) -> bytes:
+        cache, offset = self._cache(data, offset)
+        # the remote filter is ignored
+        _, offset = read_object(data, offset)
+        page_size, offset = read_int(data, offset)
+        partition, _ = read_int(data, offset)
+        partition_count = sum(len(partitions) for partitions in self.partitions.values())
+        entries = [key + value for key, value in cache.items()
+                   if partition < 0 or rendezvous_partition(key_hash_code(read_object(key, 0)[0]),
+                                                            partition_count) == partition]
+        cursor_id, page = self._open_cursor(_ScanCursor(entries, page_size))
+        return struct.pack('<q', cursor_id) + page
+
+    # cache entries are kept in their encoded form, keyed by the encoded key
+    def _cache(self, data: bytes, offset: int) -> (Dict[bytes, bytes], int):
+        cache_id, offset = read_int(data, offset)
+        return self.caches.setdefault(cache_id, {}), offset + 1
+
+    def _cache_get(self, data: bytes, offset: int) -> bytes:
+        cache, offset = self._cache(data, offset)
+        key, _ = _read_raw(data, offset)
+        return cache.get(key, b'\x65')
+
+    def _cache_put(self, data: bytes, offset: int) -> bytes:
+        cache, offset = self._cache(data, offset)
+        key, offset = _read_raw(data, offset)
+        cache[key], _ = _read_raw(data, offset)
+        return b''
+
+    def _cache_get_all(self, data: bytes, offset: int) -> bytes:
+        cache, offset = self._cache(data, offset)
+        keys, _ = _read_raw_list(data, offset)
+        found = [key + cache[key] for key in keys if key in cache]
+        return struct.pack('<i', len(found)) + b''.join(found)
+
+    def _cache_put_all(self, data: bytes, offset: int) -> bytes:
+        cache, offset = self._cache(data, offset)
+        count, offset = read_int(data, offset)
+        for _ in range(count):
+            key, offset = _read_raw(data, offset)
+            cache[key], offset = _read_raw(data, offset)
+        return b''
+
+    def _cache_contains_keys(self, data: bytes, offset: int) -> bytes:
+        cache, offset = self._cache(data, offset)
+        keys, _ = _read_raw_list(data, offset)
+        return bytes([all(key in cache for key in keys)])
+
+    def _cache_remove_all(self, data: bytes, offset: int) -> bytes:
+        cache, _ = self._cache(data, offset)
+        cache.clear()
+        return b''
+
+    # every cache is a single partition aware group spread over the configured partitions map
+    def _cache_partitions(self, data: bytes, offset: int) -> bytes:
+        cache_count, offset = read_int(data, offset)
+        cache_ids = struct.unpack_from(f'<{cache_count}i', data, offset)
+        body = [struct.pack('<qiiBi', *self.topology_version, 1, True, cache_count)]
+        body.extend(struct.pack('<ii', cache_id, 0) for cache_id in cache_ids)
+        body.append(struct.pack('<i', len(self.partitions)))
+        for node_id, partitions in self.partitions.items():
+            body.append(encode_object(node_id))
+            body.append(struct.pack(f'<i{len(partitions)}i', len(partitions), *partitions))
+        return b''.join(body)
+
+    @staticmethod
+    def _ok(request_id: int, body: bytes, flags_header: bool = False) -> bytes:
+        if flags_header:
+            return _FLAGS_RESPONSE_HEADER.pack(8 + 2 + len(body), request_id, 0) + body
+        return _RESPONSE_HEADER.pack(8 + 4 + len(body), request_id, 0) + body
+
+    @staticmethod
+    def _error(request_id: int, message: str, flags_header: bool = False) -> bytes:
+        encoded = _encode_string_cell(message)
+        if flags_header:
+            return _FLAGS_RESPONSE_HEADER.pack(8 + 2 + 4 + len(encoded), request_id, ResponseFlagConst.ERROR) + \
+                struct.pack('<i', 1) + encoded
+        return _RESPONSE_HEADER.pack(8 + 4 + len(encoded), request_id, 1) + encoded
@@ -0,0 +1,826 @@
+import asyncio
+import contextlib
+import dataclasses
+import datetime
+import decimal
+import io
+import itertools
+import json
+import os
+import tempfile
+import threading
+import unittest
+import uuid
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from ignite_client import cli
+from ignite_client.client import IgniteClient, deadline
+from ignite_client.codec import BinaryEnum, BinaryObject, FixedRowDecoder
+from ignite_client.export import JsonLinesPageWriter, ParquetPageWriter, pa, pq
+from ignite_client.columnar import Column, np, pd, read_columns, to_dataframe
+from ignite_client.fake_server import FakeIgniteServer, SyntheticResultSet
+from ignite_client.constants import OpConst
+from ignite_client.fanout import MergeSorted, Reaggregate
+from ignite_client.lazy import LazyPage, LazyRow, read_lazy_rows
+from ignite_client.loader import BulkLoader, SqlInsertSink
+from ignite_client.metadata import ResultMetadataCache
+from ignite_client.metrics import ClientMetrics, MetricsHook
+from ignite_client.page_size import AdaptivePageSize
+from ignite_client.pool import IgniteConnectionPool
+from ignite_client.result_cache import SqlResultCache
+from ignite_client.sync_client import SyncIgniteClient, SyncIgniteConnectionPool
+from ignite_client.transport import FrameProtocol
+from ignite_client.utils import cache_id
+from ignite_client.protocol import HandshakeRequest, HandshakeSuccess, HandshakeFailed, QuerySqlFieldsRequest, \
+    StatementType, QueryScanRequest
+
+
+def new_query_request(cursor_page_size: int = 4, query_args=None) -> QuerySqlFieldsRequest:
+    query_args = query_args or []
+    flags = dict.fromkeys(['distributed_join', 'local_query', 'replicated_only', 'enforce_join_order', 'collocated',
+                           'lazy'], False)
+    return QuerySqlFieldsRequest(cache_id=0, schema="PUBLIC", cursor_page_size=cursor_page_size, max_rows=0,
+                                 sql="SELECT ID, NAME FROM PERSON", query_arg_count=len(query_args),
+                                 query_args=query_args, statement_type=StatementType.SELECT,
+                                 timeout_milliseconds=0, include_field_names=True, **flags)
+
+
+class FakeServerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeIgniteServer(SyntheticResultSet(column_types=[3, 9], row_count=10))
+        await self.server.start()
+        self.client = IgniteClient('127.0.0.1', self.server.port)
+        await self.client.connect()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.stop()
+
+    async def handshake(self):
+        response = await self.client.handshake(HandshakeRequest(1, 0, 0, "", ""))
+        self.assertIsInstance(response, HandshakeSuccess)
+
+
+class TestMultiplexing(FakeServerTestCase):
+    async def test_responses_are_matched_by_request_id(self):
+        await self.handshake()
+        await self.client.cache_put(1, "alice", "Alice")
+        # gets are answered last, so the responses arrive in another order than the requests went out
+        self.server.latency = lambda op_code: 0.1 if op_code == OpConst.CACHE_GET else 0.0
+        finished = []
+
+        async def run(name, request):
+            result = await request
+            finished.append(name)
+            return result
+
+        results = await asyncio.gather(run('get', self.client.cache_get(1, "alice")),
+                                       run('contains', self.client.cache_contains_keys(1, ["alice"])),
+                                       run('missing', self.client.cache_get(1, "bob")))
+        self.assertEqual(["Alice", True, None], results)
+        self.assertEqual('contains', finished[0])
+
+    async def test_connection_loss_fails_pending_requests(self):
+        await self.handshake()
+        self.server.latency = 1.0
+        requests = asyncio.gather(*[self.client.cache_get(1, key) for key in range(3)], return_exceptions=True)
+        await asyncio.sleep(0.05)
+        await self.server.stop()
+        results = await requests
+        self.assertTrue(all(isinstance(result, ConnectionError) for result in results))
+        self.assertFalse(self.client.is_connected())
+        with self.assertRaises(ConnectionError):
+            await self.client.cache_get(1, 0)
+
+
+class TestFakeIgniteServer(FakeServerTestCase):
+    async def test_handshake_fail(self):
+        response = await self.client.handshake(HandshakeRequest(2, 15, 0, "", ""))
+        self.assertIsInstance(response, HandshakeFailed)
+        self.assertEqual((1, 7, 0), (response.major_version, response.minor_version, response.patch_version))
+
+    async def test_query_sql_fields(self):
+        await self.handshake()
+        response = await self.client.query_sql_fields(new_query_request(query_args=[1, "name"]))
+        self.assertEqual(["COLUMN_0", "COLUMN_1"], response.column_names)
+        self.assertEqual([0, "value-0-1"], response.data[0])
+        self.assertEqual(4, response.first_page_row_count)
+        self.assertTrue(response.has_more)
+
+    async def test_concurrent_queries(self):
+        await self.handshake()
+        responses = await asyncio.gather(*[self.client.query_sql_fields(new_query_request()) for _ in range(20)])
+        self.assertEqual(20, len({response.cursor_id for response in responses}))
+        pages = await asyncio.gather(*[self.client.query_sql_fields_cursor_get_page(response.cursor_id, 2)
+                                       for response in responses])
+        self.assertTrue(all(page.data[0][0] == 4 for page in pages))
+
+    async def test_sql_iterates_all_pages(self):
+        await self.handshake()
+        rows = [row async for row in self.client.sql(new_query_request(cursor_page_size=3))]
+        self.assertEqual(list(range(10)), [row[0] for row in rows])
+        self.assertEqual({}, self.server.cursors)
+
+    async def test_sql_closes_cursor_on_early_exit(self):
+        await self.handshake()
+        rows = self.client.sql(new_query_request(cursor_page_size=3))
+        async for row in rows:
+            if row[0] == 4:
+                break
+        await rows.aclose()
+        self.assertEqual({}, self.server.cursors)
+
+    async def test_sql_prefetches_next_page(self):
+        await self.handshake()
+        pages = self.client.sql_pages(await self.client.query_sql_fields(new_query_request(cursor_page_size=3)))
+        seen = []
+        async for page in pages:
+            seen.append([row[0] for row in page])
+            await asyncio.sleep(0.02)
+            # the next page was requested while this one was being consumed
+            self.assertEqual(len(seen) + (len(seen) < 4), self.server.request_count)
+        self.assertEqual([[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]], seen)
+        self.assertEqual({}, self.server.cursors)
+
+    async def test_cache_put_and_get(self):
+        await self.handshake()
+        person = BinaryObject.of("Person", {"id": 1, "name": "Alice"})
+        await self.client.cache_put(1, "alice", person)
+        self.assertEqual(person, await self.client.cache_get(1, "alice"))
+        self.assertIsNone(await self.client.cache_get(1, "bob"))
+
+    async def test_cache_bulk_operations_in_chunks(self):
+        await self.handshake()
+        entries = {key: f"value-{key}" for key in range(2500)}
+        await self.client.cache_put_all(1, entries, chunk_size=300)
+        self.assertEqual(entries, await self.client.cache_get_all(1, range(2600), chunk_size=300))
+        self.assertTrue(await self.client.cache_contains_keys(1, range(2500), chunk_size=300))
+        self.assertFalse(await self.client.cache_contains_keys(1, range(2501), chunk_size=300))
+        await self.client.cache_remove_all(1)
+        self.assertEqual({}, await self.client.cache_get_all(1, range(10)))
+
+    async def test_scan(self):
+        await self.handshake()
+        await self.client.cache_put_all(1, {key: str(key) for key in range(10)})
+        entries = [entry async for entry in self.client.scan(QueryScanRequest(1, page_size=3))]
+        self.assertEqual({key: str(key) for key in range(10)}, dict(entries))
+        self.assertEqual({}, self.server.cursors)
+
+    async def test_metrics(self):
+        cursors = []
+
+        class Hook(MetricsHook):
+            def on_cursor(self, op_code: int, pages: int):
+                cursors.append((op_code, pages))
+
+        self.client.metrics = ClientMetrics(hooks=[Hook()])
+        await self.handshake()
+        rows = [row async for row in self.client.sql(new_query_request(cursor_page_size=3))]
+        self.assertEqual(10, len(rows))
+        metrics = self.client.metrics
+        self.assertEqual({OpConst.QUERY_SQL_FIELDS: 1, OpConst.QUERY_SQL_FIELDS_CURSOR_GET_PAGE: 3}, metrics.requests)
+        self.assertEqual([(OpConst.QUERY_SQL_FIELDS, 4)], cursors)
+        self.assertEqual(3, metrics.latency(OpConst.QUERY_SQL_FIELDS_CURSOR_GET_PAGE, 'wait').count)
+        self.assertGreater(metrics.bytes_in, metrics.bytes_out)
+        self.assertEqual(0, metrics.in_flight)
+        self.assertIn('query_sql_fields.decode', metrics.snapshot()['latency'])
+
+    async def test_cli_export(self):
+        await self.handshake()
+        await self.client.cache_put_all(cache_id("people"), {key: f"name-{key}" for key in range(5)})
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, 'people.csv')
+            arguments = ['export', '--port', str(self.server.port), '--page-size', '3', '-o']
+            self.assertEqual(10, await cli.export(cli.parse_args(arguments + [csv_path, '--sql', 'SELECT 1'])))
+            with open(csv_path, encoding='utf-8') as output:
+                lines = output.read().splitlines()
+            self.assertEqual(["COLUMN_0,COLUMN_1", "0,value-0-1"], lines[:2])
+            self.assertEqual(11, len(lines))
+
+            jsonl_path = os.path.join(directory, 'people.jsonl')
+            self.assertEqual(5, await cli.export(cli.parse_args(arguments + [jsonl_path, '--scan', 'people'])))
+            with open(jsonl_path, encoding='utf-8') as output:
+                rows = [json.loads(line) for line in output]
+            self.assertEqual({"KEY": 3, "VALUE": "name-3"}, sorted(rows, key=lambda row: row["KEY"])[3])
+
+            # an output that cannot be opened still closes the cursor of the query
+            missing_path = os.path.join(directory, 'missing', 'people.csv')
+            with self.assertRaises(FileNotFoundError):
+                await cli.export(cli.parse_args(arguments + [missing_path, '--sql', 'SELECT 1']))
+        self.assertEqual({}, self.server.cursors)
+
+    async def test_cli_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, 'people.csv')
+            with open(csv_path, 'w', encoding='utf-8') as source:
+                source.write("ID,NAME,AGE\n" + ''.join(f"{key},name-{key},{key % 90}\n" for key in range(250)))
+            arguments = ['load', '--port', str(self.server.port), '-i', csv_path, '--batch-size', '100',
+                         '--connections', '2']
+            result = await cli.load(cli.parse_args(arguments + ['--cache', 'people', '--key-column', 'ID',
+                                                                '--value-type', 'Person', '--column-type', 'ID=int',
+                                                                '--column-type', 'AGE=int']))
+            self.assertEqual((250, 3, 0), (result.rows, result.batches, result.retries))
+            await self.handshake()
+            person = await self.client.cache_get(cache_id("people"), 7)
+            self.assertEqual(("name-7", 7), (person["NAME"], person["AGE"]))
+
+            requests = self.server.request_count
+            result = await cli.load(cli.parse_args(arguments + ['--table', 'PERSON']))
+            self.assertEqual(250, result.rows)
+            # one multi-row INSERT per batch of 100 rows
+            self.assertEqual(3, self.server.request_count - requests)
+
+    async def test_decode_offloaded_to_executors(self):
+        await self.handshake()
+        for executor in (ThreadPoolExecutor(2), ProcessPoolExecutor(2)):
+            with executor:
+                self.client.decode_executor = executor
+                self.client.decode_offload_threshold = 0
+                rows = [row async for row in self.client.sql(new_query_request(cursor_page_size=3))]
+                self.assertEqual([[row, f"value-{row}-1"] for row in range(10)], rows)
+        self.client.decode_executor = None
+
+    async def test_lazy_rows(self):
+        await self.handshake()
+        rows = [row async for row in self.client.sql(new_query_request(cursor_page_size=3), read_lazy_rows)]
+        self.assertTrue(all(isinstance(row, LazyRow) for row in rows))
+        self.assertEqual([[row, f"value-{row}-1"] for row in range(10)], rows)
+        self.assertEqual(("value-7-1", 7), (rows[7]["COLUMN_1"], rows[7][0]))
+        self.assertEqual("value-9-1", rows[9][-1])
+        with self.assertRaises(KeyError):
+            _ = rows[0]["MISSING"]
+
+    async def test_extended_types(self):
+        await self.handshake()
+        self.server.result_set = SyntheticResultSet(column_types=[7, 10, 11, 14, 17, 19, 20, 28, 30, 33],
+                                                    row_count=10, null_every=11)
+        rows = [row async for row in self.client.sql(new_query_request(cursor_page_size=3))]
+        self.assertEqual(['b', uuid.UUID(int=1), datetime.date(2020, 1, 2), array('i', [1, 2, 3, 4]),
+                          array('d', [0.25] * 16), [True, False, False], ["item-1", None], BinaryEnum(7, 1),
+                          decimal.Decimal('0.01'),
+                          datetime.datetime(2020, 1, 1, 0, 0, 1, tzinfo=datetime.timezone.utc)], rows[1])
+        self.assertIsNone(rows[0][0])
+        lazy_rows = [row async for row in self.client.sql(new_query_request(cursor_page_size=3), read_lazy_rows)]
+        self.assertEqual(rows, lazy_rows)
+
+    async def test_execute_many(self):
+        await self.handshake()
+
+        def update(_sql, args):
+            if args[1] is None:
+                raise ValueError("NAME must not be null")
+            return 1
+
+        self.server.update_handler = update
+        rows = [(i, None if i % 10 == 3 else f"name-{i}") for i in range(100)]
+        result = await self.client.execute_many("INSERT INTO PERSON (ID, NAME) VALUES (?, ?)", rows, max_in_flight=8)
+        self.assertEqual(90, result.updated)
+        self.assertEqual({i for i in range(100) if i % 10 == 3}, set(result.errors))
+        self.assertIn("NAME must not be null", str(result.errors[3]))
+        self.assertEqual([None if i % 10 == 3 else 1 for i in range(100)], result.update_counts)
+        self.assertEqual(sorted(list(row) for row in rows if row[1] is not None),
+                         sorted(args for _, args in self.server.updates))
+
+    async def test_result_metadata_cache(self):
+        await self.handshake()
+        result_set = SyntheticResultSet(column_types=[3, 4, 6], row_count=10, column_names=["ID", "AMOUNT", "PRICE"])
+        self.server.result_set = result_set
+        self.client.result_metadata = ResultMetadataCache()
+        self.client.metrics = ClientMetrics()
+        request = new_query_request(cursor_page_size=3)
+        await self.client.query_sql_fields(dataclasses.replace(request, cursor_page_size=10))
+        bytes_in = self.client.metrics.bytes_in
+        metadata = self.client.result_metadata.get(ResultMetadataCache.key(request))
+        self.assertEqual((["ID", "AMOUNT", "PRICE"], [3, 4, 6]), (metadata.column_names, metadata.column_types))
+        self.assertIsInstance(metadata.matrix_decoder, FixedRowDecoder)
+
+        # rows with nulls no longer match the prepared row layout and are decoded cell by cell
+        self.server.result_set = dataclasses.replace(result_set, null_every=4, _rows={})
+        response = await self.client.query_sql_fields(dataclasses.replace(request, cursor_page_size=10))
+        self.assertEqual(["ID", "AMOUNT", "PRICE"], response.column_names)
+        self.assertLess(self.client.metrics.bytes_in - bytes_in, bytes_in)
+        self.assertEqual([[None, 1, 0.0], [1, 1001, 0.25], [2, 2001, None], [3, None, 0.75]], response.data[:4])
+        rows = [row async for row in self.client.sql(request)]
+        self.assertEqual(response.data, rows)
+
+        # a stale entry of another shape is replaced, and the query runs again for the field names
+        self.client.result_metadata.put(ResultMetadataCache.key(request), ["ID", "NAME"], [3, 9])
+        requests = self.server.request_count
+        response = await self.client.query_sql_fields(request)
+        self.assertEqual(["ID", "AMOUNT", "PRICE"], response.column_names)
+        self.assertEqual([None, 1, 0.0], response.data[0])
+        self.assertEqual(["ID", "AMOUNT", "PRICE"],
+                         self.client.result_metadata.get(ResultMetadataCache.key(request)).column_names)
+        # the first cursor was closed on the way
+        self.assertEqual(3, self.server.request_count - requests)
+        self.assertEqual([response.cursor_id], list(self.server.cursors))
+        await self.client.resource_close(response.cursor_id)
+
+        await self.client.query_sql_fields(dataclasses.replace(request, sql="DROP TABLE PERSON",
+                                                               statement_type=StatementType.ANY))
+        self.assertEqual(0, len(self.client.result_metadata))
+
+    async def test_adaptive_page_size(self):
+        await self.handshake()
+        # rows of an int and a short string take about 30 bytes of a small page, headers included
+        self.client.page_sizer = AdaptivePageSize(target_bytes=300, min_page_size=2, max_page_size=64)
+        request = new_query_request(cursor_page_size=2)
+        rows = [row async for row in self.client.sql(request)]
+        self.assertEqual(10, len(rows))
+        page_size = self.client.page_sizer.page_size(AdaptivePageSize.key(request), 2)
+        self.assertIn(page_size, (4, 8))
+        response = await self.client.query_sql_fields(request)
+        self.assertEqual(page_size, response.first_page_row_count)
+        await self.client.resource_close(response.cursor_id)
+        self.assertEqual({}, self.client.open_cursors())
+
+        self.client.page_sizer = AdaptivePageSize(target_bytes=1 << 20, target_latency=1e-9, min_page_size=3)
+        rows = [row async for row in self.client.sql(request)]
+        self.assertEqual(3, self.client.page_sizer.page_size(AdaptivePageSize.key(request), 2))
+
+    async def test_deadline(self):
+        await self.handshake()
+        self.server.latency = 0.1
+        with self.assertRaises(asyncio.TimeoutError):
+            with deadline(0.02):
+                await self.client.query_sql_fields(new_query_request(cursor_page_size=3))
+        # the late response is dropped and the cursor it opened is closed, leaving the connection usable
+        await self.client.cache_put(1, "alice", "Alice")
+        self.assertEqual("Alice", await self.client.cache_get(1, "alice"))
+        rows = [row async for row in self.client.sql(new_query_request(cursor_page_size=3))]
+        self.assertEqual(list(range(10)), [row[0] for row in rows])
+        await asyncio.sleep(0.2)
+        self.assertEqual({}, self.server.cursors)
+
+        # a deadline running out between pages closes the cursor despite it
+        rows = []
+        with self.assertRaises(asyncio.TimeoutError):
+            with deadline(0.15):
+                async for row in self.client.sql(new_query_request(cursor_page_size=3)):
+                    rows.append(row)
+        self.assertEqual([0, 1, 2], [row[0] for row in rows])
+        self.assertEqual({}, self.server.cursors)
+        self.assertEqual({}, self.client.open_cursors())
+
+    async def test_cancellation_reclaims_cursors(self):
+        await self.handshake()
+        self.server.latency = 0.05
+        task = asyncio.ensure_future(self.client.query_sql_fields(new_query_request(cursor_page_size=3)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.15)
+        self.assertEqual({}, self.server.cursors)
+
+        self.client.request_timeout = 1.0
+        response = await self.client.query_sql_fields(new_query_request(cursor_page_size=3))
+        self.assertEqual({response.cursor_id: "SELECT ID, NAME FROM PERSON"}, self.client.open_cursors())
+        with self.assertLogs('ignite_client.client', 'WARNING'):
+            self.assertEqual({response.cursor_id: "SELECT ID, NAME FROM PERSON"}, await self.client.close())
+
+
+class TestCursorRelease(FakeServerTestCase):
+    async def test_break_after_last_page_was_prefetched(self):
+        await self.handshake()
+        await self.client.cache_put_all(cache_id("people"), {key: f"name-{key}" for key in range(5)})
+        for rows in (self.client.sql(new_query_request(cursor_page_size=4)),
+                     self.client.scan(QueryScanRequest(cache_id("people"), 3))):
+            async for _ in rows:
+                # the last page arrives while the first row of the page before it is consumed
+                await asyncio.sleep(0.02)
+                if not self.client.open_cursors():
+                    break
+            # the server released the cursor with its last page, so there is nothing left to close
+            await rows.aclose()
+            self.assertEqual({}, self.server.cursors)
+
+    async def test_break_while_page_is_in_flight(self):
+        await self.handshake()
+        self.server.latency = 0.02
+        rows = self.client.sql(new_query_request(cursor_page_size=3))
+        async for _ in rows:
+            break
+        await rows.aclose()
+        self.assertEqual({}, self.server.cursors)
+        self.assertEqual({}, self.client.open_cursors())
+
+        # a consumer cancelled while the page is in flight leaves the cursor to be closed in the background
+        rows = self.client.sql(new_query_request(cursor_page_size=3))
+        async for _ in rows:
+            break
+        task = asyncio.ensure_future(rows.aclose())
+        await asyncio.sleep(0.005)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.1)
+        self.assertEqual({}, self.server.cursors)
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestColumnar(FakeServerTestCase):
+    async def read_pages(self, request: QuerySqlFieldsRequest, matrix_decoder=None) -> list:
+        response = await self.client.query_sql_fields(request, matrix_decoder)
+        return [page async for page in self.client.sql_pages(response, matrix_decoder)]
+
+    async def test_fixed_width_pages(self):
+        await self.handshake()
+        self.server.result_set = SyntheticResultSet(column_types=[1, 2, 3, 4, 5, 6, 8], row_count=10)
+        request = new_query_request(cursor_page_size=4)
+        pages = await self.read_pages(request, read_columns)
+        self.assertEqual([4, 4, 2], [len(page[0]) for page in pages])
+        self.assertEqual(['int8', 'int16', 'int32', 'int64', 'float32', 'float64', 'bool'],
+                         [column.values.dtype.name for column in pages[0]])
+        self.assertTrue(all(column.null_mask is None for page in pages for column in page))
+        rows = [row for page in await self.read_pages(request) for row in page]
+        self.assertEqual(rows, [[column.values[i].item() for column in page] for page in pages
+                                for i in range(len(page[0]))])
+
+    async def test_nulls_and_strings(self):
+        await self.handshake()
+        self.server.result_set = SyntheticResultSet(column_types=[3, 6, 9, 14], row_count=10, null_every=3)
+        request = new_query_request(cursor_page_size=6)
+        pages = await self.read_pages(request, read_columns)
+        rows = [row for page in await self.read_pages(request) for row in page]
+        self.assertEqual(['int32', 'float64', 'object', 'object'], [column.values.dtype.name for column in pages[0]])
+        for page, page_rows in zip(pages, (rows[:6], rows[6:])):
+            for index, column in enumerate(page):
+                expected = [row[index] for row in page_rows]
+                self.assertEqual([value is None for value in expected], list(column.null_mask))
+                values = [None if null else value for value, null in zip(column.values, column.null_mask)]
+                if index == 3:
+                    values = [None if value is None else list(value) for value in values]
+                    expected = [None if value is None else list(value) for value in expected]
+                self.assertEqual(expected, values)
+
+    async def test_later_pages_use_the_decoder_of_the_first(self):
+        await self.handshake()
+        request = new_query_request(cursor_page_size=4)
+        rows = [row for page in await self.read_pages(request) for row in page]
+        for matrix_decoder in (read_lazy_rows, read_columns):
+            response = await self.client.query_sql_fields(request, matrix_decoder)
+            # the pages after the first are fetched without naming the decoder again
+            pages = [page async for page in self.client.sql_pages(response)]
+            self.assertEqual(3, len(pages))
+            if matrix_decoder is read_lazy_rows:
+                self.assertTrue(all(isinstance(page, LazyPage) for page in pages))
+                self.assertEqual(rows, [list(row) for page in pages for row in page])
+            else:
+                self.assertTrue(all(isinstance(column, Column) for page in pages for column in page))
+                self.assertEqual(rows, [[column.values[i] for column in page] for page in pages
+                                        for i in range(len(page[0]))])
+
+    @unittest.skipIf(pd is None, "pandas is not installed")
+    async def test_to_dataframe(self):
+        await self.handshake()
+        self.server.result_set = SyntheticResultSet(column_types=[3, 8, 9], row_count=6, null_every=4)
+        response = await self.client.query_sql_fields(new_query_request(cursor_page_size=6), read_columns)
+        frame = to_dataframe(response.column_names, response.data)
+        # nullable pandas dtypes keep the integers and booleans of columns with nulls
+        self.assertEqual(['Int32', 'boolean'], [str(dtype) for dtype in frame.dtypes[:2]])
+        self.assertTrue(frame['COLUMN_0'].isna()[0])
+        self.assertEqual("value-1-2", frame['COLUMN_2'][1])
+
+
+class TestExport(unittest.TestCase):
+    def test_plain_values(self):
+        output = io.StringIO()
+        writer = JsonLinesPageWriter(output)
+        writer.open(["AT", "DATA", "ITEMS", "ENUM"])
+        writer.write_page([[datetime.datetime(2020, 1, 2, 3, 4, 5), b'\x01\x02', array('i', [1, 2]), BinaryEnum(7, 1)]])
+        self.assertEqual({"AT": "2020-01-02T03:04:05", "DATA": "AQI=", "ITEMS": [1, 2], "ENUM": [7, 1]},
+                         json.loads(output.getvalue()))
+
+    @unittest.skipIf(pq is None, "pyarrow is not installed")
+    def test_parquet_schema_from_type_codes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'people.parquet')
+            # NAME is null throughout the first page, and NOTE has no known type
+            writer = ParquetPageWriter(path, [3, 9, 101, 1])
+            writer.open(["ID", "NAME", "NOTE", "LEVEL"])
+            writer.write_page([[1, None, None, -1], [2, None, None, -128]])
+            writer.write_page([[3, "c", 7, 127]])
+            writer.close()
+            table = pq.read_table(path)
+        self.assertEqual([pa.int32(), pa.string(), pa.string(), pa.int8()], table.schema.types)
+        self.assertEqual({"ID": [1, 2, 3], "NAME": [None, None, "c"], "NOTE": [None, None, "7"],
+                          "LEVEL": [-1, -128, 127]}, table.to_pydict())
+
+
+class TestFrameProtocol(unittest.TestCase):
+    def test_frames_split_across_reads(self):
+        frames = []
+        protocol = FrameProtocol(lambda frame: frames.append(bytes(frame)), lambda exc: None, buffer_size=16)
+        payloads = [b'a' * 3, b'', b'b' * 40, b'c' * 12, b'd' * 5]
+        stream = b''.join(len(payload).to_bytes(4, 'little') + payload for payload in payloads)
+        position = 0
+        chunks = itertools.cycle((1, 7, 2, 30, 3))
+        while position < len(stream):
+            buffer = protocol.get_buffer(-1)
+            count = min(next(chunks), len(buffer), len(stream) - position)
+            buffer[:count] = stream[position:position + count]
+            protocol.buffer_updated(count)
+            position += count
+        self.assertEqual(payloads, frames)
+
+
+class TestSqlResultCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.now = 0.0
+        self.cache = SqlResultCache(ttl=5.0, max_bytes=1024, clock=lambda: self.now)
+        self.server = FakeIgniteServer(SyntheticResultSet(column_types=[3, 9], row_count=10))
+        await self.server.start()
+        self.client = IgniteClient('127.0.0.1', self.server.port, result_cache=self.cache)
+        await self.client.connect()
+        await self.client.handshake(HandshakeRequest(1, 0, 0, "", ""))
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.stop()
+
+    async def test_repeated_query_is_served_from_cache(self):
+        first = await self.client.query_sql_fields(new_query_request(cursor_page_size=10, query_args=[1]))
+        same = new_query_request(cursor_page_size=10, query_args=[1])
+        same.sql = "  SELECT ID,  NAME\nFROM PERSON "
+        cached = await self.client.query_sql_fields(same)
+        self.assertEqual(first, cached)
+        # every caller gets rows of its own
+        cached.data[0][1] = "changed"
+        cached.data.clear()
+        self.assertEqual(first, await self.client.query_sql_fields(same))
+        await self.client.query_sql_fields(new_query_request(cursor_page_size=10, query_args=[2]))
+        self.assertEqual(2, self.server.request_count)
+        self.assertEqual((2, 2), (self.cache.stats.hits, self.cache.stats.misses))
+
+    def test_whitespace_in_quotes_is_kept(self):
+        def key(sql: str) -> tuple:
+            request = new_query_request()
+            request.sql = sql
+            return SqlResultCache.key(request)
+
+        self.assertEqual(key("SELECT * FROM PERSON WHERE NAME = 'a b'"),
+                         key(" SELECT *\n  FROM PERSON\tWHERE NAME = 'a b' "))
+        self.assertNotEqual(key("SELECT * FROM PERSON WHERE NAME = 'a  b'"),
+                            key("SELECT * FROM PERSON WHERE NAME = 'a b'"))
+        self.assertNotEqual(key('SELECT "a  b" FROM PERSON'), key('SELECT "a b" FROM PERSON'))
+        self.assertEqual("SELECT 'it''s  here' , 'x  y", SqlResultCache.normalize_sql("SELECT  'it''s  here' , 'x  y"))
+
+    async def test_partial_results_are_not_cached(self):
+        await self.client.query_sql_fields(new_query_request(cursor_page_size=4))
+        await self.client.query_sql_fields(new_query_request(cursor_page_size=4))
+        self.assertEqual(2, self.server.request_count)
+        self.assertEqual(0, len(self.cache))
+
+    async def test_concurrent_misses_share_one_query(self):
+        responses = await asyncio.gather(*[self.client.query_sql_fields(new_query_request(cursor_page_size=10))
+                                           for _ in range(10)])
+        self.assertEqual(1, self.server.request_count)
+        self.assertTrue(all(response == responses[0] for response in responses))
+        self.assertEqual(10, len({id(response.data) for response in responses}))
+        self.assertEqual(9, self.cache.stats.coalesced)
+
+    async def test_concurrent_misses_with_cursors_run_separately(self):
+        responses = await asyncio.gather(*[self.client.query_sql_fields(new_query_request(cursor_page_size=4))
+                                           for _ in range(3)])
+        self.assertEqual(3, len({response.cursor_id for response in responses}))
+        for response in responses:
+            await self.client.resource_close(response.cursor_id)
+
+    async def test_ttl_and_size_bound(self):
+        await self.client.query_sql_fields(new_query_request(cursor_page_size=10, query_args=[0]))
+        self.now = 5.0
+        await self.client.query_sql_fields(new_query_request(cursor_page_size=10, query_args=[0]))
+        self.assertEqual(1, self.cache.stats.expirations)
+        for arg in range(1, 20):
+            await self.client.query_sql_fields(new_query_request(cursor_page_size=10, query_args=[arg]))
+        self.assertLessEqual(self.cache.stats.size_bytes, 1024)
+        self.assertGreater(self.cache.stats.evictions, 0)
+        self.assertIsNone(self.cache.get(SqlResultCache.key(new_query_request(cursor_page_size=10, query_args=[0]))))
+
+
+class TestConnectionPool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeIgniteServer()
+        await self.server.start()
+        self.pool = IgniteConnectionPool([('127.0.0.1', self.server.port)], HandshakeRequest(1, 0, 0, "", ""),
+                                         size_per_node=2, reconnect_interval=0.01)
+        await self.pool.start()
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+        await self.server.stop()
+
+    async def lease(self) -> IgniteClient:
+        async with self.pool.acquire() as client:
+            return client
+
+    async def test_lease_and_release(self):
+        async with self.pool.acquire() as first, self.pool.acquire() as second:
+            self.assertIsNot(first, second)
+            # both connections are leased, so a third caller waits for one of them
+            waiting = asyncio.ensure_future(self.lease())
+            await asyncio.sleep(0.01)
+            self.assertFalse(waiting.done())
+        self.assertIn(await waiting, (first, second))
+
+    async def test_reconnect_after_dropped_connections(self):
+        async with self.pool.acquire() as client:
+            await client.cache_put(1, "alice", "Alice")
+        self.server.drop_connections()
+        await asyncio.sleep(0.05)
+        # leasing finds the dropped connections unhealthy and hands their slots to reconnect
+        with self.assertRaises(ConnectionError):
+            async with self.pool.acquire():
+                pass
+        clients = set()
+        for _ in range(200):
+            with contextlib.suppress(ConnectionError):
+                clients.add(await self.lease())
+            if len(clients) == 2:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(2, len(clients))
+        for client in clients:
+            self.assertEqual("Alice", await client.cache_get(1, "alice"))
+
+    async def test_bulk_load_retries_failed_statement(self):
+        failed = []
+
+        def update(_sql, args):
+            # the connection of the third statement is lost before it is answered, once
+            if args[0] == 20 and not failed:
+                failed.append(args[0])
+                self.server.drop_connections()
+                raise ValueError("lost")
+            return 10
+
+        self.server.update_handler = update
+        rows = [{"ID": i, "NAME": f"name-{i}"} for i in range(50)]
+        loader = BulkLoader(self.pool, SqlInsertSink("PERSON", ["ID", "NAME"], rows_per_statement=10),
+                            batch_size=50, retry_delay=0.02)
+        result = await loader.load(rows)
+        self.assertEqual((50, 1), (result.rows, result.batches))
+        self.assertGreaterEqual(result.retries, 1)
+        # the statements before the failed one were not sent again
+        self.assertEqual([0, 10, 20, 30, 40], [args[0] for _, args in self.server.updates])
+
+    async def test_bulk_load_fails_on_rejected_rows(self):
+        attempts = []
+
+        def update(_sql, args):
+            attempts.append(args[0])
+            raise ValueError("NAME must not be null")
+
+        self.server.update_handler = update
+        loader = BulkLoader(self.pool, SqlInsertSink("PERSON", ["ID", "NAME"]), retry_delay=0)
+        with self.assertRaisesRegex(Exception, "NAME must not be null"):
+            await loader.load([{"ID": 1, "NAME": None}])
+        self.assertEqual([1], attempts)
+
+    async def test_start_without_reachable_nodes(self):
+        await self.server.stop()
+        pool = IgniteConnectionPool([('127.0.0.1', self.server.port)], HandshakeRequest(1, 0, 0, "", ""))
+        with self.assertRaises(ConnectionError):
+            await pool.start()
+
+
+class TestPartitionAwareness(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        node_ids = [uuid.uuid4(), uuid.uuid4()]
+        partitions = {node_ids[0]: list(range(0, 64, 2)), node_ids[1]: list(range(1, 64, 2))}
+        self.servers = [FakeIgniteServer(node_id=node_id, partitions=partitions) for node_id in node_ids]
+        for server in self.servers:
+            await server.start()
+        self.pool = IgniteConnectionPool([('127.0.0.1', server.port) for server in self.servers],
+                                         HandshakeRequest(1, 4, 0, "", ""), size_per_node=2)
+        await self.pool.start()
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+        for server in self.servers:
+            await server.stop()
+
+    async def test_keys_go_to_primary_node(self):
+        entries = {key: f"value-{key}" for key in range(100)}
+        await self.pool.cache_put_all(1, entries)
+        await self.pool.cache_put(1, "alice", "value-alice")
+        sizes = [len(server.caches[1]) for server in self.servers]
+        self.assertEqual(101, sum(sizes))
+        self.assertTrue(all(sizes))
+        self.assertEqual(entries, await self.pool.cache_get_all(1, range(100)))
+        self.assertEqual("value-alice", await self.pool.cache_get(1, "alice"))
+        self.assertTrue(await self.pool.cache_contains_keys(1, range(100)))
+
+    async def test_topology_change_drops_affinity(self):
+        entries = {key: f"value-{key}" for key in range(100)}
+        await self.pool.cache_put_all(1, entries)
+        placement = [set(server.caches[1]) for server in self.servers]
+        # the nodes swap their partitions; the first response on each connection tells the client
+        node_ids = list(self.servers[0].partitions)
+        swapped = {node_ids[0]: list(range(1, 64, 2)), node_ids[1]: list(range(0, 64, 2))}
+        for server in self.servers:
+            server.change_topology((2, 0), swapped)
+            server.caches.clear()
+        self.assertIsNone(await self.pool.cache_get(1, 0))
+        await self.pool.cache_put_all(1, entries)
+        self.assertEqual(placement[::-1], [set(server.caches[1]) for server in self.servers])
+        self.assertEqual(entries, await self.pool.cache_get_all(1, range(100)))
+
+    async def test_parallel_partition_scan(self):
+        entries = {key: f"value-{key}" for key in range(500)}
+        await self.pool.cache_put_all(1, entries)
+        self.assertEqual(64, len(await self.pool.scan_partition_ids(1)))
+        scanned = [entry async for entry in self.pool.scan(1, page_size=3, parallelism=4)]
+        self.assertEqual(entries, dict(scanned))
+        self.assertEqual(500, len(scanned))
+        self.assertEqual([(key, f"value-{key}") for key in range(1, 500, 64)],
+                         sorted([entry async for entry in self.pool.scan_partition(1, 1)]))
+        self.assertTrue(all(not server.cursors for server in self.servers))
+
+    async def test_scan_stops_early(self):
+        await self.pool.cache_put_all(1, {key: key for key in range(500)})
+        entries = self.pool.scan(1, page_size=2, parallelism=4)
+        async for _ in entries:
+            break
+        await entries.aclose()
+        self.assertTrue(all(not server.cursors for server in self.servers))
+
+    async def test_fan_out(self):
+        # the nodes hold rows 0-9 and 5-14; the columns are an even flag and the row number three times
+        for server, first_row in zip(self.servers, (0, 5)):
+            server.result_set = SyntheticResultSet(column_types=[8, 3, 3, 3], row_count=10, first_row=first_row)
+        request = new_query_request(cursor_page_size=3)
+        numbers = list(range(10)) + list(range(5, 15))
+        rows = [row async for row in self.pool.fan_out(request)]
+        self.assertEqual(sorted(numbers), sorted(row[1] for row in rows))
+        rows = [row async for row in self.pool.fan_out(request, MergeSorted([1]))]
+        self.assertEqual(sorted(numbers), [row[1] for row in rows])
+
+        async def pages(*values):
+            for value in values:
+                yield [[value]]
+
+        merged = MergeSorted([0], descending=True).merge([pages(9, 4, None), pages(8, 7, 1), pages()])
+        self.assertEqual([9, 8, 7, 4, 1, None], [row[0] async for row in merged])
+        rows = [row async for row in self.pool.fan_out(request, Reaggregate([0], {1: 'sum', 2: 'min', 3: 'max'}))]
+        expected = {even: [even, sum(n for n in numbers if (n % 2 == 0) == even),
+                           min(n for n in numbers if (n % 2 == 0) == even),
+                           max(n for n in numbers if (n % 2 == 0) == even)] for even in (True, False)}
+        self.assertEqual(expected, {row[0]: row for row in rows})
+        self.assertTrue(all(not server.cursors for server in self.servers))
+
+    async def test_fan_out_stops_early(self):
+        request = new_query_request(cursor_page_size=2)
+        rows = self.pool.fan_out(request, MergeSorted([0]))
+        async for _ in rows:
+            break
+        await rows.aclose()
+        self.assertTrue(all(not server.cursors for server in self.servers))
+
+
+class TestSyncIgniteClient(unittest.TestCase):
+    def setUp(self):
+        # the fake server keeps running on its own event loop thread while the test blocks on sockets
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.server = FakeIgniteServer(SyntheticResultSet(column_types=[3, 9], row_count=10))
+        asyncio.run_coroutine_threadsafe(self.server.start(), self.loop).result()
+
+    def tearDown(self):
+        asyncio.run_coroutine_threadsafe(self.server.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def test_query_and_cache(self):
+        with SyncIgniteClient('127.0.0.1', self.server.port) as client:
+            client.connect()
+            self.assertIsInstance(client.handshake(HandshakeRequest(1, 0, 0, "", "")), HandshakeSuccess)
+            rows = list(client.sql(new_query_request(cursor_page_size=3)))
+            self.assertEqual(list(range(10)), [row[0] for row in rows])
+            rows = list(client.sql(new_query_request(cursor_page_size=3), read_lazy_rows))
+            self.assertEqual([f"value-{row}-1" for row in range(10)], [row["COLUMN_1"] for row in rows])
+            client.cache_put_all(1, {key: str(key) for key in range(100)})
+            self.assertEqual("7", client.cache_get(1, 7))
+            self.assertEqual(100, len(client.cache_get_all(1, range(200))))
+            self.assertEqual(100, len(list(client.scan(QueryScanRequest(1, page_size=7)))))
+            self.assertEqual({}, self.server.cursors)
+
+    def test_pool_from_threads(self):
+        with SyncIgniteConnectionPool([('127.0.0.1', self.server.port)], HandshakeRequest(1, 0, 0, "", ""),
+                                      size_per_node=3) as pool:
+            def run(key: int):
+                with pool.acquire() as client:
+                    client.cache_put(1, key, key * 2)
+                    return client.cache_get(1, key)
+
+            with ThreadPoolExecutor(8) as executor:
+                self.assertEqual([key * 2 for key in range(50)], list(executor.map(run, range(50))))
+            self.assertEqual(50, len(self.server.caches[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
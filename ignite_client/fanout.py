@@ -0,0 +1,166 @@
+import asyncio
+import heapq
+from typing import Any, AsyncIterator, Dict, List, Sequence
+
+# row streams of a fan-out are async iterators of pages, one per node, in the order each node returns them
+PageStream = AsyncIterator[List[List[Any]]]
+
+_STREAM_DONE = object()
+
+
+async def _close_all(streams: Sequence[PageStream]):
+    await asyncio.gather(*[stream.aclose() for stream in streams], return_exceptions=True)
+
+
+# rows as the nodes return them; every node's cursor is read concurrently
+class Concat:
+    async def merge(self, streams: Sequence[PageStream]) -> AsyncIterator[List[Any]]:
+        # a node runs at most one page ahead of the consumer
+        pages = asyncio.Queue(max(len(streams), 1))
+
+        async def drain(stream: PageStream):
+            try:
+                async for page in stream:
+                    await pages.put(page)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # whatever failed the node is raised again to the consumer
+                await pages.put(e)
+                return
+            await pages.put(_STREAM_DONE)
+
+        workers = [asyncio.ensure_future(drain(stream)) for stream in streams]
+        try:
+            remaining = len(workers)
+            while remaining:
+                page = await pages.get()
+                if page is _STREAM_DONE:
+                    remaining -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    for row in page:
+                        yield row
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await _close_all(streams)
+
+
+class _Descending:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other: '_Descending') -> bool:
+        return other.value < self.value
+
+    def __eq__(self, other) -> bool:
+        return self.value == other.value
+
+
+def _sort_value(value: Any) -> tuple:
+    # nulls sort first, as they do in ignite
+    return (False, None) if value is None else (True, value)
+
+
+# k-way merge of results each node has sorted on key_columns (the query needs the matching ORDER BY)
+class MergeSorted:
+    def __init__(self, key_columns: Sequence[int], descending: bool = False):
+        if not key_columns:
+            raise ValueError("At least one key column is required")
+        self.key_columns = list(key_columns)
+        self.descending = descending
+
+    def key(self, row: List[Any]) -> Any:
+        key = tuple(_sort_value(row[column]) for column in self.key_columns)
+        return _Descending(key) if self.descending else key
+
+    async def merge(self, streams: Sequence[PageStream]) -> AsyncIterator[List[Any]]:
+        async def rows_of(stream: PageStream) -> AsyncIterator[List[Any]]:
+            async for page in stream:
+                for row in page:
+                    yield row
+
+        async def head(rows: AsyncIterator[List[Any]]) -> Any:
+            try:
+                # anext() is a builtin only from python 3.10
+                return await rows.__anext__()  # pylint: disable=unnecessary-dunder-call
+            except StopAsyncIteration:
+                return _STREAM_DONE
+
+        node_rows = [rows_of(stream) for stream in streams]
+        try:
+            heap = []
+            for index, row in enumerate(await asyncio.gather(*[head(rows) for rows in node_rows])):
+                if row is not _STREAM_DONE:
+                    heap.append((self.key(row), index, row))
+            heapq.heapify(heap)
+            while heap:
+                _, index, row = heap[0]
+                yield row
+                row = await head(node_rows[index])
+                if row is _STREAM_DONE:
+                    heapq.heappop(heap)
+                else:
+                    heapq.heapreplace(heap, (self.key(row), index, row))
+        finally:
+            await _close_all(node_rows)
+            await _close_all(streams)
+
+
+def _combine_sum(total: Any, value: Any) -> Any:
+    if total is None:
+        return value
+    return total if value is None else total + value
+
+
+def _combine_min(current: Any, value: Any) -> Any:
+    if current is None:
+        return value
+    return current if value is None or current <= value else value
+
+
+def _combine_max(current: Any, value: Any) -> Any:
+    if current is None:
+        return value
+    return current if value is None or current >= value else value
+
+
+# partial counts are added up like sums
+_COMBINERS = {
+    'sum': _combine_sum,
+    'count': _combine_sum,
+    'min': _combine_min,
+    'max': _combine_max,
+}
+
+
+# combines per-node partial aggregates: rows with equal group_columns become one row, and every column in
+# aggregates is folded with its function. an average cannot be combined this way; query its sum and count instead
+class Reaggregate:
+    def __init__(self, group_columns: Sequence[int], aggregates: Dict[int, str]):
+        unknown = set(aggregates.values()) - set(_COMBINERS)
+        if unknown:
+            raise ValueError(f"Unsupported aggregate functions: {sorted(unknown)}")
+        self.group_columns = list(group_columns)
+        self.aggregates = [(column, _COMBINERS[function]) for column, function in aggregates.items()]
+
+    async def merge(self, streams: Sequence[PageStream]) -> AsyncIterator[List[Any]]:
+        groups: Dict[tuple, List[Any]] = {}
+        group_columns, aggregates = self.group_columns, self.aggregates
+        rows = Concat().merge(streams)
+        try:
+            async for row in rows:
+                key = tuple(row[column] for column in group_columns)
+                group = groups.get(key)
+                if group is None:
+                    groups[key] = list(row)
+                else:
+                    for column, combine in aggregates:
+                        group[column] = combine(group[column], row[column])
+        finally:
+            await rows.aclose()
+        for group in groups.values():
+            yield group
@@ -0,0 +1,109 @@
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from ignite_client.codec import FIXED_CELLS, INT, read_object, skip_object
+
+# payload sizes of the fixed-width cells, skipped without a call per cell
+_FIXED_SIZES = {type_code: unpacker.size for type_code, unpacker in FIXED_CELLS.items()}
+_FIXED_SIZES.update({7: 2, 10: 16, 11: 8, 28: 8, 33: 12, 36: 8, 38: 8, 101: 0})
+
+
+# a page decoded by read_lazy_rows: the frame is kept as is, together with the offset of every cell, and a cell
+# is decoded each time it is read
+class LazyPage:
+    __slots__ = ('data', 'column_count', 'offsets', 'column_names', '_column_index')
+
+    def __init__(self, data: bytes, column_count: int, offsets: array):
+        self.data = data
+        self.column_count = column_count
+        self.offsets = offsets
+        self.column_names: Optional[List[str]] = None
+        self._column_index: Optional[Dict[str, int]] = None
+
+    def bind_column_names(self, column_names: List[str]):
+        if column_names:
+            self.column_names = column_names
+            self._column_index = {name: i for i, name in enumerate(column_names)}
+
+    def column_index(self, name: str) -> int:
+        if self._column_index is None:
+            raise KeyError(f"Column names are not known for this page: {name}")
+        return self._column_index[name]
+
+    def cell(self, row: int, column: int) -> Any:
+        return read_object(self.data, self.offsets[row * self.column_count + column])[0]
+
+    def __len__(self) -> int:
+        return len(self.offsets) // self.column_count if self.column_count else 0
+
+    def __getitem__(self, row: int) -> 'LazyRow':
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("row index out of range")
+        return LazyRow(self, row)
+
+    def __iter__(self) -> Iterator['LazyRow']:
+        for row in range(len(self)):
+            yield LazyRow(self, row)
+
+
+class LazyRow:
+    __slots__ = ('_page', '_row')
+
+    def __init__(self, page: LazyPage, row: int):
+        self._page = page
+        self._row = row
+
+    def __getitem__(self, key: Union[int, str]) -> Any:
+        page = self._page
+        if isinstance(key, str):
+            key = page.column_index(key)
+        elif key < 0:
+            key += page.column_count
+        if not 0 <= key < page.column_count:
+            raise IndexError("column index out of range")
+        return page.cell(self._row, key)
+
+    def __len__(self) -> int:
+        return self._page.column_count
+
+    def __iter__(self) -> Iterator[Any]:
+        page, row = self._page, self._row
+        for column in range(page.column_count):
+            yield page.cell(row, column)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (LazyRow, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"LazyRow({list(self)!r})"
+
+    def to_list(self) -> List[Any]:
+        return list(self)
+
+
+def read_lazy_rows(data: bytes, offset: int, row_count: int, column_count: int) -> (LazyPage, int):
+    # matrix decoder recording where each cell starts instead of decoding it
+    fixed_sizes = _FIXED_SIZES
+    unpack_int = INT.unpack_from
+    offsets = array('q')
+    append = offsets.append
+    for _ in range(row_count * column_count):
+        append(offset)
+        type_code = data[offset]
+        size = fixed_sizes.get(type_code)
+        if size is not None:
+            offset += 1 + size
+        elif type_code in (9, 12):
+            offset += 5 + unpack_int(data, offset + 1)[0]
+        else:
+            offset = skip_object(data, offset)
+    return LazyPage(data, column_count, offsets), offset
+
+
+def bind_column_names(rows: Any, column_names: List[str]):
+    if isinstance(rows, LazyPage):
+        rows.bind_column_names(column_names)
@@ -0,0 +1,169 @@
+import asyncio
+import csv
+import itertools
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from ignite_client.codec import BinaryObject
+from ignite_client.pool import IgniteConnectionPool
+from ignite_client.protocol import QuerySqlFieldsRequest, StatementType
+from ignite_client.utils import pending_tasks
+
+LOAD_BATCH_SIZE = 1000
+LOAD_MAX_IN_FLIGHT = 16
+LOAD_RETRIES = 3
+LOAD_RETRY_DELAY = 0.5
+# errors after which the same write may succeed on another attempt; anything else, such as a rejected row, fails
+# the load at once
+TRANSIENT_ERRORS = (OSError, asyncio.TimeoutError)
+# rows per INSERT statement; a batch is sent as consecutive statements of this size
+ROWS_PER_STATEMENT = 100
+
+
+def read_csv_rows(path: str, converters: Optional[Dict[str, Callable[[str], Any]]] = None) -> Iterator[Dict[str, Any]]:
+    # csv has no types, so values stay strings unless a converter is given; empty converted cells become None
+    converters = converters or {}
+    with open(path, newline='', encoding='utf-8') as source:
+        for row in csv.DictReader(source):
+            for name, converter in converters.items():
+                value = row.get(name)
+                row[name] = None if value is None or value == '' else converter(value)
+            yield row
+
+
+def read_jsonl_rows(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding='utf-8') as source:
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+class SqlInsertSink:
+    def __init__(self, table: str, columns: List[str], schema: str = 'PUBLIC',
+                 rows_per_statement: int = ROWS_PER_STATEMENT):
+        if rows_per_statement < 1:
+            raise ValueError("rows_per_statement must be positive")
+        self.table = table
+        self.columns = columns
+        self.schema = schema
+        self.rows_per_statement = rows_per_statement
+        self._statements: Dict[int, str] = {}
+
+    def statement(self, row_count: int) -> str:
+        sql = self._statements.get(row_count)
+        if sql is None:
+            placeholders = '(' + ', '.join('?' * len(self.columns)) + ')'
+            sql = f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES " + \
+                ', '.join([placeholders] * row_count)
+            self._statements[row_count] = sql
+        return sql
+
+    def new_request(self, rows: List[Dict[str, Any]]) -> QuerySqlFieldsRequest:
+        args = [row.get(column) for row in rows for column in self.columns]
+        return QuerySqlFieldsRequest(cache_id=0, schema=self.schema, cursor_page_size=1, max_rows=0,
+                                     sql=self.statement(len(rows)), query_arg_count=len(args), query_args=args,
+                                     statement_type=StatementType.UPDATE, distributed_join=False, local_query=False,
+                                     replicated_only=False, enforce_join_order=False, collocated=False, lazy=False,
+                                     timeout_milliseconds=0, include_field_names=False)
+
+    def split(self, rows: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        # each statement is written, and retried, on its own, so a retry never inserts the rows of an earlier one
+        return [rows[i:i + self.rows_per_statement] for i in range(0, len(rows), self.rows_per_statement)]
+
+    async def write(self, pool: IgniteConnectionPool, rows: List[Dict[str, Any]]):
+        async with pool.acquire() as client:
+            await client.query_sql_fields(self.new_request(rows))
+
+
+# each row becomes one cache entry: the key column is the key, and the value is either one column or the
+# remaining columns as a binary object of value_type
+class CachePutAllSink:
+    def __init__(self, cache_id: int, key_column: str, value_column: Optional[str] = None,
+                 value_type: Optional[str] = None):
+        if (value_column is None) == (value_type is None):
+            raise ValueError("Exactly one of value_column and value_type is required")
+        self.cache_id = cache_id
+        self.key_column = key_column
+        self.value_column = value_column
+        self.value_type = value_type
+
+    def entry(self, row: Dict[str, Any]) -> (Any, Any):
+        if self.value_column is not None:
+            return row[self.key_column], row.get(self.value_column)
+        fields = {name: value for name, value in row.items() if name != self.key_column}
+        return row[self.key_column], BinaryObject.of(self.value_type, fields)
+
+    @staticmethod
+    def split(rows: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        # putting the same entries again is harmless, so a whole batch is retried
+        return [rows]
+
+    async def write(self, pool: IgniteConnectionPool, rows: List[Dict[str, Any]]):
+        await pool.cache_put_all(self.cache_id, [self.entry(row) for row in rows])
+
+
+@dataclass
+class LoadResult:
+    rows: int = 0
+    batches: int = 0
+    retries: int = 0
+
+
+class BulkLoader:
+    def __init__(self, pool: IgniteConnectionPool, sink, *, batch_size: int = LOAD_BATCH_SIZE,
+                 max_in_flight: int = LOAD_MAX_IN_FLIGHT, retries: int = LOAD_RETRIES,
+                 retry_delay: float = LOAD_RETRY_DELAY):
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be positive")
+        self.pool = pool
+        self.sink = sink
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+    async def _write(self, batch: List[Dict[str, Any]], result: LoadResult):
+        # a batch is written as the parts the sink splits it into, and a failed part is retried from where it failed
+        for part in self.sink.split(batch):
+            for attempt in itertools.count():
+                try:
+                    await self.sink.write(self.pool, part)
+                    break
+                except TRANSIENT_ERRORS:
+                    if attempt >= self.retries:
+                        raise
+                    result.retries += 1
+                    await asyncio.sleep(self.retry_delay * 2 ** attempt)
+        result.rows += len(batch)
+        result.batches += 1
+
+    async def load(self, rows: Iterable[Dict[str, Any]]) -> LoadResult:
+        # the next batch is parsed on a worker thread while earlier ones are in flight; once max_in_flight batches
+        # are outstanding, reading waits for one of them to finish
+        loop = asyncio.get_running_loop()
+        result = LoadResult()
+        rows = iter(rows)
+        window = asyncio.Semaphore(self.max_in_flight)
+        failure: List[BaseException] = []
+
+        def done(task: asyncio.Task):
+            in_flight.discard(task)
+            window.release()
+            if not task.cancelled() and task.exception() is not None:
+                failure.append(task.exception())
+
+        async with pending_tasks() as in_flight:
+            while not failure:
+                batch = await loop.run_in_executor(None, lambda: list(itertools.islice(rows, self.batch_size)))
+                if not batch:
+                    break
+                await window.acquire()
+                task = loop.create_task(self._write(batch, result))
+                in_flight.add(task)
+                task.add_done_callback(done)
+        if failure:
+            raise failure[0]
+        return result
@@ -0,0 +1,60 @@
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from ignite_client.codec import FIXED_CELLS, FixedRowDecoder
+from ignite_client.protocol import QuerySqlFieldsRequest
+
+# statements after which the cached metadata may no longer describe the results
+_DDL = re.compile(r'^\s*(CREATE|ALTER|DROP)\b', re.IGNORECASE)
+
+
+@dataclass
+class ResultMetadata:
+    column_names: List[str]
+    column_types: Optional[List[int]]
+    # decodes pages of this result faster than read_matrix, when the column types allow it
+    matrix_decoder: Optional[Callable] = None
+
+
+# column names and first-row types per query text, learned from the first execution that asked for field names.
+# later executions leave the names out of the request and get them from here, and results of fixed-width columns
+# are decoded with a FixedRowDecoder prepared for their types
+class ResultMetadataCache:
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self._entries: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def key(request: QuerySqlFieldsRequest) -> tuple:
+        return request.sql, request.schema, request.cache_id
+
+    @staticmethod
+    def is_ddl(sql: str) -> bool:
+        return _DDL.match(sql) is not None
+
+    def get(self, key: tuple) -> Optional[ResultMetadata]:
+        metadata = self._entries.get(key)
+        if metadata is not None:
+            self._entries.move_to_end(key)
+        return metadata
+
+    def put(self, key: tuple, column_names: List[str], column_types: Optional[List[int]]) -> ResultMetadata:
+        matrix_decoder = None
+        if column_types and all(type_code in FIXED_CELLS for type_code in column_types):
+            matrix_decoder = FixedRowDecoder(column_types)
+        metadata = self._entries[key] = ResultMetadata(column_names, column_types, matrix_decoder)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+        return metadata
+
+    def invalidate(self, key: Optional[tuple] = None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,123 @@
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+from ignite_client.constants import OpConst
+
+PHASES = ('encode', 'wait', 'decode')
+
+# bucket upper bounds in seconds, from 10 microseconds to 10 seconds in 1-2-5 steps
+DEFAULT_LATENCY_BOUNDS = tuple(base * 10.0 ** exponent for exponent in range(-5, 1) for base in (1, 2, 5)) + (10.0,)
+# pages per cursor, in powers of two
+_PAGE_BOUNDS = tuple(float(1 << shift) for shift in range(20))
+
+_OP_NAMES = {value: name.lower() for name, value in vars(OpConst).items() if not name.startswith('_')}
+
+
+def op_name(op_code: int) -> str:
+    return _OP_NAMES.get(op_code, str(op_code))
+
+
+class Histogram:
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_LATENCY_BOUNDS):
+        self.bounds = bounds
+        # the last bucket counts everything above the largest bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction: float) -> float:
+        # upper bound of the bucket holding the given fraction of the samples
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {'count': self.count, 'mean': self.mean(), 'p50': self.percentile(0.5), 'p99': self.percentile(0.99),
+                'max': self.max}
+
+
+# receives every measurement as it is recorded, for export to an external metrics system
+class MetricsHook:
+    # one argument per measurement of the request
+    def on_request(self, op_code: int, encode: float, wait: float,  # pylint: disable=too-many-positional-arguments
+                   decode: float, bytes_out: int, bytes_in: int):
+        pass
+
+    def on_cursor(self, op_code: int, pages: int):
+        pass
+
+
+# enabled by passing an instance to IgniteClient; a client without one skips all of the timing
+class ClientMetrics:
+    def __init__(self, hooks: Optional[List[MetricsHook]] = None,
+                 bounds: Tuple[float, ...] = DEFAULT_LATENCY_BOUNDS):
+        self.hooks = list(hooks or [])
+        self.bounds = bounds
+        self.latencies: Dict[Tuple[int, str], Histogram] = {}
+        self.requests: Dict[int, int] = {}
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.cursor_pages: Dict[int, Histogram] = {}
+
+    def _histogram(self, histograms: dict, key, bounds: Tuple[float, ...]) -> Histogram:
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(bounds)
+        return histogram
+
+    def request_started(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def request_finished(self, op_code: int, encode: float,  # pylint: disable=too-many-positional-arguments
+                         wait: float, decode: float, bytes_out: int, bytes_in: int):
+        self.in_flight -= 1
+        self.requests[op_code] = self.requests.get(op_code, 0) + 1
+        for phase, value in zip(PHASES, (encode, wait, decode)):
+            self._histogram(self.latencies, (op_code, phase), self.bounds).record(value)
+        self.bytes_out += bytes_out
+        self.bytes_in += bytes_in
+        for hook in self.hooks:
+            hook.on_request(op_code, encode, wait, decode, bytes_out, bytes_in)
+
+    def request_failed(self):
+        self.in_flight -= 1
+
+    def cursor_finished(self, op_code: int, pages: int):
+        self._histogram(self.cursor_pages, op_code, _PAGE_BOUNDS).record(pages)
+        for hook in self.hooks:
+            hook.on_cursor(op_code, pages)
+
+    def latency(self, op_code: int, phase: str) -> Optional[Histogram]:
+        return self.latencies.get((op_code, phase))
+
+    def snapshot(self) -> dict:
+        return {
+            'requests': {op_name(op_code): count for op_code, count in self.requests.items()},
+            'latency': {f"{op_name(op_code)}.{phase}": histogram.snapshot()
+                        for (op_code, phase), histogram in self.latencies.items()},
+            'cursor_pages': {op_name(op_code): histogram.snapshot()
+                             for op_code, histogram in self.cursor_pages.items()},
+            'bytes_out': self.bytes_out,
+            'bytes_in': self.bytes_in,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+        }
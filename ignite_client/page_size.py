@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from ignite_client.protocol import QuerySqlFieldsRequest, QueryScanRequest
+
+TARGET_PAGE_BYTES = 1024 * 1024
+TARGET_PAGE_LATENCY = 0.05
+MIN_PAGE_SIZE = 64
+MAX_PAGE_SIZE = 64 * 1024
+# weight of the newest page in the running estimates
+SMOOTHING = 0.3
+
+
+@dataclass
+class PageEstimate:
+    bytes_per_row: Optional[float] = None
+    seconds_per_row: Optional[float] = None
+    page_size: Optional[int] = None
+
+
+# picks the page size per query text (or scanned cache) from the pages its earlier executions returned. the page
+# size of a cursor is fixed when the query is opened, so what is learned from one execution applies to the next
+# ones: rows are sized from every page, and fetch time is taken from cursor pages only, as the first page also
+# pays for running the query. page sizes are powers of two, which keeps the number of distinct templates small
+class AdaptivePageSize:
+    def __init__(self, target_bytes: int = TARGET_PAGE_BYTES, target_latency: float = TARGET_PAGE_LATENCY, *,
+                 min_page_size: int = MIN_PAGE_SIZE, max_page_size: int = MAX_PAGE_SIZE,
+                 smoothing: float = SMOOTHING, capacity: int = 1024):
+        if not 0 < min_page_size <= max_page_size:
+            raise ValueError("Page size bounds must satisfy 0 < min_page_size <= max_page_size")
+        if not 0 < smoothing <= 1:
+            raise ValueError("smoothing must be in (0, 1]")
+        self.target_bytes = target_bytes
+        self.target_latency = target_latency
+        self.min_page_size = min_page_size
+        self.max_page_size = max_page_size
+        self.smoothing = smoothing
+        self.capacity = capacity
+        self._estimates: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def key(request: Union[QuerySqlFieldsRequest, QueryScanRequest]) -> tuple:
+        if isinstance(request, QueryScanRequest):
+            return 'scan', request.cache_id
+        return request.sql, request.schema, request.cache_id
+
+    def estimate(self, key: tuple) -> Optional[PageEstimate]:
+        return self._estimates.get(key)
+
+    def page_size(self, key: tuple, default: int) -> int:
+        # the caller's page size until the query has been seen
+        estimate = self._estimates.get(key)
+        if estimate is None:
+            return default
+        self._estimates.move_to_end(key)
+        return estimate.page_size
+
+    def record(self, key: tuple, rows: int, size: int, elapsed: Optional[float] = None):
+        if rows <= 0:
+            return
+        estimate = self._estimates.get(key)
+        if estimate is None:
+            estimate = self._estimates[key] = PageEstimate()
+            if len(self._estimates) > self.capacity:
+                self._estimates.popitem(last=False)
+        estimate.bytes_per_row = self._smooth(estimate.bytes_per_row, size / rows)
+        if elapsed is not None:
+            estimate.seconds_per_row = self._smooth(estimate.seconds_per_row, elapsed / rows)
+        estimate.page_size = self._page_size(estimate)
+
+    def _smooth(self, current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        return current + self.smoothing * (sample - current)
+
+    def _page_size(self, estimate: PageEstimate) -> int:
+        rows = self.target_bytes / max(estimate.bytes_per_row, 1.0)
+        if estimate.seconds_per_row:
+            rows = min(rows, self.target_latency / estimate.seconds_per_row)
+        # round down to a power of two
+        page_size = 1 << max(int(rows), 1).bit_length() - 1
+        return max(self.min_page_size, min(self.max_page_size, page_size))
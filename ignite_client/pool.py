@@ -0,0 +1,300 @@
+import asyncio
+import contextlib
+import dataclasses
+import itertools
+import uuid
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+
+from ignite_client.affinity import CacheAffinity, PartitionMap
+from ignite_client.client import IgniteClient
+from ignite_client.fanout import Concat, PageStream
+from ignite_client.metadata import ResultMetadataCache
+from ignite_client.page_size import AdaptivePageSize
+from ignite_client.protocol import HandshakeRequest, HandshakeSuccess, QueryScanRequest, QuerySqlFieldsRequest
+from ignite_client.utils import check_pool_size
+
+SCAN_PAGE_SIZE = 1024
+SCAN_PARALLELISM = 8
+
+_PARTITION_DONE = object()
+
+
+class _PooledConnection:
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.client: Optional[IgniteClient] = None
+
+
+class IgniteConnectionPool:
+    def __init__(self, nodes: List[Tuple[str, int]], handshake_request: HandshakeRequest, size_per_node: int = 4,
+                 *, reconnect_interval: float = 1.0, page_sizer: Optional[AdaptivePageSize] = None,
+                 result_metadata: Optional[ResultMetadataCache] = None):
+        check_pool_size(nodes, size_per_node)
+        self.nodes = nodes
+        self.handshake_request = handshake_request
+        self.size_per_node = size_per_node
+        self.reconnect_interval = reconnect_interval
+        # shared by all connections, so every one of them learns from the results of the others
+        self.page_sizer = page_sizer
+        self.result_metadata = result_metadata
+        self._slots: List[_PooledConnection] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._reconnect_tasks = set()
+        self._closed = False
+        # key operations go straight to the primary node of the key's partition when the protocol allows it
+        self.partition_aware = handshake_request.supports_partition_awareness()
+        self._affinity: Dict[int, CacheAffinity] = {}
+        self._affinity_lock = asyncio.Lock()
+        self._topology_version: Optional[Tuple[int, int]] = None
+        self._round_robin = itertools.count()
+
+    async def start(self):
+        self._idle = asyncio.Queue()
+        # interleave the nodes so that consecutive leases land on different servers
+        for _ in range(self.size_per_node):
+            for host, port in self.nodes:
+                self._slots.append(_PooledConnection(host, port))
+        results = await asyncio.gather(*[self._open(slot) for slot in self._slots], return_exceptions=True)
+        if all(isinstance(result, BaseException) for result in results):
+            await self.close()
+            raise ConnectionError(f"Unable to connect to any node: {results[0]!r}")
+        for slot, result in zip(self._slots, results):
+            if isinstance(result, BaseException):
+                self._schedule_reconnect(slot)
+            else:
+                self._idle.put_nowait(slot)
+
+    async def _open(self, slot: _PooledConnection):
+        client = IgniteClient(slot.host, slot.port, page_sizer=self.page_sizer, result_metadata=self.result_metadata)
+        await client.connect()
+        try:
+            response = await client.handshake(self.handshake_request)
+        except BaseException:
+            await client.close()
+            raise
+        if not isinstance(response, HandshakeSuccess):
+            await client.close()
+            raise ConnectionError(f"Handshake with {slot.host}:{slot.port} failed: {response.error_message}")
+        client.topology_listener = self._on_topology_change
+        slot.client = client
+
+    async def _discard(self, slot: _PooledConnection):
+        client, slot.client = slot.client, None
+        if client is not None:
+            await client.close()
+
+    def _schedule_reconnect(self, slot: _PooledConnection):
+        task = asyncio.get_running_loop().create_task(self._reconnect(slot))
+        self._reconnect_tasks.add(task)
+        task.add_done_callback(self._reconnect_tasks.discard)
+
+    async def _reconnect(self, slot: _PooledConnection):
+        await self._discard(slot)
+        while not self._closed:
+            try:
+                await self._open(slot)
+            except (OSError, asyncio.IncompleteReadError):
+                await asyncio.sleep(self.reconnect_interval)
+                continue
+            self._idle.put_nowait(slot)
+            return
+
+    async def _lease(self) -> _PooledConnection:
+        if self._idle is None or self._closed:
+            raise ConnectionError("Connection pool is not started")
+        while True:
+            if self._idle.empty() and len(self._reconnect_tasks) == len(self._slots):
+                raise ConnectionError("No healthy connection available")
+            slot = await self._idle.get()
+            if slot.client is not None and slot.client.is_connected():
+                return slot
+            self._schedule_reconnect(slot)
+
+    def _release(self, slot: _PooledConnection):
+        if self._closed:
+            return
+        if slot.client is not None and slot.client.is_connected():
+            self._idle.put_nowait(slot)
+        else:
+            self._schedule_reconnect(slot)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        slot = await self._lease()
+        try:
+            yield slot.client
+        finally:
+            self._release(slot)
+
+    def _on_topology_change(self, topology_version: Tuple[int, int]):
+        if self._topology_version is None or topology_version > self._topology_version:
+            self._topology_version = topology_version
+            self._affinity.clear()
+
+    def _node_client(self, node_id: Optional[uuid.UUID] = None) -> IgniteClient:
+        # connections are multiplexed, so routed requests share them with leased ones instead of taking a lease
+        connected = [slot.client for slot in self._slots if slot.client is not None and slot.client.is_connected()]
+        on_node = [client for client in connected if client.node_id == node_id] if node_id is not None else []
+        candidates = on_node or connected
+        if not candidates:
+            raise ConnectionError("No healthy connection available")
+        return candidates[next(self._round_robin) % len(candidates)]
+
+    async def _cache_affinity(self, cache_id: int) -> Optional[CacheAffinity]:
+        if not self.partition_aware:
+            return None
+        affinity = self._affinity.get(cache_id)
+        if affinity is not None:
+            return affinity
+        async with self._affinity_lock:
+            if cache_id not in self._affinity:
+                response = await self._node_client().cache_partitions([cache_id])
+                partition_map = PartitionMap.from_response(response)
+                self._on_topology_change(partition_map.topology_version)
+                if partition_map.topology_version >= self._topology_version:
+                    self._affinity.update(partition_map.caches)
+                    self._affinity.setdefault(cache_id, CacheAffinity(cache_id, {}, []))
+            return self._affinity.get(cache_id)
+
+    async def _route(self, cache_id: int, key: Any) -> IgniteClient:
+        affinity = await self._cache_affinity(cache_id)
+        return self._node_client(affinity.node(key) if affinity is not None else None)
+
+    async def _route_all(self, cache_id: int, items: Iterable[Any], key=lambda item: item) \
+            -> List[Tuple[IgniteClient, List[Any]]]:
+        affinity = await self._cache_affinity(cache_id)
+        groups: Dict[Optional[uuid.UUID], List[Any]] = {}
+        for item in items:
+            node_id = affinity.node(key(item)) if affinity is not None else None
+            groups.setdefault(node_id, []).append(item)
+        return [(self._node_client(node_id), group) for node_id, group in groups.items()]
+
+    async def cache_get(self, cache_id: int, key: Any) -> Any:
+        client = await self._route(cache_id, key)
+        return await client.cache_get(cache_id, key)
+
+    async def cache_put(self, cache_id: int, key: Any, value: Any):
+        client = await self._route(cache_id, key)
+        await client.cache_put(cache_id, key, value)
+
+    async def cache_get_all(self, cache_id: int, keys: Iterable[Any]) -> Dict[Any, Any]:
+        routes = await self._route_all(cache_id, keys)
+        entries = {}
+        for node_entries in await asyncio.gather(*[client.cache_get_all(cache_id, group) for client, group in routes]):
+            entries.update(node_entries)
+        return entries
+
+    async def cache_put_all(self, cache_id: int, entries: Union[Dict[Any, Any], Iterable[Tuple[Any, Any]]]):
+        entries = entries.items() if isinstance(entries, dict) else entries
+        routes = await self._route_all(cache_id, entries, key=lambda entry: entry[0])
+        await asyncio.gather(*[client.cache_put_all(cache_id, group) for client, group in routes])
+
+    async def cache_contains_keys(self, cache_id: int, keys: Iterable[Any]) -> bool:
+        routes = await self._route_all(cache_id, keys)
+        return all(await asyncio.gather(*[client.cache_contains_keys(cache_id, group) for client, group in routes]))
+
+    async def _partition_client(self, cache_id: int, partition: int) -> IgniteClient:
+        affinity = await self._cache_affinity(cache_id)
+        return self._node_client(affinity.partition_node(partition) if affinity is not None else None)
+
+    async def scan_partition_ids(self, cache_id: int) -> List[int]:
+        # without a partition map the cache can only be scanned as a whole
+        affinity = await self._cache_affinity(cache_id)
+        if affinity is None or not affinity.partition_nodes:
+            return [-1]
+        return list(range(len(affinity.partition_nodes)))
+
+    async def scan_partition(self, cache_id: int, partition: int,
+                             page_size: int = SCAN_PAGE_SIZE) -> AsyncIterator[Tuple[Any, Any]]:
+        client = await self._partition_client(cache_id, partition)
+        entries = client.scan(QueryScanRequest(cache_id, page_size, partition))
+        try:
+            async for entry in entries:
+                yield entry
+        finally:
+            await entries.aclose()
+
+    async def scan(self, cache_id: int, partitions: Optional[Iterable[int]] = None, page_size: int = SCAN_PAGE_SIZE,
+                   parallelism: int = SCAN_PARALLELISM) -> AsyncIterator[Tuple[Any, Any]]:
+        if parallelism < 1:
+            raise ValueError("parallelism must be positive")
+        if partitions is None:
+            partitions = await self.scan_partition_ids(cache_id)
+        # at most parallelism partition cursors are open at once; the queue bound keeps them from running
+        # further ahead of the consumer than one page each
+        pages = asyncio.Queue(parallelism)
+        semaphore = asyncio.Semaphore(parallelism)
+
+        async def scan_one(partition: int):
+            try:
+                async with semaphore:
+                    client = await self._partition_client(cache_id, partition)
+                    partition_pages = client.scan_pages(QueryScanRequest(cache_id, page_size, partition))
+                    try:
+                        async for entries in partition_pages:
+                            await pages.put(entries)
+                    finally:
+                        await partition_pages.aclose()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # whatever failed the partition is raised again to the consumer
+                await pages.put(e)
+                return
+            await pages.put(_PARTITION_DONE)
+
+        workers = [asyncio.ensure_future(scan_one(partition)) for partition in partitions]
+        try:
+            remaining = len(workers)
+            while remaining:
+                entries = await pages.get()
+                if entries is _PARTITION_DONE:
+                    remaining -= 1
+                elif isinstance(entries, Exception):
+                    raise entries
+                else:
+                    for entry in entries:
+                        yield entry
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def _node_clients(self) -> List[IgniteClient]:
+        # one connected client per node; nodes are told apart by node id where the handshake reports one
+        clients = {}
+        for slot in self._slots:
+            client = slot.client
+            if client is not None and client.is_connected():
+                clients.setdefault(client.node_id or (client.host, client.port), client)
+        if not clients:
+            raise ConnectionError("No healthy connection available")
+        return list(clients.values())
+
+    @staticmethod
+    async def _local_pages(client: IgniteClient, request: QuerySqlFieldsRequest) -> PageStream:
+        pages = client.sql_pages(await client.query_sql_fields(request))
+        try:
+            async for page in pages:
+                yield page
+        finally:
+            await pages.aclose()
+
+    async def fan_out(self, request: QuerySqlFieldsRequest, merge=None) -> AsyncIterator[List[Any]]:
+        # runs request as a local query on every node at once and merges the results here, with Concat (the
+        # default), MergeSorted or Reaggregate from ignite_client.fanout
+        merge = merge or Concat()
+        request = dataclasses.replace(request, local_query=True)
+        rows = merge.merge([self._local_pages(client, request) for client in self._node_clients()])
+        try:
+            async for row in rows:
+                yield row
+        finally:
+            await rows.aclose()
+
+    async def close(self):
+        self._closed = True
+        for task in list(self._reconnect_tasks):
+            task.cancel()
+        for slot in self._slots:
+            await self._discard(slot)
+        self._slots.clear()
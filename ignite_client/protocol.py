@@ -1,9 +1,25 @@
+import dataclasses
 import struct
+import uuid
+from collections import OrderedDict
 from dataclasses import dataclass
 from enum import Enum
-from typing import Union, List, Any, Optional
+from typing import Union, List, Any, Optional, Callable, Dict, Tuple
 
-from ignite_client.constants import LenConst, OpConst
+from ignite_client.codec import read_matrix, read_struct, put_string, read_string, string_length, put_bytes, \
+    put_short, put_int, read_int, put_long, put_bool, read_bool, put_byte, object_length, put_object, objects_length, \
+    put_objects, read_object, read_short, read_long, read_row_type_codes
+from ignite_client.constants import LenConst, OpConst, ResponseFlagConst
+
+_VERSION = struct.Struct('<hhh')
+_RESPONSE_HEADER = struct.Struct('<qi')
+_CURSOR_HEADER = struct.Struct('<qi')
+_FRAME_HEADER = struct.Struct('<ihq')
+_FLAGS_RESPONSE_HEADER = struct.Struct('<qh')
+_TOPOLOGY_VERSION = struct.Struct('<qi')
+
+# responses carry a flags header and the affinity topology version from this protocol version on
+PARTITION_AWARENESS_VERSION = (1, 4, 0)
 
 
 @dataclass
@@ -21,15 +37,16 @@ class HandshakeRequest:
         total_length += LenConst.MINOR_VERSION
         total_length += LenConst.PATCH_VERSION
         total_length += 1
-        total_length += 1 + 4 + len(self.username)
-        total_length += 1 + 4 + len(self.password)
+        total_length += string_length(self.username)
+        total_length += string_length(self.password)
         return total_length
 
     def encode(self) -> bytes:
-        encoded = bytearray(self.length() + 4)
+        length = self.length()
+        encoded = bytearray(length + 4)
         offset = 0
 
-        offset = put_int(encoded, offset, self.length())
+        offset = put_int(encoded, offset, length)
         offset = put_byte(encoded, offset, 1)
         offset = put_short(encoded, offset, self.major_version)
         offset = put_short(encoded, offset, self.minor_version)
@@ -40,12 +57,20 @@ class HandshakeRequest:
 
         return bytes(encoded)
 
+    def supports_partition_awareness(self) -> bool:
+        return (self.major_version, self.minor_version, self.patch_version) >= PARTITION_AWARENESS_VERSION
+
 
 @dataclass
 class HandshakeSuccess:
+    node_id: Optional[uuid.UUID] = None
+
     @staticmethod
-    def decode() -> 'HandshakeSuccess':
-        return HandshakeSuccess()
+    def decode(data: bytes = b'', offset: int = 0, has_node_id: bool = False) -> 'HandshakeSuccess':
+        if not has_node_id:
+            return HandshakeSuccess()
+        node_id, _ = read_object(data, offset)
+        return HandshakeSuccess(node_id)
 
 
 @dataclass
@@ -56,11 +81,8 @@ class HandshakeFailed:
     error_message: str
 
     @staticmethod
-    def decode(data: bytes) -> 'HandshakeFailed':
-        offset = 0
-        major_version, offset = read_short(data, offset)
-        minor_version, offset = read_short(data, offset)
-        patch_version, offset = read_short(data, offset)
+    def decode(data: bytes, offset: int = 0) -> 'HandshakeFailed':
+        (major_version, minor_version, patch_version), offset = read_struct(_VERSION, data, offset)
         error_message, offset = read_string(data, offset)
         return HandshakeFailed(major_version, minor_version, patch_version, error_message)
 
@@ -68,10 +90,10 @@ class HandshakeFailed:
 HandshakeResponse = Union[HandshakeSuccess, HandshakeFailed]
 
 
-def decode_handshake_response(data: bytes) -> HandshakeResponse:
+def decode_handshake_response(data: bytes, has_node_id: bool = False) -> HandshakeResponse:
     if data[0] == 1:
-        return HandshakeSuccess.decode()
-    return HandshakeFailed.decode(data[1:])
+        return HandshakeSuccess.decode(data, 1, has_node_id)
+    return HandshakeFailed.decode(data, 1)
 
 
 class StatementType(Enum):
@@ -88,9 +110,12 @@ class ResourceCloseRequest:
     def length() -> int:
         return LenConst.RESOURCE_ID
 
+    def encode_into(self, buffer: bytearray, offset: int) -> int:
+        return put_long(buffer, offset, self.resource_id)
+
     def encode(self) -> bytes:
         encoded = bytearray(self.length())
-        put_long(encoded, 0, self.resource_id)
+        self.encode_into(encoded, 0)
         return bytes(encoded)
 
 
@@ -117,11 +142,12 @@ class QuerySqlFieldsRequest:
         total_length = 0
         total_length += LenConst.CACHE_ID
         total_length += 1
-        total_length += 1 + 4 + len(self.schema)
+        total_length += string_length(self.schema)
         total_length += LenConst.CURSOR_PAGE_SIZE
         total_length += LenConst.MAX_ROWS
-        total_length += 1 + 4 + len(self.sql)
+        total_length += string_length(self.sql)
         total_length += LenConst.QUERY_ARG_COUNT
+        total_length += objects_length(self.query_args)
         total_length += LenConst.STATEMENT_TYPE
         total_length += LenConst.DISTRIBUTED_JOIN
         total_length += LenConst.LOCAL_QUERY
@@ -133,44 +159,123 @@ class QuerySqlFieldsRequest:
         total_length += LenConst.INCLUDE_FIELD_NAMES
         return total_length
 
+    def check_query_args(self):
+        if self.query_arg_count != len(self.query_args):
+            raise ValueError(f"query_arg_count is {self.query_arg_count} but {len(self.query_args)} args were given")
+
+    def encode_into(self, buffer: bytearray, offset: int) -> int:
+        self.check_query_args()
+        offset = put_int(buffer, offset, self.cache_id)
+        offset = put_byte(buffer, offset, 0)
+        offset = put_string(buffer, offset, self.schema)
+        offset = put_int(buffer, offset, self.cursor_page_size)
+        offset = put_int(buffer, offset, self.max_rows)
+        offset = put_string(buffer, offset, self.sql)
+        offset = put_int(buffer, offset, self.query_arg_count)
+        offset = put_objects(buffer, offset, self.query_args)
+        offset = put_statement_type(buffer, offset, self.statement_type)
+        offset = put_bool(buffer, offset, self.distributed_join)
+        offset = put_bool(buffer, offset, self.local_query)
+        offset = put_bool(buffer, offset, self.replicated_only)
+        offset = put_bool(buffer, offset, self.enforce_join_order)
+        offset = put_bool(buffer, offset, self.collocated)
+        offset = put_bool(buffer, offset, self.lazy)
+        offset = put_long(buffer, offset, self.timeout_milliseconds)
+        return put_bool(buffer, offset, self.include_field_names)
+
     def encode(self) -> bytes:
         encoded = bytearray(self.length())
-        offset = 0
+        self.encode_into(encoded, 0)
+        return bytes(encoded)
+
+
+class QuerySqlFieldsTemplate:
+    SUFFIX_LENGTH = LenConst.STATEMENT_TYPE + LenConst.DISTRIBUTED_JOIN + LenConst.LOCAL_QUERY + \
+        LenConst.REPLICATED_ONLY + LenConst.ENFORCE_JOIN_ORDER + LenConst.COLLOCATED + LenConst.LAZY + \
+        LenConst.TIMEOUT + LenConst.INCLUDE_FIELD_NAMES
+
+    def __init__(self, request: QuerySqlFieldsRequest):
+        # the body is fixed for a statement except for the arguments between the sql text and the flags
+        body = dataclasses.replace(request, query_arg_count=0, query_args=[]).encode()
+        self.prefix = body[:-(self.SUFFIX_LENGTH + LenConst.QUERY_ARG_COUNT)]
+        self.suffix = body[-self.SUFFIX_LENGTH:]
 
-        offset = put_int(encoded, offset, self.cache_id)
-        offset = put_byte(encoded, offset, 0)
-        offset = put_string(encoded, offset, self.schema)
-        offset = put_int(encoded, offset, self.cursor_page_size)
-        offset = put_int(encoded, offset, self.max_rows)
-        offset = put_string(encoded, offset, self.sql)
-        offset = put_int(encoded, offset, self.query_arg_count)
-        # TODO: Encode query arguments
-        offset = put_statement_type(encoded, offset, self.statement_type)
-        offset = put_bool(encoded, offset, self.distributed_join)
-        offset = put_bool(encoded, offset, self.local_query)
-        offset = put_bool(encoded, offset, self.replicated_only)
-        offset = put_bool(encoded, offset, self.enforce_join_order)
-        offset = put_bool(encoded, offset, self.collocated)
-        offset = put_bool(encoded, offset, self.lazy)
-        offset = put_long(encoded, offset, self.timeout_milliseconds)
-        put_bool(encoded, offset, self.include_field_names)
+    def bind(self, request_id: int, request: QuerySqlFieldsRequest) -> 'QuerySqlFieldsFrame':
+        request.check_query_args()
+        return QuerySqlFieldsFrame(self, request_id, request.query_args)
+
+
+@dataclass
+class QuerySqlFieldsFrame:
+    template: QuerySqlFieldsTemplate
+    request_id: int
+    query_args: List[Any]
+
+    op_code = OpConst.QUERY_SQL_FIELDS
+
+    def frame_length(self) -> int:
+        return 4 + 10 + len(self.template.prefix) + LenConst.QUERY_ARG_COUNT + objects_length(self.query_args) + \
+            len(self.template.suffix)
+
+    def encode_into(self, buffer: bytearray, offset: int) -> int:
+        start = offset
+        offset = put_bytes(buffer, offset + 14, self.template.prefix)
+        offset = put_int(buffer, offset, len(self.query_args))
+        offset = put_objects(buffer, offset, self.query_args)
+        offset = put_bytes(buffer, offset, self.template.suffix)
+        _FRAME_HEADER.pack_into(buffer, start, offset - start - 4, OpConst.QUERY_SQL_FIELDS, self.request_id)
+        return offset
+
+    def encode(self) -> bytes:
+        encoded = bytearray(self.frame_length())
+        self.encode_into(encoded, 0)
         return bytes(encoded)
 
 
+class QuerySqlFieldsTemplateCache:
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self._templates: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def key(request: QuerySqlFieldsRequest) -> tuple:
+        return (request.sql, request.schema, request.cache_id, request.cursor_page_size, request.max_rows,
+                request.statement_type, request.distributed_join, request.local_query, request.replicated_only,
+                request.enforce_join_order, request.collocated, request.lazy, request.timeout_milliseconds,
+                request.include_field_names)
+
+    def get(self, request: QuerySqlFieldsRequest) -> QuerySqlFieldsTemplate:
+        key = self.key(request)
+        template = self._templates.get(key)
+        if template is None:
+            template = QuerySqlFieldsTemplate(request)
+            self._templates[key] = template
+            if len(self._templates) > self.capacity:
+                self._templates.popitem(last=False)
+        else:
+            self._templates.move_to_end(key)
+        return template
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+
 @dataclass
 class QuerySqlFieldsResponse:
     cursor_id: int
     column_count: int
     column_names: List[str]
     first_page_row_count: int
-    data: List[List[Any]]
+    data: List[Any]
     has_more: bool
+    # type codes of the first row, read along with the field names
+    column_types: Optional[List[int]] = None
 
     @staticmethod
-    def decode(data: bytes, has_field_names: bool) -> 'QuerySqlFieldsResponse':
-        offset = 0
-        cursor_id, offset = read_long(data, offset)
-        column_count, offset = read_int(data, offset)
+    def decode(data: bytes, has_field_names: bool, matrix_decoder: Callable = None,
+               offset: int = 0) -> 'QuerySqlFieldsResponse':
+        matrix_decoder = matrix_decoder or read_matrix
+        (cursor_id, column_count), offset = read_struct(_CURSOR_HEADER, data, offset)
 
         column_names = []
         if has_field_names:
@@ -179,7 +284,10 @@ class QuerySqlFieldsResponse:
                 column_names.append(column_name)
 
         first_page_row_count, offset = read_int(data, offset)
-        matrix, offset = read_matrix(data, offset, first_page_row_count, column_count)
+        column_types = None
+        if has_field_names and first_page_row_count:
+            column_types = read_row_type_codes(data, offset, column_count)
+        matrix, offset = matrix_decoder(data, offset, first_page_row_count, column_count)
         has_more, offset = read_bool(data, offset)
 
         return QuerySqlFieldsResponse(
@@ -188,7 +296,8 @@ class QuerySqlFieldsResponse:
             column_names=column_names,
             first_page_row_count=first_page_row_count,
             data=matrix,
-            has_more=has_more
+            has_more=has_more,
+            column_types=column_types
         )
 
 
@@ -200,32 +309,233 @@ class QuerySqlFieldsCursorGetPageRequest:
     def length() -> int:
         return LenConst.CURSOR_ID
 
+    def encode_into(self, buffer: bytearray, offset: int) -> int:
+        return put_long(buffer, offset, self.cursor_id)
+
     def encode(self) -> bytes:
         encoded = bytearray(self.length())
-        put_long(encoded, 0, self.cursor_id)
+        self.encode_into(encoded, 0)
         return bytes(encoded)
 
 
 @dataclass
 class QuerySqlFieldsCursorGetPageResponse:
     row_count: int
-    data: List[List[Any]]
+    data: List[Any]
     has_more: bool
 
     @staticmethod
-    def decode(data: bytes, column_count: int) -> 'QuerySqlFieldsCursorGetPageResponse':
-        offset = 0
+    def decode(data: bytes, column_count: int, matrix_decoder: Callable = None,
+               offset: int = 0) -> 'QuerySqlFieldsCursorGetPageResponse':
+        matrix_decoder = matrix_decoder or read_matrix
         row_count, offset = read_int(data, offset)
-        matrix, offset = read_matrix(data, offset, row_count, column_count)
+        matrix, offset = matrix_decoder(data, offset, row_count, column_count)
         has_more, offset = read_bool(data, offset)
         return QuerySqlFieldsCursorGetPageResponse(row_count, matrix, has_more)
 
 
+@dataclass
+class CacheRequest:
+    cache_id: int
+
+    @staticmethod
+    def length() -> int:
+        return LenConst.CACHE_ID + LenConst.FLAGS
+
+    def encode_into(self, buffer: bytearray, offset: int) -> int:
+        offset = put_int(buffer, offset, self.cache_id)
+        return put_byte(buffer, offset, 0)
+
+
+@dataclass
+class CacheKeyRequest:
+    cache_id: int
+    key: Any
+
+    def length(self) -> int:
+        return LenConst.CACHE_ID + LenConst.FLAGS + object_length(self.key)
+
+    def encode_into(self, buffer: bytearray, offset: int) -> int:
+        offset = put_int(buffer, offset, self.cache_id)
+        offset = put_byte(buffer, offset, 0)
+        return put_object(buffer, offset, self.key)
+
+
+@dataclass
+class CachePutRequest:
+    cache_id: int
+    key: Any
+    value: Any
+
+    def length(self) -> int:
+        return LenConst.CACHE_ID + LenConst.FLAGS + object_length(self.key) + object_length(self.value)
+
+    def encode_into(self, buffer: bytearray, offset: int) -> int:
+        offset = put_int(buffer, offset, self.cache_id)
+        offset = put_byte(buffer, offset, 0)
+        offset = put_object(buffer, offset, self.key)
+        return put_object(buffer, offset, self.value)
+
+
+@dataclass
+class CacheKeysRequest:
+    cache_id: int
+    keys: List[Any]
+
+    def length(self) -> int:
+        return LenConst.CACHE_ID + LenConst.FLAGS + LenConst.ENTRY_COUNT + objects_length(self.keys)
+
+    def encode_into(self, buffer: bytearray, offset: int) -> int:
+        offset = put_int(buffer, offset, self.cache_id)
+        offset = put_byte(buffer, offset, 0)
+        offset = put_int(buffer, offset, len(self.keys))
+        return put_objects(buffer, offset, self.keys)
+
+
+@dataclass
+class CachePutAllRequest:
+    cache_id: int
+    entries: List[Tuple[Any, Any]]
+
+    def length(self) -> int:
+        total_length = LenConst.CACHE_ID + LenConst.FLAGS + LenConst.ENTRY_COUNT
+        for key, value in self.entries:
+            total_length += object_length(key) + object_length(value)
+        return total_length
+
+    def encode_into(self, buffer: bytearray, offset: int) -> int:
+        offset = put_int(buffer, offset, self.cache_id)
+        offset = put_byte(buffer, offset, 0)
+        offset = put_int(buffer, offset, len(self.entries))
+        for key, value in self.entries:
+            offset = put_object(buffer, offset, key)
+            offset = put_object(buffer, offset, value)
+        return offset
+
+
+@dataclass
+class CachePartitionsRequest:
+    cache_ids: List[int]
+
+    def length(self) -> int:
+        return LenConst.CACHE_COUNT + LenConst.CACHE_ID * len(self.cache_ids)
+
+    def encode_into(self, buffer: bytearray, offset: int) -> int:
+        offset = put_int(buffer, offset, len(self.cache_ids))
+        for cache_id in self.cache_ids:
+            offset = put_int(buffer, offset, cache_id)
+        return offset
+
+
+# caches sharing an affinity function and node set; key_configs maps a key type id to its affinity key field id
+@dataclass
+class PartitionAwarenessGroup:
+    applicable: bool
+    key_configs: Dict[int, Dict[int, int]]
+    partitions: Dict[uuid.UUID, List[int]]
+
+    @staticmethod
+    def decode(data: bytes, offset: int) -> ('PartitionAwarenessGroup', int):
+        applicable, offset = read_bool(data, offset)
+        cache_count, offset = read_int(data, offset)
+        key_configs = {}
+        for _ in range(cache_count):
+            cache_id, offset = read_int(data, offset)
+            key_configs[cache_id] = {}
+            if applicable:
+                key_config_count, offset = read_int(data, offset)
+                for _ in range(key_config_count):
+                    key_type_id, offset = read_int(data, offset)
+                    key_configs[cache_id][key_type_id], offset = read_int(data, offset)
+
+        partitions = {}
+        if applicable:
+            node_count, offset = read_int(data, offset)
+            for _ in range(node_count):
+                node_id, offset = read_object(data, offset)
+                partition_count, offset = read_int(data, offset)
+                partitions[node_id] = list(struct.unpack_from(f'<{partition_count}i', data, offset))
+                offset += LenConst.PARTITION * partition_count
+        return PartitionAwarenessGroup(applicable, key_configs, partitions), offset
+
+
+@dataclass
+class CachePartitionsResponse:
+    topology_version: Tuple[int, int]
+    groups: List[PartitionAwarenessGroup]
+
+    @staticmethod
+    def decode(data: bytes, offset: int) -> 'CachePartitionsResponse':
+        topology_version, offset = read_struct(_TOPOLOGY_VERSION, data, offset)
+        group_count, offset = read_int(data, offset)
+        groups = []
+        for _ in range(group_count):
+            group, offset = PartitionAwarenessGroup.decode(data, offset)
+            groups.append(group)
+        return CachePartitionsResponse(topology_version, groups)
+
+
+# partition -1 scans every partition of the cache
+@dataclass
+class QueryScanRequest:
+    cache_id: int
+    page_size: int
+    partition: int = -1
+    local: bool = False
+
+    def length(self) -> int:
+        return LenConst.CACHE_ID + LenConst.FLAGS + LenConst.FILTER + LenConst.CURSOR_PAGE_SIZE + \
+            LenConst.PARTITION + LenConst.LOCAL_QUERY
+
+    def encode_into(self, buffer: bytearray, offset: int) -> int:
+        offset = put_int(buffer, offset, self.cache_id)
+        offset = put_byte(buffer, offset, 0)
+        # no remote filter
+        offset = put_byte(buffer, offset, 101)
+        offset = put_int(buffer, offset, self.page_size)
+        offset = put_int(buffer, offset, self.partition)
+        return put_bool(buffer, offset, self.local)
+
+
+@dataclass
+class QueryScanCursorGetPageResponse:
+    row_count: int
+    data: List[Tuple[Any, Any]]
+    has_more: bool
+
+    @staticmethod
+    def decode(data: bytes, offset: int = 0) -> 'QueryScanCursorGetPageResponse':
+        row_count, offset = read_int(data, offset)
+        entries = []
+        for _ in range(row_count):
+            key, offset = read_object(data, offset)
+            value, offset = read_object(data, offset)
+            entries.append((key, value))
+        has_more, offset = read_bool(data, offset)
+        return QueryScanCursorGetPageResponse(row_count, entries, has_more)
+
+
+@dataclass
+class QueryScanResponse:
+    cursor_id: int
+    row_count: int
+    data: List[Tuple[Any, Any]]
+    has_more: bool
+
+    @staticmethod
+    def decode(data: bytes, offset: int = 0) -> 'QueryScanResponse':
+        cursor_id, offset = read_long(data, offset)
+        page = QueryScanCursorGetPageResponse.decode(data, offset)
+        return QueryScanResponse(cursor_id, page.row_count, page.data, page.has_more)
+
+
 @dataclass
 class Request:
     op_code: int
     request_id: int
-    body: Union[ResourceCloseRequest, QuerySqlFieldsRequest, QuerySqlFieldsCursorGetPageRequest]
+    body: Union[ResourceCloseRequest, QuerySqlFieldsRequest, QuerySqlFieldsCursorGetPageRequest, CacheRequest,
+                CacheKeyRequest, CachePutRequest, CacheKeysRequest, CachePutAllRequest, CachePartitionsRequest,
+                QueryScanRequest]
 
     @staticmethod
     def new_resource_close(request_id: int, resource_id: int) -> 'Request':
@@ -251,12 +561,54 @@ class Request:
             body=QuerySqlFieldsCursorGetPageRequest(cursor_id)
         )
 
+    @staticmethod
+    def new_cache_get(request_id: int, cache_id: int, key: Any) -> 'Request':
+        return Request(OpConst.CACHE_GET, request_id, CacheKeyRequest(cache_id, key))
+
+    @staticmethod
+    def new_cache_put(request_id: int, cache_id: int, key: Any, value: Any) -> 'Request':
+        return Request(OpConst.CACHE_PUT, request_id, CachePutRequest(cache_id, key, value))
+
+    @staticmethod
+    def new_cache_get_all(request_id: int, cache_id: int, keys: List[Any]) -> 'Request':
+        return Request(OpConst.CACHE_GET_ALL, request_id, CacheKeysRequest(cache_id, keys))
+
+    @staticmethod
+    def new_cache_put_all(request_id: int, cache_id: int, entries: List[Tuple[Any, Any]]) -> 'Request':
+        return Request(OpConst.CACHE_PUT_ALL, request_id, CachePutAllRequest(cache_id, entries))
+
+    @staticmethod
+    def new_cache_contains_keys(request_id: int, cache_id: int, keys: List[Any]) -> 'Request':
+        return Request(OpConst.CACHE_CONTAINS_KEYS, request_id, CacheKeysRequest(cache_id, keys))
+
+    @staticmethod
+    def new_cache_remove_all(request_id: int, cache_id: int) -> 'Request':
+        return Request(OpConst.CACHE_REMOVE_ALL, request_id, CacheRequest(cache_id))
+
+    @staticmethod
+    def new_cache_partitions(request_id: int, cache_ids: List[int]) -> 'Request':
+        return Request(OpConst.CACHE_PARTITIONS, request_id, CachePartitionsRequest(cache_ids))
+
+    @staticmethod
+    def new_query_scan(request_id: int, request: QueryScanRequest) -> 'Request':
+        return Request(OpConst.QUERY_SCAN, request_id, request)
+
+    @staticmethod
+    def new_query_scan_cursor_get_page(request_id: int, cursor_id: int) -> 'Request':
+        return Request(OpConst.QUERY_SCAN_CURSOR_GET_PAGE, request_id, QuerySqlFieldsCursorGetPageRequest(cursor_id))
+
+    def frame_length(self) -> int:
+        return 4 + 10 + self.body.length()
+
+    def encode_into(self, buffer: bytearray, offset: int) -> int:
+        # the body is written first so its length is known when the header is filled in
+        end = self.body.encode_into(buffer, offset + 14)
+        _FRAME_HEADER.pack_into(buffer, offset, end - offset - 4, self.op_code, self.request_id)
+        return end
+
     def encode(self) -> bytes:
-        encoded = bytearray()
-        encoded += (self.body.length() + 10).to_bytes(4, byteorder='little', signed=True)
-        encoded += self.op_code.to_bytes(2, byteorder='little', signed=True)
-        encoded += self.request_id.to_bytes(8, byteorder='little', signed=True)
-        encoded += self.body.encode()
+        encoded = bytearray(self.frame_length())
+        self.encode_into(encoded, 0)
         return bytes(encoded)
 
 
@@ -265,12 +617,22 @@ class Response:
     request_id: int
     status_code: int
     error_message: str
-    body: Optional[Union[QuerySqlFieldsResponse]] = None
+    body: Optional[Union[QuerySqlFieldsResponse, QuerySqlFieldsCursorGetPageResponse, CachePartitionsResponse,
+                         QueryScanResponse, QueryScanCursorGetPageResponse,
+                         Dict[Any, Any], Any]] = None
 
     @staticmethod
-    def decode_common(data: bytes):
-        request_id, offset = read_long(data, 0)
-        status_code, offset = read_int(data, offset)
+    def decode_common(data: bytes, flags_header: bool = False):
+        if flags_header:
+            (request_id, flags), offset = read_struct(_FLAGS_RESPONSE_HEADER, data, 0)
+            if flags & ResponseFlagConst.AFFINITY_TOPOLOGY_CHANGED:
+                offset += _TOPOLOGY_VERSION.size
+            if flags & ResponseFlagConst.ERROR:
+                status_code, offset = read_int(data, offset)
+            else:
+                status_code = 0
+        else:
+            (request_id, status_code), offset = read_struct(_RESPONSE_HEADER, data, 0)
 
         if status_code != 0:
             error_message, offset = read_string(data, offset)
@@ -280,8 +642,17 @@ class Response:
         return request_id, status_code, error_message, offset
 
     @staticmethod
-    def decode_resource_close(data: bytes):
-        request_id, status_code, error_message, _ = Response.decode_common(data)
+    def decode_topology_version(data: bytes) -> Optional[Tuple[int, int]]:
+        # only meaningful for connections using the flags header
+        flags, offset = read_short(data, 8)
+        if flags & ResponseFlagConst.AFFINITY_TOPOLOGY_CHANGED:
+            topology_version, _ = read_struct(_TOPOLOGY_VERSION, data, offset)
+            return topology_version
+        return None
+
+    @staticmethod
+    def decode_resource_close(data: bytes, flags_header: bool = False):
+        request_id, status_code, error_message, _ = Response.decode_common(data, flags_header)
 
         return Response(
             request_id=request_id,
@@ -290,13 +661,50 @@ class Response:
         )
 
     @staticmethod
-    def decode_query_sql_fields(data: bytes, includes_field_names: bool) -> 'Response':
-        request_id, status_code, error_message, offset = Response.decode_common(data)
+    def _decode_with_body(data: bytes, decode_body: Callable, flags_header: bool) -> 'Response':
+        request_id, status_code, error_message, offset = Response.decode_common(data, flags_header)
+        body = decode_body(data, offset) if status_code == 0 else None
+        return Response(
+            request_id=request_id,
+            status_code=status_code,
+            error_message=error_message,
+            body=body
+        )
+
+    @staticmethod
+    def decode_cache_value(data: bytes, flags_header: bool = False) -> 'Response':
+        return Response._decode_with_body(data, _decode_cache_value, flags_header)
+
+    @staticmethod
+    def decode_cache_entries(data: bytes, flags_header: bool = False) -> 'Response':
+        return Response._decode_with_body(data, _decode_cache_entries, flags_header)
+
+    @staticmethod
+    def decode_cache_bool(data: bytes, flags_header: bool = False) -> 'Response':
+        return Response._decode_with_body(data, _decode_cache_bool, flags_header)
+
+    @staticmethod
+    def decode_cache_partitions(data: bytes, flags_header: bool = False) -> 'Response':
+        return Response._decode_with_body(data, CachePartitionsResponse.decode, flags_header)
+
+    @staticmethod
+    def decode_query_scan(data: bytes, flags_header: bool = False) -> 'Response':
+        return Response._decode_with_body(data, QueryScanResponse.decode, flags_header)
+
+    @staticmethod
+    def decode_query_scan_cursor_get_page(data: bytes, flags_header: bool = False) -> 'Response':
+        return Response._decode_with_body(data, QueryScanCursorGetPageResponse.decode, flags_header)
+
+    @staticmethod
+    def decode_query_sql_fields(data: bytes, includes_field_names: bool, matrix_decoder: Callable = None,
+                                flags_header: bool = False) -> 'Response':
+        request_id, status_code, error_message, offset = Response.decode_common(data, flags_header)
 
         if status_code != 0:
             body = None
         else:
-            body = QuerySqlFieldsResponse.decode(data[offset:], has_field_names=includes_field_names)
+            body = QuerySqlFieldsResponse.decode(data, has_field_names=includes_field_names,
+                                                 matrix_decoder=matrix_decoder, offset=offset)
 
         return Response(
             request_id=request_id,
@@ -306,13 +714,14 @@ class Response:
         )
 
     @staticmethod
-    def decode_query_sql_fields_cursor_get_page(data: bytes, column_count: int) -> 'Response':
-        request_id, status_code, error_message, offset = Response.decode_common(data)
+    def decode_query_sql_fields_cursor_get_page(data: bytes, column_count: int, matrix_decoder: Callable = None,
+                                                flags_header: bool = False) -> 'Response':
+        request_id, status_code, error_message, offset = Response.decode_common(data, flags_header)
 
         if status_code != 0:
             body = None
         else:
-            body = QuerySqlFieldsCursorGetPageResponse.decode(data[offset:], column_count)
+            body = QuerySqlFieldsCursorGetPageResponse.decode(data, column_count, matrix_decoder, offset)
 
         return Response(
             request_id=request_id,
@@ -322,139 +731,25 @@ class Response:
         )
 
 
-def read_matrix(data: bytes, offset: int, first_page_row_count: int, column_count: int) -> (list, int):
-    matrix = []
-    for _ in range(first_page_row_count):
-        row = []
-        for _ in range(column_count):
-            type_code, offset = read_byte(data, offset)
-            if type_code == 1:
-                value, offset = read_byte(data, offset)
-                row.append(value)
-            elif type_code == 2:
-                value, offset = read_short(data, offset)
-                row.append(value)
-            elif type_code == 3:
-                value, offset = read_int(data, offset)
-                row.append(value)
-            elif type_code == 4:
-                value, offset = read_long(data, offset)
-                row.append(value)
-            elif type_code == 5:
-                value, offset = read_float(data, offset)
-                row.append(value)
-            elif type_code == 6:
-                value, offset = read_double(data, offset)
-                row.append(value)
-            elif type_code == 8:
-                value, offset = read_bool(data, offset)
-                row.append(value)
-            elif type_code == 9:
-                value, offset = read_string_no_type(data, offset)
-                row.append(value)
-            elif type_code == 12:
-                value, offset = read_bytes(data, offset)
-                row.append(value)
-            elif type_code == 101:
-                row.append(None)
-            else:
-                raise Exception(f"Unexpected type code: {type_code}")
-        matrix.append(row)
-    return matrix, offset
-
-
-def put_string(buffer: bytearray, offset: int, value: str) -> int:
-    encoded_string = value.encode('utf-8')
-    offset = put_byte(buffer, offset, 9)
-    offset = put_int(buffer, offset, len(encoded_string))
-    offset = put_bytes(buffer, offset, encoded_string)
-    return offset
-
-
-def read_string(data: bytes, offset: int) -> (str, int):
-    _, offset = read_byte(data, offset)
-    length, offset = read_int(data, offset)
-    value = data[offset:offset + length].decode('utf-8')
-    return value, offset + length
-
-
-def read_string_no_type(data: bytes, offset: int) -> (str, int):
-    length, offset = read_int(data, offset)
-    value = data[offset:offset + length].decode('utf-8')
-    return value, offset + length
-
-
-def put_bytes(buffer: bytearray, offset: int, value: bytes) -> int:
-    buffer[offset:offset + len(value)] = value
-    return offset + len(value)
-
+def _decode_cache_value(data: bytes, offset: int) -> Any:
+    value, _ = read_object(data, offset)
+    return value
 
-def read_bytes(data: bytes, offset: int) -> (bytes, int):
-    length, offset = read_int(data, offset)
-    value = data[offset:offset + length]
-    return value, offset + length
 
+def _decode_cache_entries(data: bytes, offset: int) -> Dict[Any, Any]:
+    count, offset = read_int(data, offset)
+    entries = {}
+    for _ in range(count):
+        key, offset = read_object(data, offset)
+        entries[key], offset = read_object(data, offset)
+    return entries
 
-def put_short(buffer: bytearray, offset: int, value: int) -> int:
-    buffer[offset:offset + 2] = value.to_bytes(2, byteorder='little', signed=True)
-    return offset + 2
 
-
-def read_short(data: bytes, offset: int) -> (int, int):
-    value = int.from_bytes(data[offset:offset + 2], byteorder='little', signed=True)
-    return value, offset + 2
-
-
-def put_int(buffer: bytearray, offset: int, value: int) -> int:
-    buffer[offset:offset + 4] = value.to_bytes(4, byteorder='little', signed=True)
-    return offset + 4
-
-
-def read_int(data: bytes, offset: int) -> (int, int):
-    value = int.from_bytes(data[offset:offset + 4], byteorder='little', signed=True)
-    return value, offset + 4
-
-
-def put_long(buffer: bytearray, offset: int, value: int) -> int:
-    buffer[offset:offset + 8] = value.to_bytes(8, byteorder='little', signed=True)
-    return offset + 8
-
-
-def read_long(data: bytes, offset: int) -> (int, int):
-    value = int.from_bytes(data[offset:offset + 8], byteorder='little', signed=True)
-    return value, offset + 8
-
-
-def read_float(data: bytes, offset: int) -> (float, int):
-    value = struct.unpack('<f', data[offset:offset + 4])[0]
-    return value, offset + 4
-
-
-def read_double(data: bytes, offset: int) -> (float, int):
-    value = struct.unpack('<d', data[offset:offset + 8])[0]
-    return value, offset + 8
-
-
-def put_bool(buffer: bytearray, offset: int, value: bool) -> int:
-    buffer[offset] = int(value)
-    return offset + 1
-
-
-def read_bool(data: bytes, offset: int) -> (bool, int):
-    value, offset = read_byte(data, offset)
-    return bool(value), offset
+def _decode_cache_bool(data: bytes, offset: int) -> bool:
+    value, _ = read_bool(data, offset)
+    return value
 
 
 def put_statement_type(buffer: bytearray, offset: int, value: StatementType) -> int:
     buffer[offset] = value.value
     return offset + 1
-
-
-def put_byte(buffer: bytearray, offset: int, value: int) -> int:
-    buffer[offset] = value
-    return offset + 1
-
-
-def read_byte(data: bytes, offset: int) -> (int, int):
-    value = data[offset]
-    return value, offset + 1
@@ -0,0 +1,70 @@
+import dataclasses
+import datetime
+import decimal
+import unittest
+import uuid
+
+from ignite_client.protocol import QuerySqlFieldsRequest, QuerySqlFieldsTemplateCache, Request, StatementType
+
+
+def new_request(sql: str = "SELECT ID, NAME FROM PERSON WHERE ID > ?", query_args=None) -> QuerySqlFieldsRequest:
+    query_args = [1] if query_args is None else query_args
+    return QuerySqlFieldsRequest(cache_id=0, schema="PUBLIC", cursor_page_size=4, max_rows=0, sql=sql,
+                                 query_arg_count=len(query_args), query_args=query_args,
+                                 statement_type=StatementType.SELECT, distributed_join=False, local_query=False,
+                                 replicated_only=False, enforce_join_order=False, collocated=False, lazy=False,
+                                 timeout_milliseconds=0, include_field_names=True)
+
+
+class TestQuerySqlFieldsTemplateCache(unittest.TestCase):
+    def test_hit_and_miss(self):
+        cache = QuerySqlFieldsTemplateCache(capacity=2)
+        template = cache.get(new_request())
+        # the arguments are not part of the template
+        self.assertIs(template, cache.get(new_request(query_args=[2])))
+        self.assertIsNot(template, cache.get(dataclasses.replace(new_request(), cursor_page_size=8)))
+        self.assertIsNot(template, cache.get(new_request(sql="SELECT 1")))
+        self.assertEqual(2, len(cache))
+        # the least recently used template was evicted
+        self.assertIsNot(template, cache.get(new_request()))
+
+    def test_bound_frame_matches_full_encoding(self):
+        cache = QuerySqlFieldsTemplateCache()
+        args = [7, "name", None, datetime.date(2020, 1, 2), decimal.Decimal('-1.25'), uuid.UUID(int=3),
+                datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)]
+        request = new_request(query_args=args)
+        # the template is compiled from a request with other arguments
+        cache.get(new_request())
+        frame = cache.get(request).bind(42, request)
+        self.assertEqual(Request.new_query_sql_fields(42, request).encode(), frame.encode())
+        self.assertEqual(len(frame.encode()), frame.frame_length())
+        with self.assertRaises(ValueError):
+            cache.get(request).bind(43, dataclasses.replace(request, query_arg_count=1))
+
+
+class TestFrameEncoding(unittest.TestCase):
+    def test_frame_length_of_multibyte_sql(self):
+        request = new_request(sql="SELECT ИМЯ FROM ЛЮДИ WHERE 名前 = ? -- 🙂", query_args=["Zoë"])
+        frames = [Request.new_query_sql_fields(1, request),
+                  QuerySqlFieldsTemplateCache().get(request).bind(2, request),
+                  Request.new_cache_put(3, 1, "ключ", "значение")]
+        for frame in frames:
+            encoded = frame.encode()
+            self.assertEqual(len(encoded), frame.frame_length())
+            self.assertEqual(len(encoded) - 4, int.from_bytes(encoded[:4], 'little', signed=True))
+
+        # frames written back to back into one buffer can be split again by their length headers
+        buffer = bytearray(sum(frame.frame_length() for frame in frames))
+        offset = 0
+        for frame in frames:
+            offset = frame.encode_into(buffer, offset)
+        self.assertEqual(len(buffer), offset)
+        offset = 0
+        for frame in frames:
+            length = int.from_bytes(buffer[offset:offset + 4], 'little')
+            self.assertEqual(frame.encode(), bytes(buffer[offset:offset + 4 + length]))
+            offset += 4 + length
+
+
+if __name__ == '__main__':
+    unittest.main()
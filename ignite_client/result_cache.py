@@ -0,0 +1,180 @@
+import asyncio
+import copy
+import dataclasses
+import datetime
+import decimal
+import re
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from ignite_client.codec import BinaryEnum, encode_objects
+from ignite_client.protocol import QuerySqlFieldsRequest, QuerySqlFieldsResponse
+
+# a quoted literal or identifier, kept as it is, or a run of whitespace outside of one
+_SQL_WHITESPACE = re.compile(r"('[^']*(?:'|$)|\"[^\"]*(?:\"|$))|\s+")
+
+# cells of these types cannot be changed in place, so copies of a cached row may share them
+_IMMUTABLE_CELLS = frozenset((type(None), bool, int, float, str, bytes, decimal.Decimal, datetime.date,
+                              datetime.datetime, datetime.time, uuid.UUID, BinaryEnum))
+
+
+def _plain_rows(data: Any) -> bool:
+    return isinstance(data, list) and all(
+        row.__class__ is list and all(type(cell) in _IMMUTABLE_CELLS for cell in row) for row in data)
+
+
+@dataclass
+class SqlResultCacheStats:
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+
+
+class _Entry:
+    def __init__(self, response: QuerySqlFieldsResponse, size: int, expires_at: float):
+        self.response = response
+        self.size = size
+        self.expires_at = expires_at
+        self._plain_rows: Optional[bool] = None
+
+    def response_copy(self) -> QuerySqlFieldsResponse:
+        # lists of immutable cells are copied row by row, anything else in full
+        response = self.response
+        if self._plain_rows is None:
+            self._plain_rows = _plain_rows(response.data)
+        data = [row.copy() for row in response.data] if self._plain_rows else copy.deepcopy(response.data)
+        column_types = None if response.column_types is None else list(response.column_types)
+        return dataclasses.replace(response, data=data, column_names=list(response.column_names),
+                                   column_types=column_types)
+
+
+# caches complete SELECT results in front of query_sql_fields. only results that fit in the first page are kept,
+# the cursor of a larger result lives on the server. every caller gets a copy of the cached response to change
+class SqlResultCache:
+    def __init__(self, ttl: float = 10.0, max_bytes: int = 64 * 1024 * 1024,
+                 clock: Callable[[], float] = time.monotonic):
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be positive")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.stats = SqlResultCacheStats()
+        self._entries: OrderedDict = OrderedDict()
+        self._loading: Dict[tuple, asyncio.Future] = {}
+
+    @staticmethod
+    def normalize_sql(sql: str) -> str:
+        # whitespace inside quotes is part of a value or a name, so only the whitespace between tokens is collapsed
+        return _SQL_WHITESPACE.sub(lambda match: match.group(1) or ' ', sql).strip()
+
+    @staticmethod
+    def key(request: QuerySqlFieldsRequest, matrix_decoder: Optional[Callable] = None) -> tuple:
+        # arguments are keyed by their wire form so that 1, 1.0 and True stay distinct
+        return (SqlResultCache.normalize_sql(request.sql), request.schema, request.cache_id,
+                encode_objects(request.query_args), request.max_rows, request.cursor_page_size,
+                request.distributed_join, request.local_query, request.replicated_only, request.enforce_join_order,
+                request.collocated, request.lazy, request.include_field_names, matrix_decoder)
+
+    def _entry(self, key: tuple) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= self.clock():
+            self._remove(key)
+            self.stats.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: tuple) -> Optional[QuerySqlFieldsResponse]:
+        entry = self._entry(key)
+        return None if entry is None else entry.response_copy()
+
+    def put(self, key: tuple, response: QuerySqlFieldsResponse, size: int):
+        if not response.has_more:
+            self._store(key, _Entry(response, size, self.clock() + self.ttl))
+
+    def _store(self, key: tuple, entry: _Entry):
+        if entry.size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self.stats.size_bytes += entry.size
+        while self.stats.size_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.stats.evictions += 1
+        self.stats.entries = len(self._entries)
+
+    async def get_or_load(self, key: tuple,
+                          load: Callable[[], Awaitable[Tuple[QuerySqlFieldsResponse, int]]]) -> QuerySqlFieldsResponse:
+        while True:
+            entry = self._entry(key)
+            if entry is not None:
+                self.stats.hits += 1
+                return entry.response_copy()
+            # concurrent misses for the same key wait for the one query already on its way
+            loading = self._loading.get(key)
+            if loading is None:
+                break
+            self.stats.coalesced += 1
+            try:
+                entry = await asyncio.shield(loading)
+            except asyncio.CancelledError:
+                # the loading caller was cancelled, so one of the waiters takes over
+                if not loading.cancelled():
+                    raise
+                continue
+            if entry is not None:
+                return entry.response_copy()
+            # a result with a cursor left open cannot be shared, so this caller runs the query itself
+            response, _ = await load()
+            return response
+
+        self.stats.misses += 1
+        loading = asyncio.get_running_loop().create_future()
+        self._loading[key] = loading
+        try:
+            response, size = await load()
+        except asyncio.CancelledError:
+            loading.cancel()
+            raise
+        except Exception as e:
+            loading.set_exception(e)
+            # the waiters see the error, nobody else has to retrieve it
+            loading.exception()
+            raise
+        finally:
+            self._loading.pop(key, None)
+        if response.has_more:
+            loading.set_result(None)
+            return response
+        entry = _Entry(response, size, self.clock() + self.ttl)
+        self._store(key, entry)
+        loading.set_result(entry)
+        return entry.response_copy()
+
+    def invalidate(self, key: Optional[tuple] = None):
+        if key is None:
+            self._entries.clear()
+            self.stats.size_bytes = 0
+        elif key in self._entries:
+            self._remove(key)
+        self.stats.entries = len(self._entries)
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key)
+        self.stats.size_bytes -= entry.size
+        self.stats.entries = len(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,282 @@
+import contextlib
+import functools
+import queue
+import socket
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ignite_client.codec import read_long
+from ignite_client.lazy import bind_column_names
+from ignite_client.protocol import HandshakeRequest, HandshakeResponse, HandshakeSuccess, decode_handshake_response, \
+    QuerySqlFieldsRequest, QuerySqlFieldsResponse, QuerySqlFieldsCursorGetPageResponse, \
+    QuerySqlFieldsTemplateCache, QueryScanRequest, QueryScanResponse, QueryScanCursorGetPageResponse, Request, Response
+from ignite_client.utils import AtomicInteger, check_pool_size
+
+READ_BUFFER_SIZE = 64 * 1024
+WRITE_BUFFER_SIZE = 16 * 1024
+
+
+# blocking counterpart of IgniteClient for code without an event loop. a connection carries one request at a
+# time; responses are read with recv_into into a buffer reused across frames, and the decoders copy every value
+# out of it, so nothing returned to the caller refers to the buffer. custom matrix decoders, which may keep the
+# frame (as read_lazy_rows does), get a copy of it
+class SyncIgniteClient:
+    def __init__(self, host: str, port: int, timeout: Optional[float] = None, template_cache_size: int = 1024):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.request_id = AtomicInteger()
+        self.templates = QuerySqlFieldsTemplateCache(template_cache_size)
+        self.sock: Optional[socket.socket] = None
+        self.partition_aware = False
+        self.node_id: Optional[uuid.UUID] = None
+        self._lock = threading.Lock()
+        self._read_buffer = bytearray(READ_BUFFER_SIZE)
+        self._write_buffer = bytearray(WRITE_BUFFER_SIZE)
+        self._length_buffer = bytearray(4)
+        self._broken = False
+
+    def connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._broken = False
+
+    def is_connected(self) -> bool:
+        return self.sock is not None and not self._broken
+
+    def _recv_exactly(self, view: memoryview):
+        received = 0
+        while received < len(view):
+            count = self.sock.recv_into(view[received:])
+            if count == 0:
+                raise ConnectionError("Connection closed")
+            received += count
+
+    def _read_frame(self) -> memoryview:
+        self._recv_exactly(memoryview(self._length_buffer))
+        length = int.from_bytes(self._length_buffer, byteorder='little')
+        if length > len(self._read_buffer):
+            self._read_buffer = bytearray(max(length, 2 * len(self._read_buffer)))
+        view = memoryview(self._read_buffer)[:length]
+        self._recv_exactly(view)
+        return view
+
+    def _write_frame(self, frame):
+        frame_length = frame.frame_length()
+        if frame_length > len(self._write_buffer):
+            self._write_buffer = bytearray(max(frame_length, 2 * len(self._write_buffer)))
+        end = frame.encode_into(self._write_buffer, 0)
+        self.sock.sendall(memoryview(self._write_buffer)[:end])
+
+    def _send_request(self, request_id: int, frame, decode_function, copy_frame: bool = False):
+        if self.sock is None:
+            raise ConnectionError("Client is not connected")
+        with self._lock:
+            if self._broken:
+                raise ConnectionError("Connection lost")
+            try:
+                self._write_frame(frame)
+                response_data = self._read_frame()
+            except BaseException:
+                # a request cut off midway leaves the stream out of step with the requests
+                self._broken = True
+                raise
+            response_id, _ = read_long(response_data, 0)
+            if response_id != request_id:
+                self._broken = True
+                raise ConnectionError(f"Expected response to request {request_id}, got {response_id}")
+            if copy_frame:
+                response_data = bytes(response_data)
+            return decode_function(response_data, flags_header=self.partition_aware)
+
+    def _check(self, response: Response) -> Any:
+        if response.status_code != 0:
+            raise Exception(f"Error: {response.error_message}")
+        return response.body
+
+    def handshake(self, request: HandshakeRequest) -> HandshakeResponse:
+        if self.sock is None:
+            raise ConnectionError("Client is not connected")
+        with self._lock:
+            self.sock.sendall(request.encode())
+            has_node_id = request.supports_partition_awareness()
+            response = decode_handshake_response(self._read_frame(), has_node_id=has_node_id)
+        if isinstance(response, HandshakeSuccess) and has_node_id:
+            self.partition_aware = True
+            self.node_id = response.node_id
+        return response
+
+    def query_sql_fields(self, request: QuerySqlFieldsRequest,
+                         matrix_decoder: Callable = None) -> QuerySqlFieldsResponse:
+        request_id = self.request_id.increment()
+        response = self._check(self._send_request(
+            request_id,
+            self.templates.get(request).bind(request_id, request),
+            functools.partial(Response.decode_query_sql_fields, includes_field_names=request.include_field_names,
+                              matrix_decoder=matrix_decoder),
+            copy_frame=matrix_decoder is not None))
+        bind_column_names(response.data, response.column_names)
+        return response
+
+    def query_sql_fields_cursor_get_page(self, cursor_id: int, column_count: int,
+                                         matrix_decoder: Callable = None) -> QuerySqlFieldsCursorGetPageResponse:
+        request_id = self.request_id.increment()
+        return self._check(self._send_request(
+            request_id,
+            Request.new_query_sql_fields_cursor_get_page(request_id, cursor_id),
+            functools.partial(Response.decode_query_sql_fields_cursor_get_page, column_count=column_count,
+                              matrix_decoder=matrix_decoder),
+            copy_frame=matrix_decoder is not None))
+
+    def sql(self, request: QuerySqlFieldsRequest, matrix_decoder: Callable = None) -> Iterator[List[Any]]:
+        response = self.query_sql_fields(request, matrix_decoder)
+        rows, has_more = response.data, response.has_more
+        try:
+            while True:
+                yield from rows
+                if not has_more:
+                    return
+                page = self.query_sql_fields_cursor_get_page(response.cursor_id, response.column_count,
+                                                             matrix_decoder)
+                rows, has_more = page.data, page.has_more
+                bind_column_names(rows, response.column_names)
+        finally:
+            if has_more:
+                with contextlib.suppress(Exception):
+                    self.resource_close(response.cursor_id)
+
+    def query_scan(self, request: QueryScanRequest) -> QueryScanResponse:
+        request_id = self.request_id.increment()
+        return self._check(self._send_request(request_id, Request.new_query_scan(request_id, request),
+                                              Response.decode_query_scan))
+
+    def query_scan_cursor_get_page(self, cursor_id: int) -> QueryScanCursorGetPageResponse:
+        request_id = self.request_id.increment()
+        return self._check(self._send_request(request_id,
+                                              Request.new_query_scan_cursor_get_page(request_id, cursor_id),
+                                              Response.decode_query_scan_cursor_get_page))
+
+    def scan(self, request: QueryScanRequest) -> Iterator[Tuple[Any, Any]]:
+        response = self.query_scan(request)
+        entries, has_more = response.data, response.has_more
+        try:
+            while True:
+                yield from entries
+                if not has_more:
+                    return
+                page = self.query_scan_cursor_get_page(response.cursor_id)
+                entries, has_more = page.data, page.has_more
+        finally:
+            if has_more:
+                with contextlib.suppress(Exception):
+                    self.resource_close(response.cursor_id)
+
+    def resource_close(self, resource_id: int):
+        request_id = self.request_id.increment()
+        self._check(self._send_request(request_id, Request.new_resource_close(request_id, resource_id),
+                                       Response.decode_resource_close))
+
+    def _cache_request(self, request: Request, decode_function) -> Any:
+        return self._check(self._send_request(request.request_id, request, decode_function))
+
+    def cache_get(self, cache_id: int, key: Any) -> Any:
+        return self._cache_request(Request.new_cache_get(self.request_id.increment(), cache_id, key),
+                                   Response.decode_cache_value)
+
+    def cache_put(self, cache_id: int, key: Any, value: Any):
+        self._cache_request(Request.new_cache_put(self.request_id.increment(), cache_id, key, value),
+                            Response.decode_resource_close)
+
+    def cache_get_all(self, cache_id: int, keys: Iterable[Any]) -> Dict[Any, Any]:
+        return self._cache_request(Request.new_cache_get_all(self.request_id.increment(), cache_id, list(keys)),
+                                   Response.decode_cache_entries)
+
+    def cache_put_all(self, cache_id: int, entries: Union[Dict[Any, Any], Iterable[Tuple[Any, Any]]]):
+        entries = list(entries.items()) if isinstance(entries, dict) else list(entries)
+        self._cache_request(Request.new_cache_put_all(self.request_id.increment(), cache_id, entries),
+                            Response.decode_resource_close)
+
+    def cache_contains_keys(self, cache_id: int, keys: Iterable[Any]) -> bool:
+        return self._cache_request(Request.new_cache_contains_keys(self.request_id.increment(), cache_id, list(keys)),
+                                   Response.decode_cache_bool)
+
+    def cache_remove_all(self, cache_id: int):
+        self._cache_request(Request.new_cache_remove_all(self.request_id.increment(), cache_id),
+                            Response.decode_resource_close)
+
+    def close(self):
+        if self.sock is not None:
+            with contextlib.suppress(OSError):
+                self.sock.close()
+            self.sock = None
+
+    def __enter__(self) -> 'SyncIgniteClient':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# thread-safe pool of handshaken blocking connections; a thread holds a connection for the length of acquire()
+class SyncIgniteConnectionPool:
+    def __init__(self, nodes: List[Tuple[str, int]], handshake_request: HandshakeRequest, size_per_node: int = 4,
+                 timeout: Optional[float] = None):
+        check_pool_size(nodes, size_per_node)
+        self.nodes = nodes
+        self.handshake_request = handshake_request
+        self.size_per_node = size_per_node
+        self.timeout = timeout
+        # slots hold an address and, once opened, a client; broken clients are reopened on their next lease
+        self._idle: queue.Queue = queue.Queue()
+        self._closed = False
+        for _ in range(size_per_node):
+            for host, port in nodes:
+                self._idle.put(((host, port), None))
+
+    def _open(self, host: str, port: int) -> SyncIgniteClient:
+        client = SyncIgniteClient(host, port, self.timeout)
+        client.connect()
+        try:
+            response = client.handshake(self.handshake_request)
+        except BaseException:
+            client.close()
+            raise
+        if not isinstance(response, HandshakeSuccess):
+            client.close()
+            raise ConnectionError(f"Handshake with {host}:{port} failed: {response.error_message}")
+        return client
+
+    @contextlib.contextmanager
+    def acquire(self) -> Iterator[SyncIgniteClient]:
+        if self._closed:
+            raise ConnectionError("Connection pool is closed")
+        address, client = self._idle.get()
+        try:
+            if client is None or not client.is_connected():
+                if client is not None:
+                    client.close()
+                client = None
+                client = self._open(*address)
+            yield client
+        finally:
+            if self._closed and client is not None:
+                client.close()
+                client = None
+            self._idle.put((address, client))
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                _, client = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if client is not None:
+                client.close()
+
+    def __enter__(self) -> 'SyncIgniteConnectionPool':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,101 @@
+import asyncio
+import struct
+from typing import Callable, Optional
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+RECEIVE_BUFFER_SIZE = 64 * 1024
+
+_LENGTH = struct.Struct('<i')
+
+
+# frames responses straight out of one receive buffer: the socket is read into its free tail and every complete
+# frame is passed to on_frame as a memoryview, which is only valid for the duration of the call. the remains of
+# a partial frame are moved to the front when the tail runs out, and a frame larger than the buffer grows it
+class FrameProtocol(asyncio.BufferedProtocol):
+    def __init__(self, on_frame: Callable[[memoryview], None],
+                 on_connection_lost: Callable[[Optional[Exception]], None], buffer_size: int = RECEIVE_BUFFER_SIZE):
+        self.on_frame = on_frame
+        self.on_connection_lost = on_connection_lost
+        self.transport: Optional[asyncio.Transport] = None
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        # received bytes not yet framed are self._buffer[self._start:self._end]
+        self._start = 0
+        self._end = 0
+        self._paused = False
+        self._drain_waiter: Optional[asyncio.Future] = None
+        self._lost = False
+
+    def connection_made(self, transport: asyncio.Transport):
+        self.transport = transport
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        if self._end == len(self._buffer):
+            self._make_room()
+        return self._view[self._end:]
+
+    def _make_room(self):
+        pending = self._end - self._start
+        required = pending + 1
+        if pending >= 4:
+            required = max(required, 4 + _LENGTH.unpack_from(self._view, self._start)[0])
+        if required > len(self._buffer):
+            # views handed out earlier may still be referenced, so the buffer is replaced rather than resized
+            buffer = bytearray(max(required, 2 * len(self._buffer)))
+            buffer[:pending] = self._view[self._start:self._end]
+            self._buffer, self._view = buffer, memoryview(buffer)
+        else:
+            self._buffer[:pending] = self._buffer[self._start:self._end]
+        self._start, self._end = 0, pending
+
+    def buffer_updated(self, nbytes: int):
+        view, start, end = self._view, self._start, self._end + nbytes
+        on_frame = self.on_frame
+        while end - start >= 4:
+            length = _LENGTH.unpack_from(view, start)[0]
+            if end - start - 4 < length:
+                break
+            start += 4
+            on_frame(view[start:start + length])
+            start += length
+        if start == end:
+            start = end = 0
+        self._start, self._end = start, end
+
+    def pause_writing(self):
+        self._paused = True
+
+    def resume_writing(self):
+        self._paused = False
+        self._wake_drain_waiter(None)
+
+    def _wake_drain_waiter(self, error: Optional[Exception]):
+        waiter, self._drain_waiter = self._drain_waiter, None
+        if waiter is not None and not waiter.done():
+            if error is None:
+                waiter.set_result(None)
+            else:
+                waiter.set_exception(error)
+
+    async def drain(self):
+        if self._lost:
+            raise ConnectionError("Connection lost")
+        if self._paused:
+            self._drain_waiter = asyncio.get_running_loop().create_future()
+            await self._drain_waiter
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self._lost = True
+        self._wake_drain_waiter(ConnectionError("Connection lost"))
+        self.on_connection_lost(exc)
+
+
+def run(main):
+    # asyncio.run, on uvloop when it is installed
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return asyncio.run(main)
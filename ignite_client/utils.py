@@ -1,4 +1,7 @@
+import asyncio
+import contextlib
 import threading
+from typing import AsyncIterator, Set
 
 
 class AtomicInteger:
@@ -14,3 +17,41 @@ class AtomicInteger:
     def get(self):
         with self.lock:
             return self.value
+
+
+def to_int32(value: int) -> int:
+    value &= 0xFFFFFFFF
+    return value - 0x100000000 if value & 0x80000000 else value
+
+
+def java_hash_code(value: str) -> int:
+    # java.lang.String.hashCode over UTF-16 code units
+    encoded = value.encode('utf-16-be')
+    hash_code = 0
+    for i in range(0, len(encoded), 2):
+        hash_code = (31 * hash_code + (encoded[i] << 8 | encoded[i + 1])) & 0xFFFFFFFF
+    return to_int32(hash_code)
+
+
+def cache_id(cache_name: str) -> int:
+    return java_hash_code(cache_name)
+
+
+def check_pool_size(nodes: list, size_per_node: int):
+    if not nodes:
+        raise ValueError("At least one node address is required")
+    if size_per_node < 1:
+        raise ValueError("size_per_node must be positive")
+
+
+@contextlib.asynccontextmanager
+async def pending_tasks() -> AsyncIterator[Set[asyncio.Task]]:
+    # tasks added to the set are waited for at the end of the block, and cancelled if the block fails
+    tasks = set()
+    try:
+        yield tasks
+        if tasks:
+            await asyncio.wait(set(tasks))
+    finally:
+        for task in list(tasks):
+            task.cancel()
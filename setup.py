@@ -14,4 +14,9 @@ setup(
         "Operating System :: OS Independent",
     ],
     python_requires=">=3.9",
+    extras_require={
+        "columnar": ["numpy"],
+        "pandas": ["numpy", "pandas"],
+        "parquet": ["pyarrow"],
+    },
 )